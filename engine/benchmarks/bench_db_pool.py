@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+import argparse
+import threading
+
+# Run from engine/: python benchmarks/bench_db_pool.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import get_db_connection, get_db_pool
+
+# The three point queries a /simulate request used to issue per tariff step
+BASELINE_QUERIES = [
+    ("""
+        SELECT e.id, e.name, e.gdp_usd_bn, tm.value_added_usd_mn, tm.baseline_tariff_pct, i.category
+        FROM economies e
+        JOIN trade_matrix tm ON tm.source_econ_id = e.id
+        JOIN industries i ON i.id = tm.industry_id
+        WHERE tm.source_econ_id = ? AND tm.target_econ_id = ? AND tm.industry_id = ?
+    """, ('CHN', 'USA', 'D26')),
+    ("""
+        SELECT e.id, e.name, e.gdp_usd_bn, tm.value_added_usd_mn
+        FROM trade_matrix tm JOIN economies e ON tm.source_econ_id = e.id
+        WHERE tm.target_econ_id = ? AND tm.industry_id = ?
+    """, ('CHN', 'D26')),
+    ("SELECT name, gdp_usd_bn FROM economies WHERE id = ?", ('USA',)),
+]
+
+def run_queries(conn):
+    for sql, params in BASELINE_QUERIES:
+        conn.execute(sql, params).fetchall()
+
+def per_request(iterations: int):
+    for _ in range(iterations):
+        conn = get_db_connection()
+        try:
+            run_queries(conn)
+        finally:
+            conn.close()
+
+def pooled(iterations: int):
+    pool = get_db_pool()
+    for _ in range(iterations):
+        with pool.connection() as conn:
+            run_queries(conn)
+
+def timed(fn, iterations: int, threads: int) -> float:
+    workers = [threading.Thread(target=fn, args=(iterations,)) for _ in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connection-per-request vs pooled SQLite micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=2000, help="Requests per thread")
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    total = args.iterations * args.threads
+    print(f"--- ⏱️ SQLite Access Benchmark ({args.threads} threads x {args.iterations} requests) ---")
+    for label, fn in (("connection-per-request", per_request), ("pooled (WAL)", pooled)):
+        elapsed = timed(fn, args.iterations, args.threads)
+        print(f"{label:<24} {elapsed:8.3f}s  {total / elapsed:10,.0f} req/s  {elapsed / total * 1e6:8.1f} us/req")
+    print(f"Pool stats: {get_db_pool().stats()}")
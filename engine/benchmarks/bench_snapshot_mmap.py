@@ -0,0 +1,83 @@
+import sys
+import os
+import time
+import argparse
+import tempfile
+import subprocess
+
+# Run from engine/: python benchmarks/bench_snapshot_mmap.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import db_connection
+from snapshot import TradeSnapshot
+
+# Child process: open the export, touch every page, report its memory split from smaps_rollup
+CHILD = """
+import sys, time
+sys.path.append(sys.argv[1])
+from snapshot import TradeSnapshot
+snap = TradeSnapshot.open(sys.argv[2], mmap=sys.argv[3] == "mmap")
+total = float(snap.value_added.sum() + snap.baseline_tariff.sum() + snap.gdp_usd_bn.sum())
+fields = {}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        name, _, value = line.partition(":")
+        if name in ("Rss", "Shared_Clean", "Private_Clean", "Private_Dirty"):
+            fields[name] = int(value.split()[0])
+print(fields.get("Rss", 0), fields.get("Shared_Clean", 0), fields.get("Private_Dirty", 0))
+sys.stdout.flush()
+time.sleep(float(sys.argv[4]))
+"""
+
+def best_of(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def worker_memory(export_path: str, mode: str, processes: int):
+    """Starts `processes` readers at once so shared pages are counted while all are alive."""
+    engine_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    children = [
+        subprocess.Popen([sys.executable, "-c", CHILD, engine_dir, export_path, mode, "2"], stdout=subprocess.PIPE, text=True)
+        for _ in range(processes)
+    ]
+    readings = [tuple(int(v) for v in child.stdout.readline().split()) for child in children]
+    for child in children:
+        child.wait()
+    return readings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Table-scan vs memory-mapped snapshot cold start")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=4, help="Concurrent readers for the memory comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = os.path.join(tmp, "snapshot")
+
+        def scan():
+            with db_connection() as conn:
+                return TradeSnapshot.from_connection(conn)
+
+        snapshot = scan()
+        snapshot.save(export_path)
+        E, I = snapshot.value_added.shape[:2]
+        print(f"--- ⏱️ Snapshot Cold Start ({E} economies x {I} industries, best of {args.repeats}) ---")
+        for label, fn in (
+            ("table scan", scan),
+            ("load .npy (copy)", lambda: TradeSnapshot.open(export_path, mmap=False)),
+            ("mmap .npy", lambda: TradeSnapshot.open(export_path, mmap=True)),
+        ):
+            print(f"{label:<20} {best_of(fn, args.repeats) * 1e3:10.2f} ms")
+
+        if os.path.exists("/proc/self/smaps_rollup"):
+            print(f"--- 🧠 Memory per reader ({args.processes} concurrent processes, KiB) ---")
+            for mode in ("copy", "mmap"):
+                readings = worker_memory(export_path, mode, args.processes)
+                rss = sum(r[0] for r in readings) / len(readings)
+                shared = sum(r[1] for r in readings) / len(readings)
+                private = sum(r[2] for r in readings) / len(readings)
+                print(f"{mode:<6} rss {rss:10,.0f}  shared_clean {shared:10,.0f}  private_dirty {private:10,.0f}")
@@ -0,0 +1,185 @@
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+import httpx
+import yaml
+
+# Run from engine/: python benchmarks/load_test.py [--url http://localhost:8000] [--concurrency 32]
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ENGINE_DIR)
+
+# --- HTTP LOAD HARNESS ---
+# Closed-loop clients send a weighted mix of requests for a fixed time, either to the app
+# in-process (ASGI transport, lifespan and worker pool included) or to a running server.
+# Latency is recorded per request kind; the run fails when a configured budget is exceeded.
+
+DEFAULT_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_profile.yaml")
+
+class RequestPlan:
+    """Draws the next request from the weighted mix with a seeded RNG."""
+    def __init__(self, mix, corridors, tariff_pool: int, seed: int):
+        self.rng = random.Random(seed)
+        self.kinds = [kind for kind, weight in mix.items() if weight > 0]
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.corridors = corridors
+        self.tariffs = [round(5.0 + 95.0 * i / max(tariff_pool - 1, 1), 2) for i in range(tariff_pool)]
+
+    def _shock(self):
+        source_id, target_id, industry_id = self.rng.choice(self.corridors)
+        return {"source_id": source_id, "target_id": target_id, "industry_id": industry_id,
+                "tariff_delta": self.rng.choice(self.tariffs)}
+
+    def next(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "simulate":
+            return kind, "POST", "/simulate", {"json": self._shock()}
+        if kind == "simulate_no_sensitivity":
+            return kind, "POST", "/simulate/batch", {
+                "json": {"shocks": [self._shock()], "include_sensitivity": False}
+            }
+        if kind == "industries_available":
+            source_id, target_id, _ = self.rng.choice(self.corridors)
+            return kind, "GET", "/api/industries/available", {"params": {"source_id": source_id, "target_id": target_id}}
+        if kind == "economies":
+            return kind, "GET", "/economies", {}
+        raise ValueError(f"Unknown request kind in mix: {kind}")
+
+async def discover_corridors(client: httpx.AsyncClient, limit: int):
+    """(importer, exporter, industry) triples that actually trade, largest economies first."""
+    economies = (await client.get("/economies")).json()
+    economies.sort(key=lambda e: e.get("gdp_usd_bn") or 0, reverse=True)
+    ids = [e["id"] for e in economies[:12]]
+    corridors = []
+    for importer in ids:
+        for exporter in ids:
+            if importer == exporter or len(corridors) >= limit:
+                continue
+            response = await client.get("/api/industries/available", params={"source_id": importer, "target_id": exporter})
+            corridors.extend((importer, exporter, industry["id"]) for industry in response.json()[:3])
+    if not corridors:
+        raise SystemExit("No traded corridors found; is the database seeded?")
+    return corridors[:limit]
+
+async def drive(client: httpx.AsyncClient, plan: RequestPlan, concurrency: int, seconds: float, samples=None):
+    """Runs `concurrency` closed-loop clients for `seconds`; appends (kind, latency_s, ok) to `samples`."""
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            kind, method, url, kwargs = plan.next()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if samples is not None:
+                samples.append((kind, time.perf_counter() - started, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+    return time.perf_counter() - started
+
+def summarize(samples, elapsed: float):
+    """Latency percentiles, throughput and error rate per request kind and for "all"."""
+    groups = {"all": samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    report = {}
+    for kind, group in groups.items():
+        latency_ms = np.array([s[1] for s in group]) * 1e3
+        errors = sum(1 for s in group if not s[2])
+        report[kind] = {
+            "requests": len(group), "errors": errors, "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "rps": round(len(group) / elapsed, 2),
+            **({
+                "p50_ms": round(float(np.percentile(latency_ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(latency_ms, 95)), 3),
+                "p99_ms": round(float(np.percentile(latency_ms, 99)), 3),
+                "max_ms": round(float(latency_ms.max()), 3),
+            } if group else {})
+        }
+    return report
+
+def check_budgets(report, budgets):
+    """Returns a description of every budget the report exceeds."""
+    violations = []
+    for kind, limits in (budgets or {}).items():
+        stats = report.get(kind)
+        if stats is None or not stats["requests"]:
+            continue
+        for key, limit in limits.items():
+            if key.endswith("_ms") and stats[key] > limit:
+                violations.append(f"{kind} {key} {stats[key]:.1f} > {limit}")
+            elif key == "max_error_rate" and stats["error_rate"] > limit:
+                violations.append(f"{kind} error_rate {stats['error_rate']:.2%} > {limit:.2%}")
+            elif key == "min_rps" and stats["rps"] < limit:
+                violations.append(f"{kind} rps {stats['rps']:.1f} < {limit}")
+    return violations
+
+async def run(profile, url=None):
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60.0) as client:
+            return await _run_with_client(client, profile)
+
+    # In-process: the real app, lifespan (snapshot, factorization, worker pool) included
+    import main
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://tipm.local", timeout=60.0) as client:
+            return await _run_with_client(client, profile)
+
+async def _run_with_client(client: httpx.AsyncClient, profile):
+    corridors = await discover_corridors(client, profile.get("corridors", 24))
+    plan = RequestPlan(profile["mix"], corridors, profile.get("tariff_pool", 40), profile.get("seed", 42))
+    if profile.get("warmup_seconds"):
+        await drive(client, plan, profile["concurrency"], profile["warmup_seconds"])
+    samples = []
+    elapsed = await drive(client, plan, profile["concurrency"], profile["duration_seconds"], samples)
+    return summarize(samples, elapsed), len(corridors)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mixed-traffic load test with latency percentile budgets")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="YAML with mix, defaults and budgets")
+    parser.add_argument("--url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=None, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=None, help="Unmeasured seconds before the run")
+    parser.add_argument("--mix", default=None, help="Override weights, e.g. simulate=1,economies=3")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    parser.add_argument("--no-budgets", action="store_true", help="Report only; never fail")
+    args = parser.parse_args()
+
+    with open(args.profile, "r") as f:
+        profile = yaml.safe_load(f) or {}
+    for key, value in (("concurrency", args.concurrency), ("duration_seconds", args.duration), ("warmup_seconds", args.warmup)):
+        if value is not None:
+            profile[key] = value
+    if args.mix:
+        profile["mix"] = {kind: float(weight) for kind, weight in (item.split("=") for item in args.mix.split(","))}
+
+    target = args.url or "in-process app"
+    print(f"--- 🚦 Load Test ({target}, {profile['concurrency']} clients x {profile['duration_seconds']}s) ---")
+    report, n_corridors = asyncio.run(run(profile, args.url))
+    print(f"{'kind':<26} {'requests':>9} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    for kind, stats in report.items():
+        if stats["requests"]:
+            print(
+                f"{kind:<26} {stats['requests']:>9} {stats['rps']:>9.1f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f} {stats['errors']:>7}"
+            )
+
+    violations = [] if args.no_budgets else check_budgets(report, profile.get("budgets"))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"target": target, "profile": profile, "corridors": n_corridors,
+                       "report": report, "violations": violations}, f, indent=2)
+    if violations:
+        print(f"❌ {len(violations)} budget(s) exceeded: " + "; ".join(violations))
+        sys.exit(1)
+    print("✅ All budgets met" if not args.no_budgets else "Budgets not checked")
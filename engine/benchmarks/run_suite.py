@@ -0,0 +1,232 @@
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import yaml
+
+# Run from engine/: python benchmarks/run_suite.py [--sizes 13x9,190x45] [--compare <previous.json>]
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ENGINE_DIR)
+
+from synthetic_data import generate_database
+
+# --- ENGINE BENCHMARK SUITE ---
+# For each data size a seeded synthetic database is generated (and kept under --data-dir for
+# reuse), then a child interpreter is started with a config pointing at it, so every size
+# starts from cold module state exactly like a fresh server. The child times the core
+# functions and the main endpoints (in-process, no worker pool) and the parent writes one
+# JSON document per run; --compare diffs it against an earlier run and fails on regressions.
+
+DEFAULT_SIZES = "13x9,50x20,120x36,190x45"
+SHOCK = {"source_id": "USA", "target_id": "CHN", "industry_id": "D26", "tariff_delta": 25.0}
+
+def summarize(timings):
+    ms = np.asarray(timings) * 1e3
+    return {
+        "runs": int(ms.size), "min_ms": round(float(ms.min()), 4), "median_ms": round(float(np.median(ms)), 4),
+        "mean_ms": round(float(ms.mean()), 4), "p95_ms": round(float(np.percentile(ms, 95)), 4)
+    }
+
+def measure(fn, repeats: int, max_seconds: float, warmup: int = 1):
+    """Times `fn` up to `repeats` times (at least 3) or until `max_seconds` of measured time."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    while len(timings) < repeats and (len(timings) < 3 or sum(timings) < max_seconds):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+def run_cases(repeats: int, max_seconds: float):
+    """Child side: the config in CONFIG_PATH already points at the synthetic database."""
+    from logic import (
+        CONTAGION_DECAY_FACTOR, PROPAGATION_CONFIG, db_connection, get_snapshot, get_propagation_engine,
+        calculate_simulation, discover_crashing_point, scan_importer_exposure, get_available_industries,
+        get_reference_data
+    )
+    from snapshot import TradeSnapshot
+    from propagation import PropagationEngine
+    from models import PolicyShock
+    from fastapi.testclient import TestClient
+    import main
+
+    shock = PolicyShock(**SHOCK)
+    results = {}
+
+    def scan():
+        with db_connection() as conn:
+            return TradeSnapshot.from_connection(conn)
+
+    started = time.perf_counter()
+    get_reference_data()
+    get_propagation_engine()
+    results["startup.cold"] = summarize([time.perf_counter() - started])
+    snap = get_snapshot()
+
+    fine_grid = np.linspace(0.0, 100.0, 10001)
+    cases = {
+        "snapshot.table_scan": scan,
+        "propagation.factorize": lambda: PropagationEngine(
+            snap, CONTAGION_DECAY_FACTOR, method=PROPAGATION_CONFIG.get("method", "factorized"),
+            max_depth=PROPAGATION_CONFIG.get("max_depth", 8), tolerance=PROPAGATION_CONFIG.get("tolerance", 1e-9)
+        ),
+        "calculate_simulation.core": lambda: calculate_simulation(shock, include_sensitivity=False, include_visuals=False),
+        "calculate_simulation.full": lambda: calculate_simulation(shock),
+        "discover_crashing_point.default_grid": lambda: discover_crashing_point(shock),
+        "discover_crashing_point.10k_grid": lambda: discover_crashing_point(shock, fine_grid),
+        "scan_importer_exposure.ranking": lambda: scan_importer_exposure("USA", 25.0, top_n=100),
+        "get_available_industries": lambda: get_available_industries("USA", "CHN"),
+    }
+    for name, fn in cases.items():
+        results[name] = measure(fn, repeats, max_seconds)
+
+    with TestClient(main.app) as client:
+        counter = iter(range(10**9))
+
+        def simulate_cold():
+            # A fresh tariff each call misses the result cache
+            response = client.post("/simulate", json={**SHOCK, "tariff_delta": 25.0 + next(counter) * 1e-4})
+            assert response.status_code == 200, response.text
+
+        def get(url, **params):
+            def call():
+                assert client.get(url, params=params).status_code == 200
+            return call
+
+        endpoints = {
+            "http.simulate.miss": simulate_cold,
+            "http.simulate.hit": lambda: client.post("/simulate", json=SHOCK),
+            "http.economies": get("/economies"),
+            "http.industries_available": get("/api/industries/available", source_id="USA", target_id="CHN"),
+            "http.exposure.ranking": get("/api/exposure/USA", tariff_delta=25.0, top_n=100),
+        }
+        for name, fn in endpoints.items():
+            results[name] = measure(fn, repeats, max_seconds)
+
+    return {
+        "economies": len(snap.economy_ids), "industries": len(snap.industry_ids),
+        "trade_rows": int(snap.present.sum()), "snapshot_mb": round(snap.nbytes / 1e6, 2), "cases": results
+    }
+
+def child_config(db_path: str, workdir: str) -> str:
+    """Engine config for a child run: the real config with the database and writable paths swapped out."""
+    with open(os.path.join(ENGINE_DIR, "config", "config.yaml"), "r") as f:
+        config = yaml.safe_load(f) or {}
+    config.setdefault("caching", {})["db_path"] = db_path
+    config.setdefault("snapshot", {})["export_path"] = os.path.join(workdir, "snapshot")
+    config.setdefault("result_cache", {}).setdefault("disk", {})["enabled"] = False
+    config.setdefault("workers", {}).setdefault("process_pool", {})["max_workers"] = 0
+    path = os.path.join(workdir, "config.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+def git_revision():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ENGINE_DIR, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def run_size(n_economies: int, n_industries: int, args) -> dict:
+    db_path = os.path.join(args.data_dir, f"synthetic_{n_economies}x{n_industries}_s{args.seed}.db")
+    if args.regenerate or not os.path.exists(db_path):
+        dataset = generate_database(db_path, n_economies, n_industries, seed=args.seed, density=args.density)
+    else:
+        dataset = {"path": db_path, "seed": args.seed, "density": args.density}
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, "result.json")
+        env = {**os.environ, "CONFIG_PATH": child_config(os.path.abspath(db_path), workdir)}
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", output,
+             "--repeats", str(args.repeats), "--max-seconds", str(args.max_seconds)],
+            cwd=ENGINE_DIR, env=env, capture_output=not args.verbose, text=True
+        )
+        if child.returncode != 0:
+            print((child.stderr or "")[-4000:])
+            raise SystemExit(f"Benchmark run for {n_economies}x{n_industries} failed (exit {child.returncode})")
+        with open(output, "r") as f:
+            measured = json.load(f)
+    return {**dataset, **measured}
+
+def compare(current: dict, previous: dict, threshold: float):
+    """Prints median ratios per (size, case); returns the cases slower than `threshold` x."""
+    regressions = []
+    baseline = {(s["economies"], s["industries"]): s["cases"] for s in previous.get("sizes", [])}
+    print(f"--- 🔍 Against {previous.get('git', {}).get('commit') or 'previous run'} (median, x slower) ---")
+    for size in current["sizes"]:
+        before = baseline.get((size["economies"], size["industries"]))
+        if before is None:
+            continue
+        for case, stats in size["cases"].items():
+            if case not in before or not before[case]["median_ms"]:
+                continue
+            ratio = stats["median_ms"] / before[case]["median_ms"]
+            flag = " ⚠️" if ratio > threshold else ""
+            print(f"{size['economies']:>4}x{size['industries']:<3} {case:<38} {ratio:6.2f}x{flag}")
+            if ratio > threshold:
+                regressions.append(f"{size['economies']}x{size['industries']} {case}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the engine's core functions and endpoints on synthetic data")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated <economies>x<industries>")
+    parser.add_argument("--repeats", type=int, default=20, help="Max timed runs per case")
+    parser.add_argument("--max-seconds", type=float, default=3.0, help="Stop timing a case after this much measured time")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--density", type=float, default=0.35)
+    parser.add_argument("--data-dir", default="data/bench", help="Where generated databases are kept for reuse")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the databases even if present")
+    parser.add_argument("--output", default=None, help="Results JSON (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to diff against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Median slowdown that counts as a regression")
+    parser.add_argument("--verbose", action="store_true", help="Show the engine's own output")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.child, "w") as f:
+            json.dump(run_cases(args.repeats, args.max_seconds), f)
+        sys.exit(0)
+
+    revision = git_revision()
+    report = {
+        "suite": "tipm-engine", "format": 1, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": revision,
+        "environment": {
+            "python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "params": {"repeats": args.repeats, "max_seconds": args.max_seconds, "seed": args.seed, "density": args.density},
+        "sizes": []
+    }
+    for size in args.sizes.split(","):
+        n_economies, n_industries = (int(n) for n in size.lower().split("x"))
+        print(f"--- ⏱️ {n_economies} economies x {n_industries} industries ---")
+        result = run_size(n_economies, n_industries, args)
+        report["sizes"].append(result)
+        for case, stats in result["cases"].items():
+            print(f"{case:<38} median {stats['median_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms   ({stats['runs']} runs)")
+
+    output = args.output or os.path.join(
+        ENGINE_DIR, "benchmarks", "results",
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{(revision['commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) above {args.threshold}x: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+import argparse
+import numpy as np
+
+# Run from engine/: python benchmarks/synthetic_data.py --economies 190 --industries 45
+
+# --- SYNTHETIC FULL-SCALE DATASET ---
+# Writes a trade_matrix database of any size with the engine's SQLite schema. The seed
+# economies and industries come first (so USA/CHN/D26 shocks work at every size) and are
+# padded with synthetic ones. Flows follow a gravity model: value added grows with both
+# partners' GDP, larger pairs trade in more sectors, and every cell carries lognormal noise.
+# The same (size, seed, density) always yields the same database.
+
+SCHEMA = """
+CREATE TABLE economies (id TEXT PRIMARY KEY, name TEXT NOT NULL, region TEXT, gdp_usd_bn REAL NOT NULL,
+                        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE industries (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT);
+CREATE TABLE trade_matrix (id INTEGER PRIMARY KEY AUTOINCREMENT, source_econ_id TEXT NOT NULL,
+                           target_econ_id TEXT NOT NULL, industry_id TEXT NOT NULL,
+                           value_added_usd_mn REAL NOT NULL, baseline_tariff_pct REAL NOT NULL DEFAULT 0.0,
+                           UNIQUE(source_econ_id, target_econ_id, industry_id));
+"""
+
+SEED_ECONOMIES = [
+    ("USA", "United States", "North America", 29000.0), ("CHN", "China", "East Asia", 18800.0),
+    ("SGP", "Singapore", "Southeast Asia", 547.0), ("MYS", "Malaysia", "Southeast Asia", 400.0),
+    ("VNM", "Vietnam", "Southeast Asia", 400.0), ("JPN", "Japan", "East Asia", 4200.0),
+    ("DEU", "Germany", "Europe", 4500.0), ("GBR", "United Kingdom", "Europe", 3300.0),
+    ("FRA", "France", "Europe", 3000.0), ("IND", "India", "South Asia", 3900.0),
+    ("IDN", "Indonesia", "Southeast Asia", 1400.0), ("KOR", "South Korea", "East Asia", 1700.0),
+    ("AUS", "Australia", "Oceania", 1700.0),
+]
+
+SEED_INDUSTRIES = [
+    ("D26", "Computer, electronic and optical products", "Manufacturing"),
+    ("D27", "Electrical equipment", "Manufacturing"),
+    ("D28", "Machinery and equipment n.e.c.", "Manufacturing"),
+    ("D29", "Motor vehicles, trailers and semi-trailers", "Manufacturing"),
+    ("D01T03", "Agriculture, forestry and fishing", "Primary"),
+    ("D05T09", "Mining and quarrying", "Primary"),
+    ("D64T66", "Financial and insurance activities", "Services"),
+    ("D61", "Telecommunications", "Services"),
+    ("D62T63", "IT and other information services", "Services"),
+]
+
+REGIONS = ["Africa", "Europe", "Latin America", "Middle East", "South Asia", "Southeast Asia", "Oceania", "Central Asia"]
+CATEGORY_MIX = {"Manufacturing": 0.55, "Services": 0.30, "Primary": 0.15}
+
+def synthetic_reference(n_economies: int, n_industries: int, rng: np.random.Generator):
+    """Seed economies/industries padded with synthetic ones; GDP of padded economies is lognormal."""
+    economies = list(SEED_ECONOMIES[:n_economies])
+    for n in range(len(economies), n_economies):
+        gdp = float(np.round(np.exp(rng.normal(np.log(60.0), 1.4)), 1))
+        economies.append((f"E{n:03d}", f"Economy {n:03d}", REGIONS[n % len(REGIONS)], max(gdp, 0.5)))
+    industries = list(SEED_INDUSTRIES[:n_industries])
+    categories = rng.choice(list(CATEGORY_MIX), size=n_industries, p=list(CATEGORY_MIX.values()))
+    for n in range(len(industries), n_industries):
+        industries.append((f"S{n:02d}", f"Synthetic sector {n:02d}", str(categories[n])))
+    return economies, industries
+
+def synthetic_flows(gdp: np.ndarray, n_industries: int, rng: np.random.Generator, density: float):
+    """(source, target, industry) indices, value added (USD mn) and baseline tariffs (%) of the present cells."""
+    n = gdp.size
+    # GDP percentile of each economy: big pairs trade in (almost) every sector, small pairs in few
+    percentile = (np.argsort(np.argsort(gdp)) + 1) / n
+    pair_density = np.clip(density * 2 * np.sqrt(np.outer(percentile, percentile)), 0.02, 0.98)
+    np.fill_diagonal(pair_density, 0.0)
+
+    sector_weight = rng.dirichlet(np.full(n_industries, 0.8)) * n_industries
+    present = rng.random((n, n, n_industries)) < pair_density[:, :, np.newaxis]
+    # Anchor corridors of the seed data (CHN -> USA and SGP -> CHN) trade in every sector
+    present[1, 0, :] = present[2, 1, :] = True
+    source, target, industry = np.nonzero(present)
+
+    gravity = (gdp[source] / 1000.0) ** 0.9 * (gdp[target] / 1000.0) ** 0.8
+    value_added = 200.0 * gravity * sector_weight[industry] * rng.lognormal(0.0, 1.0, size=source.size)
+    value_added = np.round(np.maximum(value_added, 0.01), 2)
+
+    # Roughly a third of flows are duty free (FTAs); the rest are right-skewed around a few percent
+    tariff = np.round(rng.gamma(1.3, 3.5, size=source.size), 1)
+    tariff[rng.random(source.size) < 0.35] = 0.0
+    return source, target, industry, value_added, tariff
+
+def generate_database(path: str, n_economies: int = 190, n_industries: int = 45, seed: int = 42,
+                      density: float = 0.35, chunk_size: int = 50000) -> dict:
+    """Writes a synthetic database to `path` (replacing it) and returns its size statistics."""
+    if n_economies < 3 or n_industries < 1:
+        raise ValueError("Need at least 3 economies (USA, CHN, SGP) and 1 industry (D26)")
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    economies, industries = synthetic_reference(n_economies, n_industries, rng)
+    gdp = np.array([e[3] for e in economies], dtype=float)
+    source, target, industry, value_added, tariff = synthetic_flows(gdp, n_industries, rng, density)
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO economies (id, name, region, gdp_usd_bn) VALUES (?, ?, ?, ?)", economies)
+        conn.executemany("INSERT INTO industries (id, name, category) VALUES (?, ?, ?)", industries)
+        economy_ids = [e[0] for e in economies]
+        industry_ids = [i[0] for i in industries]
+        for start in range(0, source.size, chunk_size):
+            window = slice(start, start + chunk_size)
+            conn.executemany(
+                "INSERT INTO trade_matrix (source_econ_id, target_econ_id, industry_id, value_added_usd_mn, "
+                "baseline_tariff_pct) VALUES (?, ?, ?, ?, ?)",
+                zip(
+                    (economy_ids[i] for i in source[window]), (economy_ids[i] for i in target[window]),
+                    (industry_ids[i] for i in industry[window]),
+                    value_added[window].tolist(), tariff[window].tolist()
+                )
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return {
+        "path": path, "economies": n_economies, "industries": n_industries, "seed": seed, "density": density,
+        "trade_rows": int(source.size), "generate_seconds": round(time.perf_counter() - started, 3)
+    }
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic TIPM database")
+    parser.add_argument("--economies", type=int, default=190)
+    parser.add_argument("--industries", type=int, default=45)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--density", type=float, default=0.35, help="Share of present cells for a median economy pair")
+    parser.add_argument("--out", default=None, help="Database path (default data/bench/synthetic_<E>x<I>_s<seed>.db)")
+    args = parser.parse_args()
+
+    out = args.out or f"data/bench/synthetic_{args.economies}x{args.industries}_s{args.seed}.db"
+    print(json.dumps(generate_database(out, args.economies, args.industries, args.seed, args.density), indent=2))
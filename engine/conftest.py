@@ -0,0 +1,34 @@
+import sys
+import os
+import shutil
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+@pytest.fixture(autouse=True, scope="session")
+def snapshot_export_outside_tree(tmp_path_factory):
+    """Snapshot exports made while testing go to a temporary directory, never data/snapshot."""
+    import logic
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setitem(logic.SNAPSHOT_CONFIG, "export_path", str(tmp_path_factory.mktemp("snapshot")))
+        yield
+
+@pytest.fixture
+def isolated_engine(monkeypatch, tmp_path):
+    """
+    Points logic at a copy of the database and a snapshot export under tmp_path, with the
+    module-level snapshot, pool and caches reset. Returns the (db_path, export_path) pair.
+    """
+    import logic
+
+    db_path, export_path = str(tmp_path / "tipm.db"), str(tmp_path / "snapshot")
+    shutil.copy(logic.get_db_path(), db_path)
+    monkeypatch.setitem(logic.DB_CONFIG, "db_path", db_path)
+    monkeypatch.setitem(logic.SNAPSHOT_CONFIG, "mmap", True)
+    monkeypatch.setitem(logic.SNAPSHOT_CONFIG, "export_path", export_path)
+    for name in ("_pool", "_snapshot", "_export_stamp", "_reference", "_propagation", "_result_cache"):
+        monkeypatch.setattr(logic, name, None)
+    monkeypatch.setattr(logic, "_snapshot_reader", False)
+    return db_path, export_path
@@ -0,0 +1,207 @@
+import time
+import sqlite3
+import threading
+import logging
+import metrics
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("SQLitePool")
+
+# --- POOLED SQLITE CONNECTIONS ---
+# A bounded pool of long-lived connections shared by FastAPI's threadpool. Connections run in
+# WAL mode so readers proceed while a refresh writes, and each one keeps sqlite3's prepared
+# statement cache warm across requests.
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",      # Concurrent readers alongside a single writer
+    "synchronous": "NORMAL",    # Safe with WAL, avoids an fsync per commit
+    "busy_timeout": 5000,       # ms to wait on a competing writer instead of "database is locked"
+    "cache_size": -65536,       # Negative = KiB, i.e. 64 MiB page cache per connection
+    "mmap_size": 268435456,     # 256 MiB memory-mapped reads
+    "temp_store": "MEMORY",
+}
+
+def _verb(sql: str) -> str:
+    head = sql.lstrip()[:12].split(None, 1)
+    return head[0].upper() if head else "EMPTY"
+
+def _record(sql: str, started: float):
+    op = _verb(sql)
+    metrics.SQL_QUERIES.inc(op=op)
+    metrics.SQL_SECONDS.observe(time.perf_counter() - started, op=op)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=(), /):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record(sql, started)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record(sql, started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Counts and times statements (metrics.py), whether run on the connection or on its cursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record(sql, started)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record(sql, started)
+
+    def executescript(self, sql_script, /):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _record("SCRIPT", started)
+
+# Errors after which a connection cannot be trusted again; anything else (constraint
+# violations, a busy database, bad SQL) is rolled back and the connection reused
+BROKEN_ERROR_CODES = {sqlite3.SQLITE_CORRUPT, sqlite3.SQLITE_NOTADB, sqlite3.SQLITE_IOERR}
+
+def _connection_broken(error: sqlite3.Error) -> bool:
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return (code & 0xFF) in BROKEN_ERROR_CODES  # Extended codes carry the primary code in the low byte
+    return isinstance(error, sqlite3.ProgrammingError) and "closed" in str(error)
+
+class PoolTimeout(TimeoutError):
+    """No connection became available within the pool's timeout."""
+
+class SQLitePool:
+    """Bounded pool of sqlite3 connections. Use `with pool.connection() as conn:`."""
+
+    def __init__(self, db_path: str, size: int = 8, pragmas: Optional[Dict[str, Any]] = None,
+                 cached_statements: int = 256, timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = max(1, int(size))
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._idle: List[sqlite3.Connection] = []  # LIFO: the most recently used connection is warmest
+        self._available = threading.Condition(threading.Lock())  # Notified when a connection or slot frees up
+        self._created = 0
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        self.discarded = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.timeout, check_same_thread=False,
+            cached_statements=self.cached_statements, factory=InstrumentedConnection
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                if self._idle:
+                    self.checkouts += 1
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"No database connection became available within {self.timeout:g}s "
+                        f"(all {self.size} pooled connections are checked out)"
+                    )
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                self._available.wait(remaining)
+        try:
+            conn = self._connect()
+        except Exception:
+            self._discard(None)
+            raise
+        with self._available:
+            self.checkouts += 1
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # Never hand out a connection with someone else's open transaction
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._available:
+            if not self._closed:
+                self._idle.append(conn)
+                self._available.notify()
+                return
+        conn.close()
+
+    def _discard(self, conn: Optional[sqlite3.Connection]):
+        """Closes a broken connection (or a failed connect) and frees its slot for a waiter."""
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            self.discarded += 1
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        started = time.perf_counter()
+        conn = self._acquire()
+        metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+        try:
+            yield conn
+        except sqlite3.Error as e:
+            if _connection_broken(e):
+                logger.warning(f"Discarding pooled connection after: {e}")
+                self._discard(conn)
+            else:
+                self._release(conn)  # Rolls back whatever the failed statement left open
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def close_all(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size, "created": self._created, "idle": len(self._idle),
+            "checkouts": self.checkouts, "waits": self.waits, "discarded": self.discarded
+        }
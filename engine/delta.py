@@ -0,0 +1,192 @@
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import logging
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import metrics
+
+logger = logging.getLogger("DeltaRefresh")
+
+# --- INCREMENTAL (DELTA) REFRESH ---
+# Every tracked dataset keeps a content hash per row in `row_hashes`. A refresh stages the
+# incoming rows with their hashes, diffs them against the stored hashes in SQL, and writes only
+# the rows that changed (in chunked executemany). The (economy, industry) keys touched by each
+# refresh are recorded in `data_changes` so caches can be invalidated selectively.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS row_hashes (
+    dataset TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    source TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dataset, row_key)
+);
+CREATE TABLE IF NOT EXISTS data_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    refresh_id TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    economy_id TEXT NOT NULL,
+    industry_id TEXT,  -- NULL: every industry of the economy
+    changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_data_changes_refresh ON data_changes(refresh_id);
+"""
+
+KEY_SEPARATOR = "\x1f"
+
+@dataclass(frozen=True)
+class DeltaDataset:
+    """A set of columns in one table whose rows are refreshed together from one source."""
+    name: str
+    table: str
+    key_columns: Tuple[str, ...]
+    value_columns: Tuple[str, ...]
+    write_sql: str  # Named parameters, one per key and value column
+    affected: Callable[[Tuple[str, ...]], List[Tuple[str, Optional[str]]]]  # row key -> (economy, industry) keys
+
+ECONOMY_GDP = DeltaDataset(
+    name="economies.gdp", table="economies", key_columns=("id",), value_columns=("gdp_usd_bn",),
+    write_sql="UPDATE economies SET gdp_usd_bn = :gdp_usd_bn, last_updated = CURRENT_TIMESTAMP WHERE id = :id",
+    affected=lambda key: [(key[0], None)]
+)
+
+TRADE_VALUE_ADDED = DeltaDataset(
+    name="trade_matrix.value_added", table="trade_matrix",
+    key_columns=("source_econ_id", "target_econ_id", "industry_id"), value_columns=("value_added_usd_mn",),
+    write_sql="""
+        INSERT INTO trade_matrix (source_econ_id, target_econ_id, industry_id, value_added_usd_mn)
+        VALUES (:source_econ_id, :target_econ_id, :industry_id, :value_added_usd_mn)
+        ON CONFLICT (source_econ_id, target_econ_id, industry_id)
+        DO UPDATE SET value_added_usd_mn = excluded.value_added_usd_mn
+    """,
+    affected=lambda key: [(key[0], key[2]), (key[1], key[2])]
+)
+
+TRADE_BASELINE_TARIFF = DeltaDataset(
+    name="trade_matrix.baseline_tariff", table="trade_matrix",
+    key_columns=("source_econ_id", "target_econ_id", "industry_id"), value_columns=("baseline_tariff_pct",),
+    write_sql="""
+        UPDATE trade_matrix SET baseline_tariff_pct = :baseline_tariff_pct
+        WHERE source_econ_id = :source_econ_id AND target_econ_id = :target_econ_id AND industry_id = :industry_id
+    """,
+    affected=lambda key: [(key[0], key[2]), (key[1], key[2])]
+)
+
+@dataclass
+class ChangeSet:
+    """Outcome of one delta refresh."""
+    refresh_id: str
+    dataset: str
+    rows_in: int = 0
+    rows_changed: int = 0
+    keys: Set[Tuple[str, Optional[str]]] = field(default_factory=set)  # (economy_id, industry_id or None)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return self.rows_changed > 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "refresh_id": self.refresh_id, "dataset": self.dataset,
+            "rows_in": self.rows_in, "rows_changed": self.rows_changed,
+            "changed_keys": sorted([economy, industry] for economy, industry in self.keys),
+            "elapsed_seconds": round(self.elapsed_seconds, 3)
+        }
+
+def ensure_schema(conn: sqlite3.Connection):
+    conn.executescript(SCHEMA)
+
+def content_hash(values: Sequence[Any]) -> str:
+    """Hash of a row's values; floats are normalized so 10 and 10.0 (or DB round-trips) agree."""
+    normalized = [round(float(v), 9) if isinstance(v, (int, float)) else v for v in values]
+    return hashlib.blake2b(json.dumps(normalized).encode(), digest_size=12).hexdigest()
+
+def _chunks(rows: Iterable[Any], size: int):
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _bootstrap_hashes(conn: sqlite3.Connection, dataset: DeltaDataset, chunk_size: int):
+    """First run for a dataset: hash the rows already in the table so they count as unchanged."""
+    if conn.execute("SELECT 1 FROM row_hashes WHERE dataset = ? LIMIT 1", (dataset.name,)).fetchone():
+        return
+    columns = ", ".join(dataset.key_columns + dataset.value_columns)
+    n_key = len(dataset.key_columns)
+    cursor = conn.execute(f"SELECT {columns} FROM {dataset.table}")
+    for chunk in _chunks(cursor, chunk_size):
+        conn.executemany(
+            "INSERT OR REPLACE INTO row_hashes (dataset, row_key, content_hash, source) VALUES (?, ?, ?, 'bootstrap')",
+            [(dataset.name, KEY_SEPARATOR.join(map(str, row[:n_key])), content_hash(row[n_key:])) for row in chunk]
+        )
+
+def apply_delta(conn: sqlite3.Connection, dataset: DeltaDataset, rows: Iterable[Tuple[Tuple, Tuple]],
+                source: str, refresh_id: Optional[str] = None, chunk_size: int = 5000) -> ChangeSet:
+    """
+    Writes the rows of `rows` ((key..., ) , (values..., )) whose content differs from what was
+    last written for `dataset`, in one transaction. Returns the changed rows' (economy, industry) keys.
+    """
+    started = time.perf_counter()
+    changes = ChangeSet(refresh_id=refresh_id or uuid.uuid4().hex[:12], dataset=dataset.name)
+    columns = dataset.key_columns + dataset.value_columns
+    n_key = len(dataset.key_columns)
+
+    ensure_schema(conn)
+    with conn:
+        _bootstrap_hashes(conn, dataset, chunk_size)
+        conn.execute("DROP TABLE IF EXISTS temp.delta_incoming")
+        conn.execute(
+            f"CREATE TEMP TABLE delta_incoming (row_key TEXT PRIMARY KEY, content_hash TEXT NOT NULL, "
+            f"{', '.join(columns)})"
+        )
+        placeholders = ", ".join("?" for _ in range(len(columns) + 2))
+        for chunk in _chunks(rows, chunk_size):
+            conn.executemany(
+                f"INSERT OR REPLACE INTO delta_incoming VALUES ({placeholders})",
+                [(KEY_SEPARATOR.join(map(str, key)), content_hash(values), *key, *values) for key, values in chunk]
+            )
+            changes.rows_in += len(chunk)
+
+        # Diff in SQL: new keys and keys whose hash moved
+        conn.execute("DROP TABLE IF EXISTS temp.delta_changed")
+        conn.execute(f"""
+            CREATE TEMP TABLE delta_changed AS
+            SELECT i.row_key, i.content_hash, {', '.join('i.' + c for c in columns)}
+            FROM delta_incoming i
+            LEFT JOIN row_hashes h ON h.dataset = ? AND h.row_key = i.row_key
+            WHERE h.content_hash IS NULL OR h.content_hash != i.content_hash
+        """, (dataset.name,))
+
+        for chunk in _chunks(conn.execute("SELECT * FROM delta_changed"), chunk_size):
+            conn.executemany(dataset.write_sql, [dict(zip(columns, row[2:])) for row in chunk])
+            conn.executemany(
+                "INSERT OR REPLACE INTO row_hashes (dataset, row_key, content_hash, source, updated_at) "
+                "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                [(dataset.name, row[0], row[1], source) for row in chunk]
+            )
+            for row in chunk:
+                changes.keys.update(dataset.affected(tuple(row[2:2 + n_key])))
+            changes.rows_changed += len(chunk)
+
+        conn.executemany(
+            "INSERT INTO data_changes (refresh_id, dataset, economy_id, industry_id) VALUES (?, ?, ?, ?)",
+            [(changes.refresh_id, dataset.name, economy, industry) for economy, industry in changes.keys]
+        )
+        conn.execute("DROP TABLE temp.delta_incoming")
+        conn.execute("DROP TABLE temp.delta_changed")
+
+    changes.elapsed_seconds = time.perf_counter() - started
+    metrics.STAGE_SECONDS.observe(changes.elapsed_seconds, stage=f"delta.{dataset.name}")
+    logger.info(
+        f"Delta refresh {changes.refresh_id} [{dataset.name}]: {changes.rows_changed}/{changes.rows_in} rows changed, "
+        f"{len(changes.keys)} keys in {changes.elapsed_seconds:.3f}s"
+    )
+    return changes
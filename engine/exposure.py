@@ -0,0 +1,148 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from snapshot import TradeSnapshot
+from propagation import PropagationEngine
+from sweep import importer_balance
+
+# --- BILATERAL EXPOSURE SCAN ---
+# For one importer and one tariff delta, evaluates steps 2-4 of calculate_simulation for every
+# exporter x industry pair at once: arrays are (exporters, industries) slices of the snapshot,
+# and upstream contagion uses the propagation engine's total exposure per (exporter, industry).
+
+def scan_exposure(snap: TradeSnapshot, engine: PropagationEngine, importer_idx: int, tariff_delta: float,
+                  decay_factor: float, reactive_parameters: Callable[[str], Dict[str, float]]) -> Dict[str, Any]:
+    """Returns (E x I) arrays of importer net impact, global drain and their components."""
+    va = snap.value_added[:, importer_idx, :]
+    tariff_factor = (snap.baseline_tariff[:, importer_idx, :] + tariff_delta) / 100.0
+    traded = snap.present[:, importer_idx, :] & snap.has_profile[:, np.newaxis]
+    traded[importer_idx, :] = False  # An importer cannot tariff its own exports
+
+    # --- 2. EXPORTER ---
+    direct_loss = va * tariff_factor
+
+    # --- 3. UPSTREAM (all tiers, summed over suppliers) ---
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exposure_ratio = np.where(va != 0, engine.total_exposures() / va, 0.0)
+    upstream_loss = (direct_loss * exposure_ratio) * decay_factor
+
+    # --- 4. IMPORTER (coefficients vary by industry category) ---
+    params = [reactive_parameters(category or "Manufacturing") for category in snap.industry_categories]
+    coefficient = lambda name: np.array([p[name] for p in params], dtype=float)[np.newaxis, :]
+    balance = importer_balance(
+        direct_loss, tariff_factor, tariff_delta,
+        coefficient("wealth_transfer"), coefficient("blowback_base"), coefficient("drag_coeff"),
+        snap.gdp_usd_bn[:, np.newaxis]
+    )
+    has_importer = bool(snap.has_profile[importer_idx])
+    net_importer = balance["net_importer_mn"] if has_importer else np.zeros_like(direct_loss)
+
+    # --- 5. GLOBAL DRAIN: losses only ---
+    global_drain = (
+        np.where(direct_loss > 0, direct_loss, 0.0)
+        + np.where(upstream_loss > 0, upstream_loss, 0.0)
+        + np.where(net_importer < 0, -net_importer, 0.0)
+    )
+
+    # Governance check: a zero tariff delta is policy neutral
+    active = traded & (tariff_delta != 0)
+    masked = lambda array: np.where(active, array, 0.0)
+    return {
+        "traded": traded,
+        "direct_loss_mn": masked(direct_loss),
+        "upstream_loss_mn": masked(upstream_loss),
+        "net_importer_mn": masked(net_importer),
+        "global_drain_mn": masked(global_drain),
+    }
+
+@dataclass
+class ExposureRows:
+    """
+    The rows of one scan as compact arrays, already ordered and cut to `top_n`. Cheap to pickle
+    out of a worker; rows become dicts only while they are streamed (see chunks).
+    `ranking`: `exporters`/`industries` index each row. `matrix`: `exporters` indexes each row
+    and the value columns are (rows, industries) with `traded` marking the cells to report.
+    """
+    mode: str
+    economy_ids: Sequence[str]
+    industry_ids: Sequence[str]
+    exporters: np.ndarray
+    industries: Optional[np.ndarray]
+    traded: Optional[np.ndarray]
+    columns: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return int(self.exporters.size)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self, size: int = 512) -> Iterator[List[Dict[str, Any]]]:
+        for start in range(0, len(self), max(1, size)):
+            yield self._rows(start, min(start + size, len(self)))
+
+    def _rows(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        if self.mode == "matrix":
+            rows = []
+            for k in range(start, stop):
+                row_mask = self.traded[k]
+                cells = lambda name: [round(float(v), 4) if m else None for v, m in zip(self.columns[name][k], row_mask)]
+                rows.append({
+                    "exporter_id": self.economy_ids[self.exporters[k]],
+                    "net_importer_mn": cells("net_importer_mn"),
+                    "global_drain_mn": cells("global_drain_mn"),
+                })
+            return rows
+        values = {name: column[start:stop].tolist() for name, column in self.columns.items()}
+        return [
+            {
+                "rank": start + offset + 1,
+                "exporter_id": self.economy_ids[e],
+                "industry_id": self.industry_ids[i],
+                "net_importer_mn": values["net_importer_mn"][offset],
+                "global_drain_mn": values["global_drain_mn"][offset],
+                "direct_loss_mn": values["direct_loss_mn"][offset],
+                "upstream_loss_mn": values["upstream_loss_mn"][offset],
+            }
+            for offset, (e, i) in enumerate(zip(self.exporters[start:stop].tolist(), self.industries[start:stop].tolist()))
+        ]
+
+def exposure_rows(snap: TradeSnapshot, scan: Dict[str, Any], mode: str = "ranking", top_n: Optional[int] = None,
+                  sort: str = "global_drain") -> ExposureRows:
+    """
+    Compact rows for streaming. `matrix` has one row per exporter with per-industry lists
+    (None where there is no trade); `ranking` has traded pairs ordered by `sort`.
+    """
+    traded = scan["traded"]
+    if mode == "matrix":
+        exporters = np.flatnonzero(traded.any(axis=1))
+        return ExposureRows(
+            mode, snap.economy_ids, snap.industry_ids, exporters, None, traded[exporters],
+            {name: scan[name][exporters] for name in ("net_importer_mn", "global_drain_mn")}
+        )
+
+    exporters, industries = np.nonzero(traded)
+    if sort == "importer_net":
+        order = np.argsort(scan["net_importer_mn"][exporters, industries], kind="stable")  # Worst for the importer first
+    else:
+        order = np.argsort(-scan["global_drain_mn"][exporters, industries], kind="stable")
+    if top_n is not None:
+        order = order[:top_n]
+    exporters, industries = exporters[order], industries[order]
+    return ExposureRows(
+        mode, snap.economy_ids, snap.industry_ids, exporters, industries, None,
+        {name: scan[name][exporters, industries]
+         for name in ("net_importer_mn", "global_drain_mn", "direct_loss_mn", "upstream_loss_mn")}
+    )
+
+def exposure_header(snap: TradeSnapshot, scan: Dict[str, Any], importer_id: str, tariff_delta: float,
+                    mode: str) -> Dict[str, Any]:
+    header = {
+        "importer_id": importer_id, "tariff_delta": tariff_delta, "mode": mode,
+        "pairs": int(scan["traded"].sum()),
+        "total_global_drain_mn": float(scan["global_drain_mn"].sum()),
+    }
+    if mode == "matrix":
+        header["industry_ids"] = list(snap.industry_ids)
+    return header
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import contextlib
+import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+logger = logging.getLogger("IngestionHTTP")
+
+# --- SHARED HTTP LAYER FOR INGESTORS ---
+# All ingestors fetch through one pooled client per cache directory. Successful responses are
+# kept on disk, keyed by URL and params. A later fetch sends If-None-Match/If-Modified-Since and a
+# 304 replays the stored body, so a refresh with unchanged upstream data costs one tiny round
+# trip per resource. Modes:
+#   online  - revalidate (or serve entries younger than max_age_seconds without a request)
+#   offline - replay from the cache only; a miss raises OfflineCacheMiss (CI fixtures)
+#   refresh - always refetch unconditionally, then store
+# TIPM_HTTP_MODE overrides the configured mode.
+
+MODES = ("online", "offline", "refresh")
+
+class HTTPLayerError(Exception):
+    """Base class for failures surfaced by the ingestion HTTP layer."""
+
+class TransportError(HTTPLayerError):
+    """Connection failure, timeout or similar; no response was received."""
+
+class HTTPStatusError(HTTPLayerError):
+    def __init__(self, status_code: int, url: str):
+        super().__init__(f"HTTP {status_code} for {url}")
+        self.status_code = status_code
+
+class OfflineCacheMiss(HTTPLayerError):
+    """Offline mode and the request has no cached response."""
+
+class CachedResponse:
+    """Minimal response object shared by the sync and async paths."""
+
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str], url: str,
+                 from_cache: bool = False, revalidated: bool = False, body_path: Optional[str] = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+        self.from_cache = from_cache      # Body served from disk (304 or fresh/offline hit)
+        self.revalidated = revalidated    # Upstream confirmed the cached body with a 304
+        self.body_path = body_path
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPStatusError(self.status_code, self.url)
+
+def cache_key(url: str, params: Optional[Dict[str, Any]]) -> str:
+    normalized = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    return hashlib.sha256(json.dumps([url, normalized]).encode()).hexdigest()[:40]
+
+class ResponseCache:
+    """Directory of `<key>.body` payloads with `<key>.json` metadata (validators, fetch time)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _files(self, key: str) -> Tuple[str, str]:
+        return os.path.join(self.path, f"{key}.json"), os.path.join(self.path, f"{key}.body")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        meta_path, body_path = self._files(key)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        meta["body_path"] = body_path
+        return meta
+
+    def read_body(self, meta: Dict[str, Any]) -> bytes:
+        with open(meta["body_path"], "rb") as f:
+            return f.read()
+
+    def body_tmp_path(self, key: str) -> str:
+        return f"{self._files(key)[1]}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def store(self, key: str, url: str, params: Optional[Dict[str, Any]], headers: Dict[str, str],
+              body: Optional[bytes] = None, body_tmp: Optional[str] = None) -> Dict[str, Any]:
+        """Writes body then metadata, each atomically; pass `body_tmp` to adopt a streamed file."""
+        meta_path, body_path = self._files(key)
+        if body_tmp is None:
+            body_tmp = self.body_tmp_path(key)
+            with open(body_tmp, "wb") as f:
+                f.write(body)
+        os.replace(body_tmp, body_path)
+        meta = {
+            "url": url, "params": params or {}, "fetched_at": time.time(),
+            "etag": headers.get("etag"), "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type")
+        }
+        self.touch(key, meta)
+        meta["body_path"] = body_path
+        return meta
+
+    def touch(self, key: str, meta: Dict[str, Any]):
+        meta_path, _ = self._files(key)
+        meta = {k: v for k, v in meta.items() if k != "body_path"}
+        meta["fetched_at"] = time.time()
+        tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+class IngestionHTTP:
+    """Pooled, disk-cached HTTP client shared by the ingestors. Thread-safe for sync calls."""
+
+    def __init__(self, cache_dir: Optional[str] = None, mode: str = "online", max_age_seconds: float = 0,
+                 pool_maxsize: int = 10, timeout: float = 30.0):
+        mode = os.environ.get("TIPM_HTTP_MODE", mode)
+        if mode not in MODES:
+            raise ValueError(f"Unknown HTTP cache mode: {mode} (expected one of {MODES})")
+        self.mode = mode
+        self.max_age_seconds = max_age_seconds
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.stats_counts = {"network": 0, "not_modified": 0, "cache_hits": 0, "stored": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "IngestionHTTP":
+        http = config.get("ingestion", {}).get("http", {})
+        return cls(
+            cache_dir=http.get("cache_dir") if http.get("cache_enabled", True) else None,
+            mode=http.get("mode", "online"),
+            max_age_seconds=http.get("max_age_seconds", 0),
+            pool_maxsize=http.get("pool_maxsize", 10),
+            timeout=http.get("timeout_seconds", 30.0)
+        )
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats_counts[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "cache_dir": self.cache.path if self.cache else None, **self.stats_counts}
+
+    # --- SHARED DECISIONS ---
+    def _lookup(self, url: str, params: Optional[Dict[str, Any]]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        key = cache_key(url, params)
+        meta = self.cache.load(key) if self.cache else None
+        if self.mode == "offline" and meta is None:
+            raise OfflineCacheMiss(f"No cached response for {url} {params or {}}")
+        return key, meta
+
+    def _serve_cached(self, key: str, meta: Dict[str, Any], url: str, revalidated: bool = False,
+                      read_body: bool = True) -> CachedResponse:
+        self._count("not_modified" if revalidated else "cache_hits")
+        if revalidated:
+            self.cache.touch(key, meta)
+        headers = {"etag": meta.get("etag") or "", "content-type": meta.get("content_type") or ""}
+        return CachedResponse(
+            200, self.cache.read_body(meta) if read_body else b"", headers, url,
+            from_cache=True, revalidated=revalidated, body_path=meta["body_path"]
+        )
+
+    def _fresh(self, meta: Optional[Dict[str, Any]]) -> bool:
+        if meta is None:
+            return False
+        if self.mode == "offline":
+            return True
+        return self.mode == "online" and time.time() - meta["fetched_at"] < self.max_age_seconds
+
+    def _conditional_headers(self, meta: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+        merged = dict(headers or {})
+        if meta is not None and self.mode == "online":
+            if meta.get("etag"):
+                merged["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                merged["If-Modified-Since"] = meta["last_modified"]
+        return merged
+
+    # --- SYNC ---
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None) -> CachedResponse:
+        key, meta = self._lookup(url, params)
+        if self._fresh(meta):
+            return self._serve_cached(key, meta, url)
+        try:
+            response = self.session.get(
+                url, params=params, headers=self._conditional_headers(meta, headers), timeout=timeout or self.timeout
+            )
+        except requests.RequestException as e:
+            raise TransportError(str(e)) from e
+        return self._complete(key, meta, url, params, response.status_code, response.headers, response.content)
+
+    def download(self, url: str, params: Optional[Dict[str, Any]] = None, dest_path: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> CachedResponse:
+        """
+        Streams a large resource to disk without holding it in memory. The body lands in the cache
+        (or `dest_path` when caching is off) and is copied to `dest_path` if given; `content` stays empty.
+        """
+        if self.cache is None and dest_path is None:
+            raise ValueError("download() needs dest_path when the response cache is disabled")
+        key, meta = self._lookup(url, params)
+        if self._fresh(meta):
+            response = self._serve_cached(key, meta, url, read_body=False)
+        else:
+            try:
+                with self.session.get(url, params=params, headers=self._conditional_headers(meta, headers),
+                                      timeout=timeout or self.timeout, stream=True) as upstream:
+                    self._count("network")
+                    if upstream.status_code == 304 and meta is not None:
+                        response = self._serve_cached(key, meta, url, revalidated=True, read_body=False)
+                    elif upstream.status_code != 200:
+                        return CachedResponse(upstream.status_code, b"", dict(upstream.headers), url)
+                    else:
+                        tmp_path = self.cache.body_tmp_path(key) if self.cache else f"{dest_path}.tmp"
+                        with open(tmp_path, "wb") as f:
+                            for block in upstream.iter_content(chunk_size=1 << 20):
+                                f.write(block)
+                        lowered = {k.lower(): v for k, v in upstream.headers.items()}
+                        if self.cache:
+                            stored = self.cache.store(key, url, params, lowered, body_tmp=tmp_path)
+                            self._count("stored")
+                            body_path = stored["body_path"]
+                        else:
+                            os.replace(tmp_path, dest_path)
+                            body_path = dest_path
+                        response = CachedResponse(200, b"", lowered, url, body_path=body_path)
+            except requests.RequestException as e:
+                raise TransportError(str(e)) from e
+        if dest_path and response.body_path != dest_path:
+            shutil.copyfile(response.body_path, dest_path)
+            response.body_path = dest_path
+        return response
+
+    # --- ASYNC ---
+    @contextlib.asynccontextmanager
+    async def async_session(self, timeout: Optional[float] = None,
+                            max_connections: Optional[int] = None) -> AsyncIterator["AsyncIngestionSession"]:
+        """Pooled httpx client for one event loop, backed by the same disk cache."""
+        limits = httpx.Limits(max_connections=max_connections or self.pool_maxsize)
+        async with httpx.AsyncClient(timeout=timeout or self.timeout, limits=limits) as client:
+            yield AsyncIngestionSession(self, client)
+
+    def _complete(self, key: str, meta: Optional[Dict[str, Any]], url: str, params: Optional[Dict[str, Any]],
+                  status_code: int, headers: Any, content: bytes) -> CachedResponse:
+        self._count("network")
+        if status_code == 304 and meta is not None:
+            return self._serve_cached(key, meta, url, revalidated=True)
+        lowered = {k.lower(): v for k, v in headers.items()}
+        body_path = None
+        if status_code == 200 and self.cache is not None:
+            body_path = self.cache.store(key, url, params, lowered, body=content)["body_path"]
+            self._count("stored")
+        return CachedResponse(status_code, content, lowered, url, body_path=body_path)
+
+class AsyncIngestionSession:
+    def __init__(self, http: IngestionHTTP, client: httpx.AsyncClient):
+        self._http = http
+        self._client = client
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        http = self._http
+        key, meta = http._lookup(url, params)
+        if http._fresh(meta):
+            return http._serve_cached(key, meta, url)
+        try:
+            response = await self._client.get(url, params=params, headers=http._conditional_headers(meta, headers))
+        except httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        return http._complete(key, meta, url, params, response.status_code, response.headers, response.content)
+
+# --- SHARED CLIENTS ---
+_clients: Dict[Tuple, IngestionHTTP] = {}
+_clients_lock = threading.Lock()
+
+def get_http_client(config: Dict[str, Any]) -> IngestionHTTP:
+    """One client (connection pool + cache) per distinct `ingestion.http` configuration."""
+    http = config.get("ingestion", {}).get("http", {})
+    key = (json.dumps(http, sort_keys=True), os.environ.get("TIPM_HTTP_MODE"))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = IngestionHTTP.from_config(config)
+            _clients[key] = client
+        return client
@@ -1,9 +1,104 @@
-import requests
+import io
+import re
+import csv
+import gzip
+import time
+import sqlite3
 import logging
-from typing import Dict, Any, List
+from collections import Counter
+from itertools import islice
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+from delta import ChangeSet, TRADE_VALUE_ADDED, apply_delta
+from ingestion.http_cache import get_http_client
+import metrics
 
 logger = logging.getLogger("OECDTiVAIngestor")
 
+# --- STREAMING BULK LOAD ---
+# TiVA runs to millions of rows, so the loader never materializes the file: CSV records flow
+# through a generator pipeline (read -> filter -> map ISIC to TIPM) into fixed-size chunks that
+# are written with executemany, committing every few chunks. Rows are staged in a temporary
+# table first because several ISIC divisions can map onto one TIPM industry (e.g. 01, 02, 03 ->
+# D01T03); the summed rows then go through the delta writer (delta.py), which rewrites only
+# the rows whose value changed since the last load. TiVA lists aggregate activities next to their
+# detail (D01T03 alongside D01T02 and D03), so each row is staged with its ISIC division range
+# and only the outermost codes present for a corridor are summed; anything nested inside another
+# staged code is already counted by it.
+
+# Column names differ between OECD.Stat exports (COU/PAR/IND) and SDMX-CSV (REF_AREA/...)
+COLUMN_CANDIDATES = {
+    "source": ("REF_AREA", "COU"),
+    "target": ("COUNTERPART_AREA", "PAR"),
+    "industry": ("ACTIVITY", "IND"),
+    "measure": ("MEASURE", "VAR", "INDICATOR"),
+    "year": ("TIME_PERIOD", "TIME"),
+    "value": ("OBS_VALUE", "Value", "VALUE"),
+    "unit_mult": ("UNIT_MULT", "PowerCode Code"),
+}
+
+# (source_econ_id, target_econ_id, industry_id, isic_low, isic_high, value_added_usd_mn)
+StagedRow = Tuple[str, str, str, Optional[int], Optional[int], float]
+
+def open_text(path: str) -> io.TextIOBase:
+    """Opens a plain or gzip-compressed text file for streaming."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+def resolve_columns(header: List[str]) -> Dict[str, Optional[str]]:
+    columns = {}
+    for field, candidates in COLUMN_CANDIDATES.items():
+        columns[field] = next((c for c in candidates if c in header), None)
+    missing = [f for f in ("source", "target", "industry", "value") if columns[f] is None]
+    if missing:
+        raise ValueError(f"TiVA file lacks required columns for: {', '.join(missing)} (header: {header})")
+    return columns
+
+def isic_span(code: str) -> Optional[Tuple[int, int]]:
+    """The ISIC Rev.4 division range of an activity code (`D01T03` -> (1, 3), `C26` -> (26, 26)), or None."""
+    match = re.fullmatch(r"(?:ISIC4_|D|C)?(\d{2})(?:T(\d{2}))?", code.strip())
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2) or match.group(1))
+
+def isic_mapper(industry_ids: Iterable[str]) -> Callable[[str], Optional[str]]:
+    """
+    Maps ISIC Rev.4 codes onto TIPM industry ids. TIPM ids follow TiVA's own `D<from>T<to>`
+    naming, so a code matches either an id exactly (`D26`, `C26`, `26`) or the id whose
+    division range contains it (`02` -> `D01T03`).
+    """
+    ranges = []
+    exact = {}
+    for industry_id in industry_ids:
+        match = re.fullmatch(r"D?(\d{2})(?:T(\d{2}))?", industry_id)
+        if match:
+            low, high = int(match.group(1)), int(match.group(2) or match.group(1))
+            ranges.append((low, high, industry_id))
+            exact[match.group(0).lstrip("D")] = industry_id
+        exact[industry_id] = industry_id
+    cache: Dict[str, Optional[str]] = {}
+
+    def mapper(code: str) -> Optional[str]:
+        if code not in cache:
+            normalized = re.sub(r"^(ISIC4_|D|C)", "", code.strip())
+            mapped = exact.get(code) or exact.get(normalized)
+            if mapped is None:
+                span = isic_span(normalized)
+                if span:
+                    low, high = span
+                    mapped = next((tipm for lo, hi, tipm in ranges if lo <= low and high <= hi), None)
+            cache[code] = mapped
+        return cache[code]
+    return mapper
+
+def chunked(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 class OECDTiVAIngestor:
     """
     Ingestor for OECD TiVA (Trade in Value Added) Dataset.
@@ -13,39 +108,194 @@ class OECDTiVAIngestor:
         self.config = config.get("data_sources", {}).get("oecd_tiva", {})
         self.base_url = self.config.get("base_url", "https://stats.oecd.org/restsdmx/sdmx.ashx/GetData")
         self.dataset_id = self.config.get("dataset_id", "TIVA_2024")
+        bulk = self.config.get("bulk_load", {})
+        self.measure = bulk.get("measure", "EXGR_DVA")
+        self.year = str(bulk.get("year")) if bulk.get("year") is not None else None
+        self.skip_areas = set(bulk.get("skip_areas", []))
+        self.chunk_size = bulk.get("chunk_size", 5000)
+        self.commit_every = bulk.get("commit_every_chunks", 20)
+        self.stats: Counter = Counter()
+        self.unmapped: Counter = Counter()
+        self.changes: Optional[ChangeSet] = None
+        self.http = get_http_client(config)
 
-    def fetch_trade_matrix(self) -> List[Dict[str, Any]]:
+    def fetch_trade_matrix(self, dest_path: str) -> str:
         """
-        Fetches the value added trade flows from OECD.
-        Targets: Inter-Country Trade in Value Added (v2024).
+        Downloads the value added trade flows from OECD as CSV, streamed straight to `dest_path`
+        for `load_file`. Targets: Inter-Country Trade in Value Added (v2024). Unchanged exports are
+        revalidated against the shared response cache instead of downloaded again.
         """
         logger.info(f"Fetching OECD TiVA baseline for {self.dataset_id}")
-        
-        # SDMX API typically returns JSON-stat or SDMX-JSON
-        # We'll use a simplified version for this demo that retrieves key bilateral flows
-        # The actual query would vary based on specific OECD dimensions (Reporter, Partner, Industry)
-        params = {
-            "format": "json",
-            "startTime": "2023", # Use latest available year
-        }
-        
+        params = {"format": "csv"}
+        if self.year:
+            params["startTime"] = params["endTime"] = self.year
+        response = self.http.download(f"{self.base_url}/{self.dataset_id}", params=params, dest_path=dest_path, timeout=60)
+        response.raise_for_status()
+        if response.from_cache:
+            logger.info("OECD TiVA export unchanged upstream; using cached copy")
+        return dest_path
+
+    # --- PIPELINE STAGES ---
+    def read_records(self, path: str) -> Iterator[Dict[str, str]]:
+        """Stage 1: CSV records, one at a time."""
+        with open_text(path) as f:
+            reader = csv.DictReader(f)
+            self._columns = resolve_columns(reader.fieldnames or [])
+            for record in reader:
+                self.stats["rows_read"] += 1
+                yield record
+
+    def select_flows(self, records: Iterable[Dict[str, str]]) -> Iterator[Tuple[str, str, str, float]]:
+        """Stage 2: keeps bilateral flows of the configured measure and year, scaled to USD millions."""
+        for record in records:
+            columns = self._columns
+            if columns["measure"] and self.measure and record[columns["measure"]] != self.measure:
+                continue
+            if columns["year"] and self.year and record[columns["year"]] != self.year:
+                continue
+            source, target = record[columns["source"]].strip(), record[columns["target"]].strip()
+            if source == target or source in self.skip_areas or target in self.skip_areas:
+                continue
+            try:
+                value = float(record[columns["value"]])
+            except (TypeError, ValueError):
+                self.stats["rows_invalid"] += 1
+                continue
+            if columns["unit_mult"] and record.get(columns["unit_mult"]):
+                value *= 10.0 ** (int(record[columns["unit_mult"]]) - 6)  # TIPM stores USD millions
+            yield source, target, record[columns["industry"]], value
+
+    def map_oecd_to_tipm(self, raw_data: Iterable[Tuple[str, str, str, float]],
+                         mapper: Callable[[str], Optional[str]]) -> Iterator[StagedRow]:
+        """
+        Stage 3: maps ISIC rev4 codes to TIPM industry IDs (TradeMatrix schema), keeping each code's
+        division range so that aggregate and detail codes for the same corridor are not both summed.
+        """
+        spans: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+        for source, target, isic_code, value in raw_data:
+            industry_id = mapper(isic_code)
+            if industry_id is None:
+                self.unmapped[isic_code] += 1
+                continue
+            if isic_code not in spans:
+                spans[isic_code] = isic_span(isic_code) or (None, None)
+            self.stats["rows_mapped"] += 1
+            yield (source, target, industry_id, *spans[isic_code], value)
+
+    # --- LOADER ---
+    def load_file(self, conn: sqlite3.Connection, path: str) -> Dict[str, Any]:
+        """
+        Streams a TiVA CSV (optionally .gz) into trade_matrix and returns load statistics.
+        Existing baseline tariffs are preserved; only value added that changed is rewritten, and
+        the resulting ChangeSet is kept on `self.changes`.
+        """
+        started = time.perf_counter()
+        self.stats, self.unmapped = Counter(), Counter()
+        mapper = isic_mapper(row[0] for row in conn.execute("SELECT id FROM industries"))
+        rows = self.map_oecd_to_tipm(self.select_flows(self.read_records(path)), mapper)
+
+        conn.execute("DROP TABLE IF EXISTS temp.tiva_staging")
+        conn.execute("""
+            CREATE TEMP TABLE tiva_staging (
+                source_econ_id TEXT NOT NULL, target_econ_id TEXT NOT NULL,
+                industry_id TEXT NOT NULL, isic_low INTEGER, isic_high INTEGER,
+                value_added_usd_mn REAL NOT NULL
+            )
+        """)
+        conn.commit()
         try:
-            # Note: OECD.Stat API can be slow/unstable. In a production environment, 
-            # we would use a more robust streaming or batch downloader.
-            # For this execution, we're implementing the logic for the engine to consume.
-            # response = requests.get(f"{self.base_url}/{self.dataset_id}", params=params)
-            # response.raise_for_status()
-            
-            # SIMULATED RESPONSE for the verification of logic expansion:
-            # We provide a representative dataset of 190+ economy placeholder structure
-            # to be processed by our batch ingestor.
-            return []
-        except Exception as e:
-            logger.error(f"OECD_FETCH_ERROR: {str(e)}")
-            return []
-
-    def map_oecd_to_tipm(self, raw_data: Any) -> List[Dict[str, Any]]:
-        """Maps raw SDMX records to TIPM TradeMatrix schema."""
-        mapped = []
-        # Logical mapping from OECD ISIC rev4 codes to TIPM industry IDs
-        return mapped
+            for n, chunk in enumerate(chunked(rows, self.chunk_size), start=1):
+                conn.executemany("INSERT INTO tiva_staging VALUES (?, ?, ?, ?, ?, ?)", chunk)
+                if n % self.commit_every == 0:
+                    conn.commit()
+                    self._log_progress(started)
+            conn.execute("CREATE INDEX temp.tiva_staging_cell ON tiva_staging (source_econ_id, target_econ_id, industry_id)")
+            conn.commit()
+
+            staged = time.perf_counter()
+
+            def grouped():
+                yield from (
+                    ((source, target, industry), (value,)) for source, target, industry, value in conn.execute("""
+                        SELECT source_econ_id, target_econ_id, industry_id, SUM(value_added_usd_mn)
+                        FROM tiva_staging AS s
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM tiva_staging AS outer_code
+                            WHERE outer_code.source_econ_id = s.source_econ_id
+                              AND outer_code.target_econ_id = s.target_econ_id
+                              AND outer_code.industry_id = s.industry_id
+                              AND outer_code.isic_low <= s.isic_low AND s.isic_high <= outer_code.isic_high
+                              AND outer_code.isic_high - outer_code.isic_low > s.isic_high - s.isic_low
+                        )
+                        GROUP BY source_econ_id, target_econ_id, industry_id
+                    """)
+                )
+
+            # Only rows whose value moved since the last load are written
+            changes = apply_delta(conn, TRADE_VALUE_ADDED, grouped(), source=self.dataset_id, chunk_size=self.chunk_size)
+            self.stats["rows_upserted"] = changes.rows_changed
+            self.changes = changes
+        finally:
+            conn.execute("DROP TABLE IF EXISTS temp.tiva_staging")
+            conn.commit()
+
+        elapsed = time.perf_counter() - started
+        metrics.STAGE_SECONDS.observe(staged - started, stage="ingest.tiva.stage")
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - staged, stage="ingest.tiva.upsert")
+        for outcome in ("read", "mapped", "invalid", "upserted"):
+            metrics.INGEST_ROWS.inc(self.stats[f"rows_{outcome}"], source="oecd_tiva", outcome=outcome)
+        metrics.INGEST_ROWS.inc(sum(self.unmapped.values()), source="oecd_tiva", outcome="unmapped")
+        report = {
+            **{key: self.stats[key] for key in ("rows_read", "rows_mapped", "rows_invalid", "rows_upserted")},
+            "unmapped_industries": dict(self.unmapped.most_common(20)),
+            "elapsed_seconds": round(elapsed, 3),
+            "upsert_seconds": round(time.perf_counter() - staged, 3),
+            "rows_unchanged": changes.rows_in - changes.rows_changed,
+            "refresh_id": changes.refresh_id,
+            "rows_per_second": round(self.stats["rows_read"] / elapsed) if elapsed else None
+        }
+        logger.info(f"TiVA load complete: {report}")
+        return report
+
+    def _log_progress(self, started: float):
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"TiVA load: {self.stats['rows_read']:,} rows read, {self.stats['rows_mapped']:,} staged "
+            f"({self.stats['rows_read'] / elapsed:,.0f} rows/s)"
+        )
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import json
+    import argparse
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from logic import CONFIG, get_db_path, publish_changes
+
+    parser = argparse.ArgumentParser(description="Stream an OECD TiVA CSV export into trade_matrix.")
+    parser.add_argument("--file", required=True, help="TiVA CSV (or .csv.gz) file")
+    parser.add_argument("--db", default=None, help="SQLite database (defaults to caching.db_path)")
+    parser.add_argument("--measure", default=None, help="Indicator to load (defaults to bulk_load.measure)")
+    parser.add_argument("--year", default=None, help="Reference year (defaults to bulk_load.year)")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ingestor = OECDTiVAIngestor(CONFIG)
+    if args.measure:
+        ingestor.measure = args.measure
+    if args.year:
+        ingestor.year = args.year
+    if args.chunk_size:
+        ingestor.chunk_size = args.chunk_size
+
+    conn = sqlite3.connect(args.db or get_db_path())
+    try:
+        print(json.dumps(ingestor.load_file(conn, args.file), indent=2))
+    finally:
+        conn.close()
+    # Running engines only see the load once the shared snapshot is re-exported
+    if args.db is None or os.path.abspath(args.db) == os.path.abspath(get_db_path()):
+        if not publish_changes([ingestor.changes]):
+            logger.warning("snapshot.mmap is off: running engines serve the previous data until restarted")
@@ -1,18 +1,53 @@
-import requests
 import time
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
+from ingestion.http_cache import AsyncIngestionSession, HTTPLayerError, OfflineCacheMiss, get_http_client
+import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("WorldBankIngestor")
 
+GDP_INDICATOR = "NY.GDP.MKTP.CD"
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter: `rate` requests per second on average, with bursts of
+    up to `capacity`. Shared by all concurrent fetches of one ingestion run.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
 class WorldBankIngestor:
     def __init__(self, config: Dict[str, Any]):
-        self.config = config.get("data_sources", {}).get("worldbank", {})
+        sources = config.get("data_sources", {})
+        self.config = sources.get("worldbank_wdi", sources.get("worldbank", {}))
         self.base_url = self.config.get("base_url")
         self.delay = self.config.get("rate_limit", {}).get("delay_seconds", 1.0)
         self.max_retries = self.config.get("rate_limit", {}).get("max_retries", 3)
+        concurrency = self.config.get("concurrency", {})
+        self.requests_per_second = concurrency.get("requests_per_second", 5.0)
+        self.burst = concurrency.get("burst", 5)
+        self.max_in_flight = concurrency.get("max_in_flight", 4)
+        self.batch_size = concurrency.get("batch_size", 50)
+        self.timeout = concurrency.get("timeout_seconds", 10.0)
+        self.http = get_http_client(config)  # Pooled, disk-cached, shared with the other ingestors
 
     def fetch_gdp(self, country_code: str, year: int = 2023) -> Optional[float]:
         """
@@ -32,7 +67,7 @@ class WorldBankIngestor:
         while retries <= self.max_retries:
             try:
                 logger.info(f"Fetching GDP for {country_code} ({year}) from {url}")
-                response = requests.get(url, params=params, timeout=10)
+                response = self.http.get(url, params=params, timeout=10)
                 
                 if response.status_code == 429:
                     logger.warning("Rate limit hit (429). Backing off...")
@@ -52,7 +87,10 @@ class WorldBankIngestor:
                 logger.warning(f"No GDP data found for {country_code} in {year}")
                 return None
 
-            except requests.exceptions.RequestException as e:
+            except OfflineCacheMiss as e:
+                logger.warning(f"Offline: {e}")
+                return None
+            except HTTPLayerError as e:
                 logger.error(f"API Error fetching GDP for {country_code}: {e}")
                 retries += 1
                 if retries <= self.max_retries:
@@ -72,6 +110,108 @@ class WorldBankIngestor:
             time.sleep(self.delay)  # Mandatory rate limit enforcement
         return results
 
+    # --- CONCURRENT BULK INGESTION ---
+    # The indicator API accepts several countries per call (`/country/USA;CHN/indicator/...`),
+    # so economies are fetched in batches, with up to `max_in_flight` batches in flight and every
+    # request (retries included) paced through one token bucket.
+
+    async def _get_json(self, client: AsyncIngestionSession, bucket: TokenBucket, url: str,
+                        params: Dict[str, Any]) -> Optional[Any]:
+        """GET with rate limiting, exponential backoff on 429 and retry on transport errors."""
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                response = await client.get(url, params=params)
+                if response.status_code == 429:
+                    metrics.INGEST_REQUESTS.inc(source="worldbank", outcome="rate_limited")
+                    retry_after = response.headers.get("Retry-After")
+                    wait = float(retry_after) if retry_after and retry_after.isdigit() else self.delay * (2 ** attempt)
+                    logger.warning(f"Rate limit hit (429). Backing off {wait:.2f}s...")
+                    await asyncio.sleep(wait)
+                    continue
+                response.raise_for_status()
+                metrics.INGEST_REQUESTS.inc(source="worldbank", outcome="ok")
+                return response.json()
+            except OfflineCacheMiss as e:
+                metrics.INGEST_REQUESTS.inc(source="worldbank", outcome="offline_miss")
+                logger.warning(f"Offline: {e}")
+                return None
+            except HTTPLayerError as e:
+                metrics.INGEST_REQUESTS.inc(source="worldbank", outcome="error")
+                logger.error(f"API Error fetching {url}: {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.delay * (2 ** attempt))
+        return None
+
+    async def _fetch_gdp_batch(self, client: AsyncIngestionSession, bucket: TokenBucket, semaphore: asyncio.Semaphore,
+                               country_codes: List[str], year: int) -> Dict[str, float]:
+        """GDP (USD) for a batch of countries, following result pages."""
+        url = f"{self.base_url}/country/{';'.join(country_codes)}/indicator/{GDP_INDICATOR}"
+        results: Dict[str, float] = {}
+        rejected = False
+        page, pages = 1, 1
+        async with semaphore:
+            while page <= pages:
+                params = {"date": str(year), "format": "json", "per_page": max(len(country_codes), 50), "page": page}
+                data = await self._get_json(client, bucket, url, params)
+                if data is None:
+                    break
+                if not isinstance(data, list) or len(data) < 2:
+                    # World Bank answers [{"message": ...}] when any code in the batch is invalid
+                    rejected = True
+                    logger.warning(f"Batch of {len(country_codes)} rejected: {data}")
+                    break
+                pages = int(data[0].get("pages", 1) or 1)
+                for record in data[1] or []:
+                    code = record.get("countryiso3code") or record.get("country", {}).get("id")
+                    if code and record.get("value"):
+                        results[code] = float(record["value"])
+                page += 1
+
+        if rejected and len(country_codes) > 1:
+            # Split the batch to isolate the offending code
+            middle = len(country_codes) // 2
+            halves = await asyncio.gather(
+                self._fetch_gdp_batch(client, bucket, semaphore, country_codes[:middle], year),
+                self._fetch_gdp_batch(client, bucket, semaphore, country_codes[middle:], year)
+            )
+            for half in halves:
+                results.update(half)
+        return results
+
+    async def refresh_all_economies_async(self, country_codes: List[str], year: int = 2023,
+                                          on_batch: Optional[Callable[[List[str], Dict[str, float]], None]] = None
+                                          ) -> Dict[str, float]:
+        """
+        Concurrent counterpart of `refresh_all_economies`: fetches the GDP (USD Billion) of
+        every country in multi-country batches. `on_batch(codes, results)` is called as each
+        batch completes, for progress reporting.
+        """
+        started = time.perf_counter()
+        bucket = TokenBucket(self.requests_per_second, self.burst)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        batches = [country_codes[i:i + self.batch_size] for i in range(0, len(country_codes), self.batch_size)]
+
+        async def fetch(client: AsyncIngestionSession, batch: List[str]) -> Dict[str, float]:
+            fetched = await self._fetch_gdp_batch(client, bucket, semaphore, batch, year)
+            converted = {code: gdp / 1e9 for code, gdp in fetched.items() if code in batch}  # Convert to USD Billion
+            if on_batch is not None:
+                on_batch(batch, converted)
+            return converted
+
+        async with self.http.async_session(timeout=self.timeout, max_connections=self.max_in_flight) as client:
+            fetched = await asyncio.gather(*[fetch(client, batch) for batch in batches])
+
+        results = {code: gdp for batch in fetched for code, gdp in batch.items()}
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="ingest.worldbank.gdp")
+        metrics.INGEST_ROWS.inc(len(results), source="worldbank", outcome="fetched")
+        metrics.INGEST_ROWS.inc(len(country_codes) - len(results), source="worldbank", outcome="missing")
+        logger.info(
+            f"Fetched GDP for {len(results)}/{len(country_codes)} economies in {len(batches)} batches "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
+        return results
+
 if __name__ == "__main__":
     # Simple test mock implementation
     import sys
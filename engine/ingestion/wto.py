@@ -1,9 +1,73 @@
-import requests
+import os
+import time
+import sqlite3
 import logging
-from typing import Dict, Any, Optional
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Any, Iterable, List, Optional
+from delta import ChangeSet, TRADE_BASELINE_TARIFF, apply_delta
+from ingestion.http_cache import HTTPLayerError, get_http_client
+import metrics
 
 logger = logging.getLogger("WTOIngestor")
 
+# --- BULK TARIFF SCHEDULES ---
+# Whole reporter schedules (one row per HS line, MFN or preferential per partner) are read in
+# chunks and reduced with vectorized group-bys to trade-weighted averages per (importer,
+# partner, TIPM industry). A preference replaces the MFN rate of its own HS line only: the
+# other lines of the industry keep their MFN rate and import weight. Lines without an import
+# value count with the mean weight of the weighted lines in their group, and a group without
+# any weights is a simple average. Only cells that exist in trade_matrix are written, through
+# the delta writer.
+
+COLUMN_CANDIDATES = {
+    "reporter": ("reporter", "ReportingEconomyCode", "ReportingEconomyISO3A", "reporter_iso3"),
+    "partner": ("partner", "PartnerEconomyCode", "PartnerEconomyISO3A", "partner_iso3"),
+    "product": ("hs6", "hs_code", "ProductOrSectorCode", "product_code"),
+    "rate": ("tariff_pct", "ad_valorem_pct", "Value", "rate"),
+    "weight": ("import_value", "trade_value", "weight"),
+}
+
+MFN = "*"  # Partner marker for rates applying to every partner without a preference
+GROUP_KEYS = ["importer", "exporter", "industry_id"]
+LINE_KEYS = GROUP_KEYS + ["product"]
+SUM_COLUMNS = ["weighted_rate", "weight", "weighted_lines", "unweighted_rate", "unweighted_lines"]
+
+def line_sums(rate: pd.Series, weight: pd.Series) -> pd.DataFrame:
+    """Per-line terms of the group average (see `average_tariff`); they add up across lines."""
+    weighted = weight > 0
+    return pd.DataFrame({
+        "weighted_rate": np.where(weighted, rate * weight, 0.0),
+        "weight": np.where(weighted, weight, 0.0),
+        "weighted_lines": weighted.astype(int),
+        "unweighted_rate": np.where(weighted, 0.0, rate),
+        "unweighted_lines": (~weighted).astype(int),
+    }, index=rate.index)
+
+def average_tariff(sums: pd.DataFrame) -> np.ndarray:
+    """
+    Trade-weighted mean rate of each group of `line_sums`. Unweighted lines enter with the
+    group's mean line weight; groups without any weighted line fall back to a simple average.
+    """
+    has_weights = sums["weighted_lines"] > 0
+    mean_weight = sums["weight"] / sums["weighted_lines"].where(has_weights, 1)
+    weighted = (sums["weighted_rate"] + mean_weight * sums["unweighted_rate"]) / \
+        (sums["weight"] + mean_weight * sums["unweighted_lines"]).where(has_weights, 1.0)
+    simple = sums["unweighted_rate"] / sums["unweighted_lines"].where(~has_weights, 1)
+    return np.where(has_weights, weighted, simple)
+
+def hs_mapper(prefixes: Dict[str, Optional[str]]) -> Callable[[str], Optional[str]]:
+    """Longest-prefix lookup of HS codes in an HS prefix -> TIPM industry table."""
+    lengths = sorted({len(p) for p in prefixes}, reverse=True)
+
+    def mapper(code: str) -> Optional[str]:
+        digits = "".join(ch for ch in str(code) if ch.isdigit())
+        for length in lengths:
+            if len(digits) >= length and digits[:length] in prefixes:
+                return prefixes[digits[:length]]
+        return None
+    return mapper
+
 class WTOIngestor:
     """
     Ingestor for WTO Data Centre.
@@ -13,17 +77,202 @@ class WTOIngestor:
         self.config = config.get("data_sources", {}).get("wto_data_centre", {})
         self.api_key = self.config.get("api_key")
         self.base_url = self.config.get("base_url", "https://api.wto.org/timeseries/v1")
+        self.http = get_http_client(config)
+        bulk = self.config.get("bulk_tariffs", {})
+        self.indicator = bulk.get("indicator", "HS_M_0010")
+        self.year = bulk.get("year", 2023)
+        self.chunk_rows = bulk.get("chunk_rows", 200000)
+        self.mfn_partner_codes = set(bulk.get("mfn_partner_codes", ["", "000", "WLD", "MFN"]))
+        self.hs_to_tipm: Dict[str, Optional[str]] = {str(k): v for k, v in bulk.get("hs_to_tipm", {}).items()}
+        self.economy_codes: Dict[str, str] = {str(k): v for k, v in bulk.get("economy_codes", {}).items()}
+        self.changes: Optional[ChangeSet] = None
 
-    def get_tariff(self, reporter: str, partner: str, industry_code: str) -> float:
+    def get_tariff(self, reporter: str, partner: str, industry_code: str, year: int = 2023) -> float:
         """
         Fetch the MFN or applied tariff rate for a given bilateral flow.
+        For whole schedules use `load_schedules`.
         """
-        # In practice, this would call /timeseries/v1/data
-        # For the macro-expansion execution, we provide the logic to be called by the refresh task
+        if not self.api_key:
+            logger.info(f"No WTO API key configured; tariff {reporter} -> {partner} ({industry_code}) defaults to 0")
+            return 0.0 # Default to 0 if not found
         try:
             logger.info(f"Fetching WTO tariff: {reporter} -> {partner} ({industry_code})")
-            # Simulation of WTO data logic
-            return 0.0 # Default to 0 if not found
-        except Exception as e:
+            params = {"i": self.indicator, "r": reporter, "p": partner, "pc": industry_code, "ps": str(year), "fmt": "json"}
+            response = self.http.get(
+                f"{self.base_url}/data", params=params, headers={"Ocp-Apim-Subscription-Key": self.api_key}
+            )
+            response.raise_for_status()
+            rows = response.json().get("Dataset") or []
+            return float(rows[0]["Value"]) if rows else 0.0
+        except (HTTPLayerError, ValueError, KeyError) as e:
             logger.error(f"WTO_FETCH_ERROR: {str(e)}")
             return 0.0
+
+    def fetch_schedules(self, reporters: Iterable[str], dest_dir: str) -> List[str]:
+        """
+        Downloads each reporter's full HS6 schedule as CSV (one request per reporter, revalidated
+        through the shared response cache) for `load_schedules`.
+        """
+        if not self.api_key:
+            raise ValueError("WTO bulk download needs data_sources.wto_data_centre.api_key")
+        reverse_codes = {iso: code for code, iso in self.economy_codes.items()}
+        paths = []
+        for reporter in reporters:
+            path = os.path.join(dest_dir, f"wto_{reporter}_{self.year}.csv")
+            params = {
+                "i": self.indicator, "r": reverse_codes.get(reporter, reporter), "pc": "all",
+                "ps": str(self.year), "fmt": "csv", "mode": "codes", "max": 1000000
+            }
+            response = self.http.download(
+                f"{self.base_url}/data", params=params, dest_path=path,
+                headers={"Ocp-Apim-Subscription-Key": self.api_key}
+            )
+            if response.status_code == 200:
+                paths.append(path)
+            else:
+                logger.error(f"WTO_FETCH_ERROR: schedule for {reporter} returned HTTP {response.status_code}")
+        return paths
+
+    # --- VECTORIZED AGGREGATION ---
+    def _economy(self, codes: pd.Series) -> pd.Series:
+        codes = codes.str.strip()
+        numeric = codes.str.fullmatch(r"\d+")
+        padded = codes.where(~numeric, codes.str.zfill(3))
+        return padded.map(lambda code: self.economy_codes.get(code, code))
+
+    def _lines(self, chunk: pd.DataFrame, columns: Dict[str, Optional[str]],
+               mapper: Callable[[str], Optional[str]], stats: Dict[str, int]) -> pd.DataFrame:
+        """Normalizes one chunk of HS lines to (importer, exporter, industry, product, rate, weight)."""
+        stats["lines_read"] += len(chunk)
+        partner = chunk[columns["partner"]].str.strip() if columns["partner"] else pd.Series("", index=chunk.index)
+        products = chunk[columns["product"]].str.strip()
+        industry = products.map({code: mapper(code) for code in products.unique()})
+
+        frame = pd.DataFrame({
+            "importer": self._economy(chunk[columns["reporter"]]),
+            "exporter": self._economy(partner).where(~partner.isin(self.mfn_partner_codes), MFN),
+            "industry_id": industry,
+            "product": products,
+            "rate": pd.to_numeric(chunk[columns["rate"]], errors="coerce"),
+            "weight": pd.to_numeric(chunk[columns["weight"]], errors="coerce").fillna(0.0) if columns["weight"] else 0.0,
+        })
+        stats["lines_unmapped"] += int(frame["industry_id"].isna().sum())
+        frame = frame.dropna(subset=["industry_id", "rate"])
+        stats["lines_mapped"] += len(frame)
+        return frame
+
+    def aggregate_schedules(self, paths: Iterable[str], stats: Optional[Dict[str, int]] = None) -> pd.DataFrame:
+        """
+        Trade-weighted average tariff per (importer, exporter, industry_id) over all HS lines in
+        `paths`. Exporter '*' is the MFN average; a partner's row averages the same lines with
+        its preferential rate wherever it has one (lines only it has are added).
+        """
+        stats = stats if stats is not None else {}
+        for key in ("lines_read", "lines_mapped", "lines_unmapped"):
+            stats.setdefault(key, 0)
+        mapper = hs_mapper(self.hs_to_tipm)
+        frames = []
+        for path in paths:
+            reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=self.chunk_rows)
+            for chunk in reader:
+                columns = {field: next((c for c in candidates if c in chunk.columns), None)
+                           for field, candidates in COLUMN_CANDIDATES.items()}
+                missing = [f for f in ("reporter", "product", "rate") if columns[f] is None]
+                if missing:
+                    raise ValueError(f"{path} lacks required columns for: {', '.join(missing)}")
+                frames.append(self._lines(chunk, columns, mapper, stats))
+
+        lines = pd.concat(frames) if frames else None
+        if lines is None or lines.empty:
+            return pd.DataFrame(columns=GROUP_KEYS + ["tariff_pct", "lines"])
+        lines = lines.groupby(LINE_KEYS, as_index=False).agg(rate=("rate", "mean"), weight=("weight", "sum"))
+        is_mfn = lines["exporter"] == MFN
+        mfn = lines[is_mfn].drop(columns="exporter")
+        mfn_sums = pd.concat([mfn[["importer", "industry_id"]], line_sums(mfn["rate"], mfn["weight"])], axis=1) \
+            .groupby(["importer", "industry_id"], as_index=False).sum()
+
+        # A preferential line swaps its MFN line's rate, keeping that line's import weight
+        preferential = lines[~is_mfn].merge(
+            mfn, how="left", on=["importer", "industry_id", "product"], suffixes=("", "_mfn")
+        ).reset_index(drop=True)
+        has_mfn = preferential["rate_mfn"].notna()
+        weight = preferential["weight_mfn"].where(has_mfn, preferential["weight"])
+        swapped = line_sums(preferential["rate"], weight) - \
+            line_sums(preferential["rate_mfn"].fillna(0.0), weight).mul(has_mfn.astype(int), axis=0)
+        partner_sums = pd.concat([preferential[GROUP_KEYS], swapped], axis=1).groupby(GROUP_KEYS, as_index=False).sum()
+        partner_sums = partner_sums.merge(mfn_sums, how="left", on=["importer", "industry_id"], suffixes=("", "_mfn"))
+        for column in SUM_COLUMNS:
+            partner_sums[column] += partner_sums.pop(f"{column}_mfn").fillna(0)
+
+        totals = pd.concat([mfn_sums.assign(exporter=MFN), partner_sums], ignore_index=True)
+        totals["tariff_pct"] = average_tariff(totals)
+        totals["lines"] = totals["weighted_lines"] + totals["unweighted_lines"]
+        return totals[GROUP_KEYS + ["tariff_pct", "lines"]]
+
+    def resolve_cells(self, conn: sqlite3.Connection, aggregated: pd.DataFrame) -> pd.DataFrame:
+        """Baseline tariff per existing trade_matrix cell: the partner's own average if it has preferences, else MFN."""
+        cells = pd.read_sql_query("SELECT source_econ_id, target_econ_id, industry_id FROM trade_matrix", conn)
+        preferential = aggregated[aggregated["exporter"] != MFN].rename(
+            columns={"exporter": "source_econ_id", "importer": "target_econ_id", "tariff_pct": "preferential_pct"}
+        )[["source_econ_id", "target_econ_id", "industry_id", "preferential_pct"]]
+        mfn = aggregated[aggregated["exporter"] == MFN].rename(
+            columns={"importer": "target_econ_id", "tariff_pct": "mfn_pct"}
+        )[["target_econ_id", "industry_id", "mfn_pct"]]
+        resolved = cells.merge(preferential, how="left", on=["source_econ_id", "target_econ_id", "industry_id"])
+        resolved = resolved.merge(mfn, how="left", on=["target_econ_id", "industry_id"])
+        resolved["baseline_tariff_pct"] = resolved["preferential_pct"].fillna(resolved["mfn_pct"])
+        return resolved.dropna(subset=["baseline_tariff_pct"])
+
+    def load_schedules(self, conn: sqlite3.Connection, paths: Iterable[str]) -> Dict[str, Any]:
+        """Aggregates schedule files and writes changed baseline_tariff_pct cells in bulk."""
+        started = time.perf_counter()
+        stats: Dict[str, int] = {}
+        with metrics.stage("ingest.wto.aggregate"):
+            aggregated = self.aggregate_schedules(paths, stats)
+            resolved = self.resolve_cells(conn, aggregated)
+        rows = zip(
+            zip(resolved["source_econ_id"], resolved["target_econ_id"], resolved["industry_id"]),
+            ((round(float(rate), 4),) for rate in resolved["baseline_tariff_pct"])
+        )
+        self.changes = apply_delta(conn, TRADE_BASELINE_TARIFF, rows, source=f"wto:{self.indicator}:{self.year}")
+
+        elapsed = time.perf_counter() - started
+        for key in ("lines_read", "lines_mapped", "lines_unmapped"):
+            metrics.INGEST_ROWS.inc(stats[key], source="wto", outcome=key.removeprefix("lines_"))
+        metrics.INGEST_ROWS.inc(self.changes.rows_changed, source="wto", outcome="cells_changed")
+        report = {
+            **stats,
+            "groups": len(aggregated),
+            "cells_covered": len(resolved),
+            "cells_changed": self.changes.rows_changed,
+            "refresh_id": self.changes.refresh_id,
+            "elapsed_seconds": round(elapsed, 3),
+            "lines_per_second": round(stats["lines_read"] / elapsed) if elapsed else None
+        }
+        logger.info(f"WTO tariff load complete: {report}")
+        return report
+
+if __name__ == "__main__":
+    import sys
+    import json
+    import argparse
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from logic import CONFIG, get_db_path, publish_changes
+
+    parser = argparse.ArgumentParser(description="Aggregate WTO tariff schedules into trade_matrix.baseline_tariff_pct.")
+    parser.add_argument("--file", action="append", required=True, help="Schedule CSV; repeat for several reporters")
+    parser.add_argument("--db", default=None, help="SQLite database (defaults to caching.db_path)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ingestor = WTOIngestor(CONFIG)
+    conn = sqlite3.connect(args.db or get_db_path())
+    try:
+        print(json.dumps(ingestor.load_schedules(conn, args.file), indent=2))
+    finally:
+        conn.close()
+    # Running engines only see the load once the shared snapshot is re-exported
+    if args.db is None or os.path.abspath(args.db) == os.path.abspath(get_db_path()):
+        if not publish_changes([ingestor.changes]):
+            logger.warning("snapshot.mmap is off: running engines serve the previous data until restarted")
@@ -0,0 +1,132 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("JobManager")
+
+# --- BACKGROUND JOBS ---
+# Long-running maintenance work (data refreshes) runs on a dedicated thread so request
+# handlers return a job id immediately and the event loop keeps serving simulations.
+# At most one job of each kind runs at a time; finished jobs are kept for status queries.
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+class JobConflict(Exception):
+    """Raised when a job of the same kind is already queued or running."""
+    def __init__(self, job: "Job"):
+        super().__init__(f"A {job.kind} job is already {job.status}: {job.id}")
+        self.job = job
+
+class Job:
+    """Status, progress and per-item outcome of one background job. Mutated only under the manager lock."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.completed = 0
+        self.total = 0
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.message: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id, "kind": self.kind, "status": self.status,
+            "created_at": self.created_at, "started_at": self.started_at, "finished_at": self.finished_at,
+            "progress": {
+                "completed": self.completed, "total": self.total,
+                "pct": round(100.0 * self.completed / self.total, 1) if self.total else 0.0
+            },
+            "results": dict(self.results), "errors": dict(self.errors),
+            "message": self.message, "error": self.error
+        }
+
+class JobProgress:
+    """Handle passed to a running job for thread-safe progress reporting."""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self._manager = manager
+        self._job = job
+
+    def set_total(self, total: int):
+        with self._manager._lock:
+            self._job.total = total
+
+    def advance(self, results: Optional[Dict[str, Any]] = None, errors: Optional[Dict[str, str]] = None,
+                count: int = 1):
+        with self._manager._lock:
+            self._job.completed += count
+            self._job.results.update(results or {})
+            self._job.errors.update(errors or {})
+
+class JobManager:
+    """Runs jobs on background threads; thread-safe."""
+
+    def __init__(self, history: int = 20):
+        self.history = history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[[JobProgress], Any]) -> Job:
+        """
+        Starts `fn(progress)` on a new thread; `fn` may be a coroutine function. Its return
+        value becomes the job message. Raises JobConflict if a `kind` job is already active.
+        """
+        with self._lock:
+            active = self._active.get(kind)
+            if active is not None:
+                raise JobConflict(active)
+            job = Job(kind)
+            self._active[kind] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status in (QUEUED, RUNNING):
+                    break
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job, fn), name=f"job-{kind}-{job.id}", daemon=True).start()
+        return job
+
+    def _run(self, job: Job, fn: Callable[[JobProgress], Any]):
+        with self._lock:
+            job.status, job.started_at = RUNNING, time.time()
+        try:
+            outcome = fn(JobProgress(self, job))
+            if asyncio.iscoroutine(outcome):
+                outcome = asyncio.run(outcome)
+        except Exception as e:
+            logger.error(f"JOB_FAILED [{job.kind} {job.id}]: {e}\n{traceback.format_exc()}")
+            with self._lock:
+                job.status, job.error = FAILED, str(e)
+        else:
+            with self._lock:
+                job.status, job.message = SUCCEEDED, outcome
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                if self._active.get(job.kind) is job:
+                    del self._active[job.kind]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def describe(self, job: Job) -> Dict[str, Any]:
+        with self._lock:
+            return job.to_dict()
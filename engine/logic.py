@@ -1,8 +1,27 @@
 import os
+import json
+import time
+import hashlib
+import logging
 import sqlite3
+import threading
 import yaml
-from models import PolicyShock, SimulationResult, SimulationImpact, EconomicRole, EconomyProfile, IndustryProfile, SensitivityAnalysis, SensitivityPoint, SunburstNode, RadarMetrics, TimelineEvent, AdvancedVisuals, SectoralImpact
-from typing import Dict, List, Any
+import numpy as np
+from dataclasses import dataclass, field
+from models import PolicyShock, SimulationResult, EconomicRole, EconomyProfile, IndustryProfile, SensitivityAnalysis, SensitivityPoint, UncertaintyAnalysis, UncertaintyBand, ImpactBand
+from typing import Dict, List, Any, Iterator, Optional, Sequence, Set, Tuple, Union
+from sweep import evaluate_tariff_grid, find_crash_index
+from snapshot import TradeSnapshot
+from refdata import ReferenceData
+from db_pool import SQLitePool, InstrumentedConnection
+from propagation import PropagationEngine
+from result_cache import ResultCache
+from delta import ChangeSet
+from exposure import ExposureRows, scan_exposure, exposure_rows, exposure_header
+import montecarlo
+import metrics
+
+logger = logging.getLogger("SimulationEngine")
 
 # --- CONFIGURATION LOADING ---
 def load_config() -> Dict[str, Any]:
@@ -13,55 +32,260 @@ def load_config() -> Dict[str, Any]:
     return {}
 
 CONFIG = load_config()
+metrics.configure(CONFIG.get("metrics", {}))
 
 # --- DATABASE CONNECTION ---
-def get_db_connection():
+DB_CONFIG = CONFIG.get("caching", {})
+
+def get_db_path() -> str:
     # Use the local SQLite file as requested
-    db_path = CONFIG.get("caching", {}).get("db_path", "data/phishing.db")
-    conn = sqlite3.connect(db_path)
+    return DB_CONFIG.get("db_path", "data/phishing.db")
+
+def get_db_connection():
+    """Opens a standalone connection. Prefer db_connection() inside the engine."""
+    conn = sqlite3.connect(get_db_path(), factory=InstrumentedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
+_pool: Optional[SQLitePool] = None
+_pool_lock = threading.Lock()
+
+def get_db_pool() -> SQLitePool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool_config = DB_CONFIG.get("pool", {})
+                _pool = SQLitePool(
+                    get_db_path(),
+                    size=pool_config.get("size", 8),
+                    pragmas=pool_config.get("pragmas"),
+                    cached_statements=pool_config.get("cached_statements", 256),
+                    timeout=pool_config.get("timeout_seconds", 30.0)
+                )
+    return _pool
+
+def db_connection():
+    """Checks out a pooled WAL connection: `with db_connection() as conn:`."""
+    return get_db_pool().connection()
+
+# --- IN-MEMORY SNAPSHOT ---
+# All read paths are served from an integer-coded copy of the reference tables (snapshot.py).
+# The snapshot is built lazily and replaced wholesale by refresh_snapshot() after writes.
+# With `snapshot.mmap` enabled, the snapshot is exported to a columnar directory and every
+# process (uvicorn workers, simulation workers) memory-maps that export instead of scanning
+# the tables; processes notice a newer export and reopen it within `check_interval_seconds`.
+SNAPSHOT_CONFIG = CONFIG.get("snapshot", {})
+_snapshot: Optional[TradeSnapshot] = None
+_snapshot_lock = threading.RLock()
+_export_stamp: Optional[str] = None  # Export generation we have open
+_export_checked_at = 0.0
+_snapshot_reader = False  # Set in simulation workers: they map or rebuild the snapshot but never export it
+
+def mark_snapshot_reader():
+    global _snapshot_reader
+    _snapshot_reader = True
+
+def _snapshot_export_path() -> str:
+    return SNAPSHOT_CONFIG.get("export_path", "data/snapshot")
+
+def _published_generation() -> Optional[str]:
+    return TradeSnapshot.current_generation(_snapshot_export_path())
+
+def get_db_signature() -> str:
+    """Size and mtime of the database file and its WAL; moves with every committed write."""
+    parts = []
+    for suffix in ("", "-wal"):
+        try:
+            stat = os.stat(get_db_path() + suffix)
+        except OSError:
+            stat = None
+        # An empty WAL appears as soon as any process opens the database; it holds no data yet
+        parts.append(f"{stat.st_size}:{stat.st_mtime_ns}" if stat is not None and stat.st_size else "-")
+    return "/".join(parts)
+
+def _open_export(version: int) -> TradeSnapshot:
+    global _export_stamp
+    with metrics.stage("snapshot.open"):
+        snapshot = TradeSnapshot.open(_snapshot_export_path(), version=version, mmap=True)
+    _export_stamp = snapshot.generation
+    return snapshot
+
+def get_snapshot() -> TradeSnapshot:
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            snapshot = _snapshot
+            if snapshot is None:
+                manifest = TradeSnapshot.read_manifest(_snapshot_export_path()) if SNAPSHOT_CONFIG.get("mmap") else None
+                if manifest is not None and manifest.get("source_signature") == get_db_signature():
+                    # Cold start: the export is current, so map it instead of scanning the tables
+                    snapshot = _snapshot = _open_export(version=1)
+                else:
+                    snapshot = refresh_snapshot(export=not _snapshot_reader)
+    elif SNAPSHOT_CONFIG.get("mmap") and time.monotonic() - _export_checked_at >= SNAPSHOT_CONFIG.get("check_interval_seconds", 1.0):
+        snapshot = sync_snapshot()
+    return snapshot
+
+def sync_snapshot() -> TradeSnapshot:
+    """Reopens the shared export if another process has written a newer one."""
+    global _snapshot, _export_checked_at
+    _export_checked_at = time.monotonic()
+    if _snapshot is None or not SNAPSHOT_CONFIG.get("mmap"):
+        return get_snapshot()
+    stamp = _published_generation()
+    if stamp is not None and stamp != _export_stamp:
+        with _snapshot_lock:
+            if _published_generation() != _export_stamp:
+                _snapshot = _open_export(version=_snapshot.version + 1)
+    return _snapshot
+
+def refresh_snapshot(export: bool = True) -> TradeSnapshot:
+    """
+    Rebuilds the snapshot from the database and swaps it in atomically. Only the process that
+    wrote the data exports it; readers pass `export=False` and keep a private copy.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        version = (_snapshot.version + 1) if _snapshot is not None else 1
+        signature = get_db_signature()
+        with metrics.stage("snapshot.build"), db_connection() as conn:
+            snapshot = TradeSnapshot.from_connection(conn, version=version)
+        if export and SNAPSHOT_CONFIG.get("mmap"):
+            try:
+                with metrics.stage("snapshot.export"):
+                    snapshot.save(_snapshot_export_path(), source_signature=signature)
+                snapshot = _open_export(version)  # Drop the private copy in favour of the shared pages
+            except OSError as e:
+                logger.error(f"SNAPSHOT_EXPORT_ERROR: {e}; serving the in-process copy")
+        _snapshot = snapshot
+    return snapshot
+
+# --- REFERENCE DATA CACHE ---
+_reference: Optional[ReferenceData] = None
+
+def get_reference_data() -> ReferenceData:
+    """Economy/industry metadata for the current snapshot, rebuilt when the snapshot version moves."""
+    global _reference
+    snap = get_snapshot()
+    reference = _reference
+    if reference is None or reference.version != snap.version:
+        reference = ReferenceData.from_snapshot(snap)
+        _reference = reference
+    return reference
+
+def invalidate_reference_data():
+    global _reference
+    _reference = None
+
+def notify_data_changed(changes: Optional[Sequence[ChangeSet]] = None) -> TradeSnapshot:
+    """
+    Called after any write to the reference tables (refresh, ingestion). Given the ChangeSets of
+    a delta refresh, an unchanged refresh keeps everything and cached results outside the changed
+    keys are carried over; without them every cached result is dropped.
+    """
+    if changes is not None and not any(c.changed for c in changes):
+        return get_snapshot()
+    invalidate_reference_data()
+    snapshot = refresh_snapshot()
+    if changes is None:
+        get_result_cache().clear()
+    else:
+        tags = stale_result_tags(snapshot, set().union(*(c.keys for c in changes)))
+        outcome = get_result_cache().carry_over(get_data_version(), tags)
+        logger.info(f"RESULT_CACHE_CARRY_OVER: kept {outcome['kept']}, dropped {outcome['dropped']}")
+    return snapshot
+
+def publish_changes(changes: Sequence[ChangeSet]) -> bool:
+    """
+    For writers outside the engine (the ingestion CLIs): re-exports the shared snapshot after a
+    load, which moves the data version; running engines reopen the export within
+    `check_interval_seconds`. Without `snapshot.mmap` there is no shared export to publish to
+    and running engines keep the old data until restarted, so this returns False.
+    """
+    if not any(c.changed for c in changes):
+        return True
+    if not SNAPSHOT_CONFIG.get("mmap"):
+        return False
+    refresh_snapshot()
+    return True
+
+def stale_result_tags(snap: TradeSnapshot, keys: Set[Tuple[str, Optional[str]]]) -> Set[str]:
+    """Result-cache tags (see result_cache.result_tags) invalidated by changed (economy, industry) keys."""
+    tags: Set[str] = set()
+    for economy, industry in keys:
+        if industry is not None:
+            # Any trade row feeds the industry's propagation, hence every shock in it
+            tags.add(f"industry:{industry}")
+            continue
+        tags.add(f"economy:{economy}")
+        idx = snap.economy_index.get(economy)
+        if idx is not None:
+            # An economy-level change (GDP) also reaches results where it appears as a supplier
+            tags.update(f"industry:{snap.industry_ids[i]}" for i in np.flatnonzero(snap.present[idx].any(axis=0)))
+    return tags
+
+# --- RESULT CACHE ---
+_result_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> ResultCache:
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache.from_config(CONFIG.get("result_cache", {}))
+    return _result_cache
+
+def get_data_version() -> str:
+    """
+    Stamp identifying the data and model behind a result: the snapshot's content hash plus the
+    coefficients and engine settings. It moves whenever a refresh changes the data.
+    """
+    model = json.dumps({
+        "coefficients": [CONTAGION_DECAY_FACTOR, IMPORT_BLOWBACK_BASE, WEALTH_TRANSFER_RATE, EFFICIENCY_GAP_COEFF],
+        "propagation": PROPAGATION_CONFIG, "sensitivity": SENSITIVITY_CONFIG
+    }, sort_keys=True)
+    return f"{get_snapshot().fingerprint}-{hashlib.blake2b(model.encode(), digest_size=4).hexdigest()}"
+
+# --- PROPAGATION ENGINE ---
+PROPAGATION_CONFIG = CONFIG.get("propagation", {})
+_propagation: Optional[PropagationEngine] = None
+_propagation_lock = threading.Lock()
+
+def get_propagation_engine() -> PropagationEngine:
+    """Multi-tier propagation for the current snapshot; the factorization is rebuilt only when data changes."""
+    global _propagation
+    snap = get_snapshot()
+    engine = _propagation
+    if engine is None or engine.version != snap.version:
+        with _propagation_lock:
+            engine = _propagation
+            if engine is None or engine.version != snap.version:
+                with metrics.stage("propagation.build"):
+                    engine = PropagationEngine(
+                        snap, CONTAGION_DECAY_FACTOR,
+                        method=PROPAGATION_CONFIG.get("method", "factorized"),
+                        max_depth=PROPAGATION_CONFIG.get("max_depth", 8),
+                        tolerance=PROPAGATION_CONFIG.get("tolerance", 1e-9)
+                    )
+                _propagation = engine
+    return engine
+
 def get_economies() -> List[EconomyProfile]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT id, name, gdp_usd_bn FROM economies ORDER BY name ASC")
-        rows = cur.fetchall()
-        return [EconomyProfile(id=row['id'], name=row['name'], gdp_usd_bn=row['gdp_usd_bn']) for row in rows]
-    finally:
-        cur.close()
-        conn.close()
+    return list(get_reference_data().economies)
 
 def get_industries() -> List[IndustryProfile]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT id, name, category FROM industries ORDER BY name ASC")
-        rows = cur.fetchall()
-        return [IndustryProfile(id=row['id'], name=row['name'], category=row['category']) for row in rows]
-    finally:
-        cur.close()
-        conn.close()
+    return list(get_reference_data().industries)
 
 def get_available_industries(source_id: str, target_id: str) -> List[IndustryProfile]:
     """Returns industries that actually have trade volume between source and target."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            SELECT DISTINCT i.id, i.name, i.category
-            FROM industries i
-            JOIN trade_matrix tm ON i.id = tm.industry_id
-            WHERE tm.source_econ_id = ? AND tm.target_econ_id = ?
-            AND tm.value_added_usd_mn > 0
-            ORDER BY i.name ASC
-        """, (target_id, source_id)) # Note: target_id is the exporter, source_id is the importer in trade_matrix terms
-        rows = cur.fetchall()
-        return [IndustryProfile(id=row['id'], name=row['name'], category=row['category']) for row in rows]
-    finally:
-        cur.close()
-        conn.close()
+    snap = get_snapshot()
+    # Note: target_id is the exporter, source_id is the importer in trade_matrix terms
+    exporter, importer = snap.economy_index.get(target_id), snap.economy_index.get(source_id)
+    if exporter is None or importer is None:
+        return []
+    traded = snap.present[exporter, importer, :] & (snap.value_added[exporter, importer, :] > 0)
+    traded_ids = {snap.industry_ids[idx] for idx in np.flatnonzero(traded)}
+    return [i for i in get_reference_data().industries if i.id in traded_ids]
 
 # --- CONFIGURATION & GOVERNANCE ---
 REPRODUCIBILITY_SEED = 42
@@ -70,103 +294,307 @@ IMPORT_BLOWBACK_BASE = 0.05   # Base 5% inflationary blowback (Reduced from 10%)
 WEALTH_TRANSFER_RATE = 0.45   # 45% of tariff value transferred to local producers (Increased from 25%)
 EFFICIENCY_GAP_COEFF = 0.002  # Quadratic drag coefficient for deadweight loss
 
-def discover_crashing_point(shock: PolicyShock) -> SensitivityAnalysis:
-    """Finds the tariff threshold where net benefit for the importer turns negative."""
-    points = []
-    crashing_point = 100.0
-    found_crash = False
-
-    # Simulate from 0% to 100% in 1% increments for higher precision
-    for t in range(0, 101, 1):
-        temp_shock = shock.copy(update={"tariff_delta": float(t)})
-        # We run a partial simulation to check the Importer's balance
-        res = calculate_simulation(temp_shock, include_sensitivity=False)
-        
-        # Find the importer impact
-        importer_impact = next((i for i in res.impacts if i.role == EconomicRole.IMPORTING), None)
-        total_loss = res.global_gdp_loss_usd_mn
-        
-        is_crash = False
-        if importer_impact and importer_impact.direct_impact_usd_mn < 0 and not found_crash and t > 0:
-            crashing_point = float(t)
-            found_crash = True
-            is_crash = True
-            
-        points.append(SensitivityPoint(
-            tariff_pct=float(t),
-            global_loss_mn=abs(total_loss),
-            is_crashing_point=is_crash
-        ))
-        
-    return SensitivityAnalysis(
-        shock_context=shock,
-        crashing_point_tariff=crashing_point,
-        data_points=points
+# --- SENSITIVITY GRID ---
+SENSITIVITY_CONFIG = CONFIG.get("sensitivity", {})
+
+def build_tariff_grid(start: float = None, stop: float = None, step: float = None,
+                      max_points: Optional[int] = None) -> np.ndarray:
+    """
+    Builds an inclusive tariff grid (in %), defaulting to the configured 0-100% range.
+    The bounds are validated and the point count checked against `max_points` before
+    anything is allocated; invalid grids raise ValueError.
+    """
+    start = float(SENSITIVITY_CONFIG.get("start", 0.0) if start is None else start)
+    stop = float(SENSITIVITY_CONFIG.get("stop", 100.0) if stop is None else stop)
+    step = float(SENSITIVITY_CONFIG.get("step", 1.0) if step is None else step)
+    if not all(np.isfinite([start, stop, step])):
+        raise ValueError("Tariff grid start, stop and step must be finite.")
+    if step <= 0:
+        raise ValueError("Tariff grid step must be positive.")
+    count = np.floor((stop - start) / step + 1e-9) + 1
+    if not np.isfinite(count) or (max_points is not None and count > max_points):
+        raise ValueError(f"Grid exceeds {max_points} points." if max_points is not None else "Tariff grid is too large.")
+    return start + step * np.arange(max(int(count), 0), dtype=float)
+
+@dataclass
+class ShockBaseline:
+    """Baseline rows a shock depends on, fetched once and reused across tariff levels."""
+    target_name: str
+    target_gdp_usd_bn: float
+    sector_export_vol_mn: float
+    baseline_tariff_pct: float
+    industry_category: str
+    suppliers: List[Dict[str, Any]] = field(default_factory=list)  # id, name, gdp_usd_bn, value_added_usd_mn
+    source_name: Optional[str] = None
+    source_gdp_usd_bn: Optional[float] = None
+
+def get_reactive_parameters(industry_category: str) -> Dict[str, float]:
+    """Adjust coefficients based on industry sector."""
+    params = {
+        "wealth_transfer": WEALTH_TRANSFER_RATE,
+        "blowback_base": IMPORT_BLOWBACK_BASE,
+        "drag_coeff": EFFICIENCY_GAP_COEFF,
+    }
+    if industry_category == "Primary":
+        params.update(wealth_transfer=0.45,  # Balanced domestic scale-up for primary goods
+                      blowback_base=0.06,    # Moderate base inflationary impact
+                      drag_coeff=0.003)      # Moderate scale-up drag
+    elif industry_category == "Services":
+        params.update(wealth_transfer=0.40,  # Services are easier to relocate/substitute
+                      blowback_base=0.05,    # Lower immediate inflation
+                      drag_coeff=0.001)      # Efficient relocation
+    return params
+
+def fetch_suppliers(target_id: str, industry_id: str) -> List[Dict[str, Any]]:
+    """
+    Upstream suppliers exposed to `target_id`'s exports in `industry_id` (shared by every importer
+    of that pair). `value_added_usd_mn` is the direct trade_matrix link (0 for deeper tiers) and
+    `exposure_usd_mn` adds the decayed multi-tier contribution from the propagation engine.
+    """
+    snap = get_snapshot()
+    exporter, industry = snap.economy(target_id), snap.industry(industry_id)
+    if exporter is None or industry is None:
+        return []
+    exposure = get_propagation_engine().upstream_exposure(exporter, industry)
+    direct = snap.present[:, exporter, industry]
+    candidates = np.flatnonzero((direct | (exposure != 0)) & snap.has_profile)
+    return [
+        {
+            "id": snap.economy_ids[idx], "name": snap.economy_names[idx],
+            "gdp_usd_bn": float(snap.gdp_usd_bn[idx]),
+            "value_added_usd_mn": float(snap.value_added[idx, exporter, industry]) if direct[idx] else 0.0,
+            "exposure_usd_mn": float(exposure[idx]),
+            "is_direct": bool(direct[idx])
+        }
+        for idx in candidates if idx != exporter
+    ]
+
+def fetch_shock_baseline(shock: PolicyShock, suppliers: Optional[List[Dict[str, Any]]] = None) -> Optional[ShockBaseline]:
+    """Looks up the baseline, upstream and importer rows for a shock. Returns None without trade volume."""
+    snap = get_snapshot()
+    exporter = snap.economy(shock.target_id)
+    importer = snap.economy_index.get(shock.source_id)
+    industry = snap.industry(shock.industry_id)
+
+    # --- 1. BASELINE DATA (Exporter -> Importer) ---
+    if exporter is None or importer is None or industry is None or not snap.present[exporter, importer, industry]:
+        return None
+
+    baseline = ShockBaseline(
+        target_name=snap.economy_names[exporter],
+        target_gdp_usd_bn=float(snap.gdp_usd_bn[exporter]),
+        sector_export_vol_mn=float(snap.value_added[exporter, importer, industry]),
+        baseline_tariff_pct=float(snap.baseline_tariff[exporter, importer, industry]),
+        industry_category=snap.industry_categories[industry] or "Manufacturing"
     )
 
-def calculate_simulation(shock: PolicyShock, include_sensitivity: bool = True) -> SimulationResult:
+    # --- 2. UPSTREAM SUPPLIERS ---
+    baseline.suppliers = suppliers if suppliers is not None else fetch_suppliers(shock.target_id, shock.industry_id)
+
+    # --- 3. IMPORTER ---
+    if snap.has_profile[importer]:
+        baseline.source_name = snap.economy_names[importer]
+        baseline.source_gdp_usd_bn = float(snap.gdp_usd_bn[importer])
+    return baseline
+
+@dataclass
+class SensitivitySweep:
+    """Sensitivity sweep as arrays aligned with the tariff grid (no per-point models)."""
+    tariff_pct: np.ndarray
+    global_loss_mn: np.ndarray
+    crash_idx: Optional[int]
+    crashing_point_tariff: float
+
+    @property
+    def is_crashing_point(self) -> np.ndarray:
+        flags = np.zeros(self.tariff_pct.size, dtype=bool)
+        if self.crash_idx is not None:
+            flags[self.crash_idx] = True
+        return flags
+
+    def analysis(self, shock: PolicyShock, with_points: bool = True) -> SensitivityAnalysis:
+        """The SensitivityAnalysis model; `with_points=False` leaves data_points empty for serializers that write them from the arrays."""
+        points = [
+            SensitivityPoint(tariff_pct=t, global_loss_mn=loss, is_crashing_point=(idx == self.crash_idx))
+            for idx, (t, loss) in enumerate(zip(self.tariff_pct.tolist(), self.global_loss_mn.tolist()))
+        ] if with_points else []
+        return SensitivityAnalysis(shock_context=shock, crashing_point_tariff=self.crashing_point_tariff, data_points=points)
+
+def sweep_sensitivity(shock: PolicyShock, tariff_grid: Optional[Sequence[float]] = None,
+                      baseline: Optional[ShockBaseline] = None) -> SensitivitySweep:
+    """
+    Evaluates the whole tariff grid as NumPy arrays (see sweep.py) and locates the crashing
+    point. `tariff_grid` defaults to 0% to 100% in 1% increments.
+    """
+    clock = metrics.StageClock("sensitivity")
+    grid = build_tariff_grid() if tariff_grid is None else np.asarray(tariff_grid, dtype=float)
+    if baseline is None:
+        baseline = fetch_shock_baseline(shock)
+        clock.lap("baseline")
+
+    params = get_reactive_parameters(baseline.industry_category) if baseline else {}
+    sweep = evaluate_tariff_grid(baseline, grid, params, CONTAGION_DECAY_FACTOR)
+    crash_idx = find_crash_index(grid, sweep)
+    crashing_point = float(grid[crash_idx]) if crash_idx is not None else (float(grid.max()) if grid.size else 100.0)
+    clock.lap("sweep")
+    return SensitivitySweep(grid, sweep["global_loss_mn"], crash_idx, crashing_point)
+
+def discover_crashing_point(shock: PolicyShock, tariff_grid: Optional[Sequence[float]] = None,
+                            baseline: Optional[ShockBaseline] = None) -> SensitivityAnalysis:
+    """Finds the tariff threshold where net benefit for the importer turns negative.
+
+    The baseline rows are fetched once and the whole tariff grid is evaluated as NumPy
+    arrays (see sweep.py). `tariff_grid` defaults to 0% to 100% in 1% increments.
+    """
+    sweep = sweep_sensitivity(shock, tariff_grid, baseline)
+    with metrics.stage("sensitivity.models"):
+        return sweep.analysis(shock)
+
+def iter_sensitivity_chunks(shock: PolicyShock, tariff_grid: Optional[Sequence[float]] = None,
+                            chunk_size: int = 256) -> Iterator[Tuple[List[SensitivityPoint], Optional[float]]]:
+    """
+    Streaming form of discover_crashing_point: evaluates the grid `chunk_size` points at a time
+    and yields (points, crashing_tariff). `crashing_tariff` is set only on the chunk where the
+    crash condition first triggers, so consumers can report it as soon as it is known.
+    """
+    grid = build_tariff_grid() if tariff_grid is None else np.asarray(tariff_grid, dtype=float)
+    baseline = fetch_shock_baseline(shock)
+    params = get_reactive_parameters(baseline.industry_category) if baseline else {}
+    crash_found = False
+    for start in range(0, grid.size, max(1, chunk_size)):
+        chunk = grid[start:start + chunk_size]
+        sweep = evaluate_tariff_grid(baseline, chunk, params, CONTAGION_DECAY_FACTOR)
+        crash_idx = None if crash_found else find_crash_index(chunk, sweep)
+        crash_found = crash_found or crash_idx is not None
+        points = [
+            SensitivityPoint(tariff_pct=t, global_loss_mn=loss, is_crashing_point=(idx == crash_idx))
+            for idx, (t, loss) in enumerate(zip(chunk.tolist(), sweep["global_loss_mn"].tolist()))
+        ]
+        yield points, (float(chunk[crash_idx]) if crash_idx is not None else None)
+
+# --- 5. ADVANCED VISUALS (Roadmap v5.0) ---
+def build_advanced_visuals(shock: PolicyShock, impacts: List[Dict[str, Any]], global_loss_mn: float,
+                           tariff_factor: float) -> Dict[str, Any]:
+    """AdvancedVisuals as plain data, from the impact dicts built by simulation_data."""
+    heatmap = {imp["country_id"]: abs(imp["total_gdp_impact_pct"]) for imp in impacts}
+    
+    # Sunburst: Root is Target -> Children are Upstream
+    target_imp = next((i for i in impacts if i["role"] == EconomicRole.EXPORTING_GOODS.value), None)
+    sunburst = {
+        "name": target_imp["country_name"] if target_imp else shock.target_id,
+        "value": abs(target_imp["direct_impact_usd_mn"]) if target_imp else 0.0,
+        "role": EconomicRole.EXPORTING_GOODS.value,
+        "children": [
+            {"name": i["country_name"], "value": abs(i["direct_impact_usd_mn"]), "role": i["role"], "children": None}
+            for i in impacts if i["role"] == EconomicRole.EXPORTING_RESOURCE.value
+        ]
+    }
+    
+    # Radar: Normalized scores (0-100)
+    importer_gain = next((i["domestic_gain_usd_mn"] for i in impacts if i["role"] == EconomicRole.IMPORTING.value), 0)
+    radar = [
+        {"axis": "Global Drain", "value": min(100.0, (global_loss_mn / 50000) * 100)},
+        {"axis": "Inflation Severity", "value": min(100.0, tariff_factor * 100)},
+        {"axis": "Retaliation Risk", "value": 50.0 if shock.tariff_delta > 10 else 10.0},
+        {"axis": "Supply Chain Volatility", "value": CONTAGION_DECAY_FACTOR * 40}, # 1.5x -> 60
+        {"axis": "Protectionist Gain", "value": min(100.0, (importer_gain / 5000) * 100)}
+    ]
+    
+    # Timeline: Shock Propagation
+    timeline = [
+        {"period": "Day 0", "global_loss_mn": global_loss_mn * 0.4, "description": "Immediate revenue contraction & export cessation."},
+        {"period": "Month 3", "global_loss_mn": global_loss_mn * 0.8, "description": "Upstream demand pullback & supply chain volatility peaks."},
+        {"period": "Year 1+", "global_loss_mn": global_loss_mn, "description": "Full inflationary blowback & systemic efficiency gap realized."}
+    ]
+
+    return {
+        "heatmap": heatmap,
+        "sunburst": sunburst,
+        "radar": radar,
+        "timeline": timeline
+    }
+
+def _impact(country_id: str, country_name: str, role: EconomicRole, direct_impact_usd_mn: float,
+            total_gdp_impact_pct: float, impact_narrative: str, impact_reasons: List[str], trend: str,
+            sectoral_impacts: Sequence[Dict[str, Any]] = (), domestic_gain_usd_mn: float = 0.0,
+            deadweight_loss_usd_mn: float = 0.0) -> Dict[str, Any]:
+    """One SimulationImpact as plain data, keys in the model's field order."""
+    return {
+        "country_id": country_id, "country_name": country_name, "role": role.value,
+        "direct_impact_usd_mn": direct_impact_usd_mn, "total_gdp_impact_pct": total_gdp_impact_pct,
+        "domestic_gain_usd_mn": domestic_gain_usd_mn, "deadweight_loss_usd_mn": deadweight_loss_usd_mn,
+        "impact_narrative": impact_narrative, "impact_reasons": impact_reasons, "trend": trend,
+        "sectoral_impacts": list(sectoral_impacts)
+    }
+
+def _result(shock: PolicyShock, impacts: List[Dict[str, Any]], global_gdp_loss_usd_mn: float, executive_summary: str,
+            sensitivity: Optional[SensitivityAnalysis] = None, visuals: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """A SimulationResult as plain data, keys in the model's field order."""
+    return {
+        "shock": shock, "impacts": impacts, "global_gdp_loss_usd_mn": global_gdp_loss_usd_mn,
+        "executive_summary": executive_summary, "sensitivity": sensitivity, "visuals": visuals,
+        "baseline_tariff_pct": 0.0
+    }
+
+def calculate_simulation(shock: PolicyShock, include_sensitivity: bool = True, include_visuals: bool = True,
+                         baseline: Optional[ShockBaseline] = None,
+                         sensitivity: Optional[SensitivityAnalysis] = None) -> SimulationResult:
+    """
+    Runs the causality engine for one shock. `baseline` and `sensitivity` may be supplied
+    pre-computed (batch runs share them across shocks); otherwise they are derived here.
+    """
+    data = simulation_data(shock, include_sensitivity, include_visuals, baseline=baseline, sensitivity=sensitivity)
+    with metrics.stage("simulate.result"):
+        return SimulationResult.model_validate(data)
+
+def simulation_data(shock: PolicyShock, include_sensitivity: bool = True, include_visuals: bool = True,
+                    baseline: Optional[ShockBaseline] = None,
+                    sensitivity: Optional[SensitivityAnalysis] = None) -> Dict[str, Any]:
+    """
+    calculate_simulation without the models: the result in SimulationResult's layout, with
+    impacts and visuals as plain dicts (`shock` and `sensitivity` stay models). The /simulate
+    encoder writes this directly, so those sections are never validated or dumped.
+    """
     # --- 0. GOVERNANCE CHECK: ZERO TARIFF ---
     if shock.tariff_delta == 0:
-        return SimulationResult(
-            shock=shock,
-            impacts=[],
-            global_gdp_loss_usd_mn=0.0,
-            executive_summary="Policy Neutral: No tariff adjustment detected. Global economic drain is $0.00."
+        return _result(
+            shock, [], 0.0,
+            "Policy Neutral: No tariff adjustment detected. Global economic drain is $0.00."
         )
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
     impacts = []
     global_loss_mn = 0.0
+    clock = metrics.StageClock("simulate")
     
     try:
-        # --- 1. BASELINE DATA (Exporter -> Importer) ---
-        cur.execute("""
-            SELECT e.id, e.name, e.gdp_usd_bn, tm.value_added_usd_mn, tm.baseline_tariff_pct, i.category
-            FROM economies e
-            JOIN trade_matrix tm ON tm.source_econ_id = e.id
-            JOIN industries i ON i.id = tm.industry_id
-            WHERE tm.source_econ_id = ? AND tm.target_econ_id = ? AND tm.industry_id = ?
-        """, (shock.target_id, shock.source_id, shock.industry_id))
-        
-        target_data = cur.fetchone()
-        if not target_data:
-            return SimulationResult(
-                shock=shock, impacts=[], global_gdp_loss_usd_mn=0.0,
-                executive_summary="Data Null: No trade volume found."
-            )
-
-        sector_export_vol_mn = float(target_data['value_added_usd_mn'])
-        baseline_tariff = float(target_data['baseline_tariff_pct'])
+        # --- 1. BASELINE DATA (Exporter -> Importer, Suppliers, Importer) ---
+        if baseline is None:
+            baseline = fetch_shock_baseline(shock)
+            clock.lap("baseline")
+        if not baseline:
+            return _result(shock, [], 0.0, "Data Null: No trade volume found.")
+
+        sector_export_vol_mn = baseline.sector_export_vol_mn
+        baseline_tariff = baseline.baseline_tariff_pct
         
         # Shock impact is based on delta from baseline
         # Total Applied Tariff = Baseline + Delta
         tariff_factor = (baseline_tariff + shock.tariff_delta) / 100.0
-        industry_category = target_data['category'] or "Manufacturing"
         
         # --- 1.1 REACTIVE PARAMETERS ---
-        # Adjust coefficients based on industry sector
-        wealth_transfer = WEALTH_TRANSFER_RATE
-        blowback_base = IMPORT_BLOWBACK_BASE
-        drag_coeff = EFFICIENCY_GAP_COEFF
-        
-        if industry_category == "Primary":
-            wealth_transfer = 0.45  # Balanced domestic scale-up for primary goods
-            blowback_base = 0.06     # Moderate base inflationary impact
-            drag_coeff = 0.003       # Moderate scale-up drag
-        elif industry_category == "Services":
-            wealth_transfer = 0.40  # Services are easier to relocate/substitute
-            blowback_base = 0.05     # Lower immediate inflation
-            drag_coeff = 0.001       # Efficient relocation
+        params = get_reactive_parameters(baseline.industry_category)
+        wealth_transfer = params["wealth_transfer"]
+        blowback_base = params["blowback_base"]
+        drag_coeff = params["drag_coeff"]
+        industry_name = get_reference_data().industry_name(shock.industry_id)
         
         # --- 2. IMPACT: EXPORTER (Revenue Contraction) ---
         direct_loss_exporter = sector_export_vol_mn * tariff_factor
-        target_gdp_mn = float(target_data['gdp_usd_bn']) * 1000.0
+        target_gdp_mn = baseline.target_gdp_usd_bn * 1000.0
         
-        impacts.append(SimulationImpact(
+        impacts.append(_impact(
             country_id=shock.target_id,
-            country_name=target_data['name'],
+            country_name=baseline.target_name,
             role=EconomicRole.EXPORTING_GOODS,
             direct_impact_usd_mn=-direct_loss_exporter,
             total_gdp_impact_pct=-(direct_loss_exporter / target_gdp_mn) * 100.0,
@@ -177,51 +605,45 @@ def calculate_simulation(shock: PolicyShock, include_sensitivity: bool = True) -
             ],
             trend="DOWN",
             sectoral_impacts=[
-                SectoralImpact(
-                    industry_id=shock.industry_id,
-                    industry_name=next((i.name for i in get_industries() if i.id == shock.industry_id), shock.industry_id),
-                    impact_usd_mn=-direct_loss_exporter,
-                    impact_pct=-(direct_loss_exporter / target_gdp_mn) * 100.0
-                )
-            ],
-            baseline_tariff_pct=baseline_tariff
+                {
+                    "industry_id": shock.industry_id,
+                    "industry_name": industry_name,
+                    "impact_usd_mn": -direct_loss_exporter,
+                    "impact_pct": -(direct_loss_exporter / target_gdp_mn) * 100.0
+                }
+            ]
         ))
         global_loss_mn += direct_loss_exporter
 
-        # --- 3. UPSTREAM CONTAGION (Supply Chain Decay) ---
-        cur.execute("""
-            SELECT e.id, e.name, e.gdp_usd_bn, tm.value_added_usd_mn
-            FROM trade_matrix tm JOIN economies e ON tm.source_econ_id = e.id
-            WHERE tm.target_econ_id = ? AND tm.industry_id = ?
-        """, (shock.target_id, shock.industry_id))
-        
-        for supplier in cur.fetchall():
-            if supplier['id'] == shock.target_id: continue
-            supplier_va_mn = float(supplier['value_added_usd_mn'])
-            upstream_loss = (direct_loss_exporter * (supplier_va_mn / sector_export_vol_mn)) * CONTAGION_DECAY_FACTOR
-            impacts.append(SimulationImpact(
+        # --- 3. UPSTREAM CONTAGION (Multi-tier Supply Chain Decay) ---
+        for supplier in baseline.suppliers:
+            supplier_exposure_mn = supplier['exposure_usd_mn']
+            upstream_loss = (direct_loss_exporter * (supplier_exposure_mn / sector_export_vol_mn)) * CONTAGION_DECAY_FACTOR
+            reasons = [f"Upstream demand contraction (Decay Factor: {CONTAGION_DECAY_FACTOR})"]
+            indirect_mn = supplier_exposure_mn - supplier['value_added_usd_mn']
+            if indirect_mn > 0:
+                reasons.append(f"Indirect exposure via deeper supply tiers: ${indirect_mn:,.0f}M value added")
+            impacts.append(_impact(
                 country_id=supplier['id'], country_name=supplier['name'],
                 role=EconomicRole.EXPORTING_RESOURCE,
                 direct_impact_usd_mn=-upstream_loss,
-                total_gdp_impact_pct=-(upstream_loss / (float(supplier['gdp_usd_bn']) * 1000.0)) * 100.0,
-                impact_narrative="Upstream volatility contagion.",
-                impact_reasons=[f"Upstream demand contraction (Decay Factor: {CONTAGION_DECAY_FACTOR})"],
+                total_gdp_impact_pct=-(upstream_loss / (supplier['gdp_usd_bn'] * 1000.0)) * 100.0,
+                impact_narrative="Upstream volatility contagion." if supplier['is_direct'] else "Multi-tier upstream contagion.",
+                impact_reasons=reasons,
                 trend="DOWN",
                 sectoral_impacts=[
-                    SectoralImpact(
-                        industry_id=shock.industry_id,
-                        industry_name=next((i.name for i in get_industries() if i.id == shock.industry_id), shock.industry_id),
-                        impact_usd_mn=-upstream_loss,
-                        impact_pct=-(upstream_loss / (float(supplier['gdp_usd_bn']) * 1000.0)) * 100.0
-                    )
+                    {
+                        "industry_id": shock.industry_id,
+                        "industry_name": industry_name,
+                        "impact_usd_mn": -upstream_loss,
+                        "impact_pct": -(upstream_loss / (supplier['gdp_usd_bn'] * 1000.0)) * 100.0
+                    }
                 ]
             ))
             global_loss_mn += upstream_loss
 
         # --- 4. THE MARKET MECHANISM: IMPORTER BALANCING ---
-        cur.execute("SELECT name, gdp_usd_bn FROM economies WHERE id = ?", (shock.source_id,))
-        source_data = cur.fetchone()
-        if source_data:
+        if baseline.source_name is not None:
             # A: Wealth Transfer (Gains for local producers)
             # Efficiency Gap: gains decrease as tariff increases (quadratic drag)
             efficiency_gap_factor = max(0, 1 - (shock.tariff_delta * drag_coeff))
@@ -236,15 +658,15 @@ def calculate_simulation(shock: PolicyShock, include_sensitivity: bool = True) -
             
             # D: Retaliation Hit (Feedback Loop)
             # Retaliation scales with the size of the target economy relative to global baseline
-            retaliation_multiplier = min(1.0, float(target_data['gdp_usd_bn']) / 5000.0) # Cap at 1.0 (5T GDP)
+            retaliation_multiplier = min(1.0, baseline.target_gdp_usd_bn / 5000.0) # Cap at 1.0 (5T GDP)
             retaliation_damage = direct_loss_exporter * 0.20 * retaliation_multiplier
             
             # Net Result for Importer
             net_importer_impact = domestic_gain - (deadweight_loss + cost_spike + retaliation_damage)
-            source_gdp_mn = float(source_data['gdp_usd_bn']) * 1000.0
+            source_gdp_mn = baseline.source_gdp_usd_bn * 1000.0
             
-            impacts.append(SimulationImpact(
-                country_id=shock.source_id, country_name=source_data['name'],
+            impacts.append(_impact(
+                country_id=shock.source_id, country_name=baseline.source_name,
                 role=EconomicRole.IMPORTING,
                 direct_impact_usd_mn=net_importer_impact,
                 total_gdp_impact_pct=(net_importer_impact / source_gdp_mn) * 100.0,
@@ -265,45 +687,19 @@ def calculate_simulation(shock: PolicyShock, include_sensitivity: bool = True) -
         # Note: We only count the losses to avoid double counting transfers.
         # However, to match user request "sum of all direct/second-order losses reported",
         # we sum the direct_impact_usd_mn of all entities that suffered a loss.
-        global_loss_mn = sum(abs(i.direct_impact_usd_mn) for i in impacts if i.direct_impact_usd_mn < 0)
+        global_loss_mn = sum(abs(i["direct_impact_usd_mn"]) for i in impacts if i["direct_impact_usd_mn"] < 0)
+        clock.lap("impacts")
 
     except Exception as e:
         print(f"SIMULATION_ERROR: {str(e)}"); raise e
-    finally:
-        cur.close(); conn.close()
 
-    sensitivity = discover_crashing_point(shock) if include_sensitivity else None
-    
-    # --- 5. ADVANCED VISUALS (Roadmap v5.0) ---
-    heatmap = {imp.country_id: abs(imp.total_gdp_impact_pct) for imp in impacts}
-    
-    # Sunburst: Root is Target -> Children are Upstream
-    target_imp = next((i for i in impacts if i.role == EconomicRole.EXPORTING_GOODS), None)
-    sunburst = SunburstNode(
-        name=target_imp.country_name if target_imp else shock.target_id,
-        value=abs(target_imp.direct_impact_usd_mn) if target_imp else 0.0,
-        role=EconomicRole.EXPORTING_GOODS,
-        children=[
-            SunburstNode(name=i.country_name, value=abs(i.direct_impact_usd_mn), role=i.role)
-            for i in impacts if i.role == EconomicRole.EXPORTING_RESOURCE
-        ]
-    )
-    
-    # Radar: Normalized scores (0-100)
-    radar = [
-        RadarMetrics(axis="Global Drain", value=min(100, (global_loss_mn / 50000) * 100)),
-        RadarMetrics(axis="Inflation Severity", value=min(100, tariff_factor * 100)),
-        RadarMetrics(axis="Retaliation Risk", value=50.0 if shock.tariff_delta > 10 else 10.0),
-        RadarMetrics(axis="Supply Chain Volatility", value=CONTAGION_DECAY_FACTOR * 40), # 1.5x -> 60
-        RadarMetrics(axis="Protectionist Gain", value=min(100, (next((i.domestic_gain_usd_mn for i in impacts if i.role == EconomicRole.IMPORTING), 0) / 5000) * 100))
-    ]
-    
-    # Timeline: Shock Propagation
-    timeline = [
-        TimelineEvent(period="Day 0", global_loss_mn=global_loss_mn * 0.4, description="Immediate revenue contraction & export cessation."),
-        TimelineEvent(period="Month 3", global_loss_mn=global_loss_mn * 0.8, description="Upstream demand pullback & supply chain volatility peaks."),
-        TimelineEvent(period="Year 1+", global_loss_mn=global_loss_mn, description="Full inflationary blowback & systemic efficiency gap realized.")
-    ]
+    if not include_sensitivity:
+        sensitivity = None
+    elif sensitivity is None:
+        sensitivity = discover_crashing_point(shock, baseline=baseline)
+        clock.lap("sensitivity")
+    else:
+        sensitivity = sensitivity.model_copy(update={"shock_context": shock})
 
     summary = (
         f"A {shock.tariff_delta}% tariff on {shock.industry_id} triggers a ${global_loss_mn:,.0f}M global drain. "
@@ -311,15 +707,150 @@ def calculate_simulation(shock: PolicyShock, include_sensitivity: bool = True) -
         f"where accumulation of deadweight loss and retaliation overrides local production gains."
     ) if sensitivity else "Simulation result generated."
 
-    return SimulationResult(
-        shock=shock, impacts=impacts,
-        global_gdp_loss_usd_mn=-global_loss_mn,
-        executive_summary=summary,
-        sensitivity=sensitivity,
-        visuals=AdvancedVisuals(
-            heatmap=heatmap,
-            sunburst=sunburst,
-            radar=radar,
-            timeline=timeline
-        )
+    visuals = None
+    if include_visuals:
+        visuals = build_advanced_visuals(shock, impacts, global_loss_mn, tariff_factor)
+        clock.lap("visuals")
+    return _result(shock, impacts, -global_loss_mn, summary, sensitivity=sensitivity, visuals=visuals)
+
+
+# --- BATCH SIMULATION ---
+def calculate_batch(shocks: List[PolicyShock], include_sensitivity: Sequence[bool],
+                    include_visuals: Sequence[bool]) -> Tuple[List[Union[SimulationResult, Exception]], int]:
+    """
+    Evaluates many shocks, grouped by (target_id, industry_id) so supplier rows are looked up
+    once per group and baselines/sensitivity sweeps once per (source, target, industry).
+    Returns per-shock results (or the exception raised for that shock) in input order.
+    """
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for idx, shock in enumerate(shocks):
+        groups.setdefault((shock.target_id, shock.industry_id), []).append(idx)
+
+    results: List[Union[SimulationResult, Exception]] = [None] * len(shocks)
+    for (target_id, industry_id), members in groups.items():
+        try:
+            suppliers = fetch_suppliers(target_id, industry_id)
+        except Exception as e:
+            for idx in members:
+                results[idx] = e
+            continue
+
+        baselines: Dict[str, Optional[ShockBaseline]] = {}
+        sweeps: Dict[str, SensitivityAnalysis] = {}
+        for idx in members:
+            shock = shocks[idx]
+            try:
+                if shock.source_id not in baselines:
+                    baselines[shock.source_id] = fetch_shock_baseline(shock, suppliers=suppliers)
+                baseline = baselines[shock.source_id]
+                if include_sensitivity[idx] and shock.source_id not in sweeps:
+                    sweeps[shock.source_id] = discover_crashing_point(shock, baseline=baseline)
+                results[idx] = calculate_simulation(
+                    shock,
+                    include_sensitivity=include_sensitivity[idx],
+                    include_visuals=include_visuals[idx],
+                    baseline=baseline,
+                    sensitivity=sweeps.get(shock.source_id)
+                )
+            except Exception as e:
+                results[idx] = e
+    return results, len(groups)
+
+# --- UNCERTAINTY BANDS (Monte Carlo over the coefficients) ---
+MONTE_CARLO_CONFIG = CONFIG.get("monte_carlo", {})
+
+def calculate_uncertainty(shock: PolicyShock, draws: Optional[int] = None, seed: Optional[int] = None,
+                          baseline: Optional[ShockBaseline] = None) -> UncertaintyAnalysis:
+    """
+    Percentile bands for the impacts, global drain and crashing point of one shock, with the
+    coefficients drawn from `monte_carlo.distributions` (see montecarlo.py). `seed` defaults
+    to REPRODUCIBILITY_SEED, so the same request always returns the same bands.
+    Supplier exposures keep the configured decay; the sampled decay scales step 3 only.
+    """
+    clock = metrics.StageClock("uncertainty")
+    draws = montecarlo.draw_count(draws, MONTE_CARLO_CONFIG)
+    seed = int(MONTE_CARLO_CONFIG.get("seed", REPRODUCIBILITY_SEED) if seed is None else seed)
+    percentiles = MONTE_CARLO_CONFIG.get("percentiles", montecarlo.DEFAULT_PERCENTILES)
+    if baseline is None:
+        baseline = fetch_shock_baseline(shock)
+        clock.lap("baseline")
+
+    params = get_reactive_parameters(baseline.industry_category if baseline else None)
+    coefficients = montecarlo.sample_coefficients(
+        {"decay_factor": CONTAGION_DECAY_FACTOR, **params}, MONTE_CARLO_CONFIG.get("distributions", {}),
+        draws, np.random.default_rng(seed)
+    )
+    crash = montecarlo.crashing_points(baseline, build_tariff_grid(), coefficients)
+    clock.lap("crashing_point")
+
+    def to_bands(values) -> List[UncertaintyBand]:
+        """One band per row of a (rows x draws) matrix, from a single percentile pass."""
+        summary = montecarlo.band(np.atleast_2d(values), percentiles)
+        columns = {label: q.tolist() for label, q in summary["percentiles"].items()}
+        return [
+            UncertaintyBand(mean=mean, percentiles={label: q[row] for label, q in columns.items()})
+            for row, mean in enumerate(summary["mean"].tolist())
+        ]
+
+    # --- IMPACTS (exporter, suppliers, importer: the order of calculate_simulation) ---
+    impacts: List[ImpactBand] = []
+    global_loss = np.zeros(draws)
+    if baseline and shock.tariff_delta != 0:
+        outcome = montecarlo.evaluate_draws(baseline, shock.tariff_delta, coefficients)
+        global_loss = outcome["global_loss_mn"]
+        rows = [(shock.target_id, baseline.target_name, EconomicRole.EXPORTING_GOODS, baseline.target_gdp_usd_bn)]
+        values = [np.full(draws, -outcome["direct_loss_mn"])]
+        for supplier, loss in zip(baseline.suppliers, outcome["upstream_loss_mn"]):
+            rows.append((supplier["id"], supplier["name"], EconomicRole.EXPORTING_RESOURCE, supplier["gdp_usd_bn"]))
+            values.append(-loss)
+        if baseline.source_name is not None:
+            rows.append((shock.source_id, baseline.source_name, EconomicRole.IMPORTING, baseline.source_gdp_usd_bn))
+            values.append(outcome["net_importer_mn"])
+        impact_mn = np.vstack(values)
+        gdp_mn = np.array([row[3] for row in rows], dtype=float)[:, np.newaxis] * 1000.0
+        impacts = [
+            ImpactBand(country_id=country_id, country_name=name, role=role, direct_impact_usd_mn=usd, total_gdp_impact_pct=pct)
+            for (country_id, name, role, _), usd, pct in zip(rows, to_bands(impact_mn), to_bands(impact_mn / gdp_mn * 100.0))
+        ]
+
+    names = list(coefficients)
+    analysis = UncertaintyAnalysis(
+        shock=shock, draws=draws, seed=seed,
+        coefficients=dict(zip(names, to_bands(np.vstack([coefficients[name] for name in names])))),
+        impacts=impacts,
+        global_gdp_loss_usd_mn=to_bands(-global_loss)[0],
+        crashing_point_tariff=to_bands(crash)[0],
+        past_crashing_point_share=float(np.mean(shock.tariff_delta > crash))
     )
+    clock.lap("bands")
+    return analysis
+
+# --- BILATERAL EXPOSURE SCAN ---
+def scan_importer_exposure_rows(importer_id: str, tariff_delta: float, mode: str = "ranking",
+                                top_n: Optional[int] = None,
+                                sort: str = "global_drain") -> Optional[Tuple[Dict[str, Any], ExposureRows]]:
+    """
+    Evaluates `tariff_delta` for every exporter x industry pair that `importer_id` trades in one
+    vectorized pass. Returns the header row and the matrix or ranking rows as compact arrays
+    (ExposureRows), or None for unknown codes.
+    """
+    snap = get_snapshot()
+    importer = snap.economy_index.get(importer_id)
+    if importer is None:
+        return None
+    with metrics.stage("exposure.scan"):
+        scan = scan_exposure(
+            snap, get_propagation_engine(), importer, float(tariff_delta),
+            CONTAGION_DECAY_FACTOR, get_reactive_parameters
+        )
+        rows = exposure_rows(snap, scan, mode=mode, top_n=top_n, sort=sort)
+    return exposure_header(snap, scan, importer_id, float(tariff_delta), mode), rows
+
+def scan_importer_exposure(importer_id: str, tariff_delta: float, mode: str = "ranking", top_n: Optional[int] = None,
+                           sort: str = "global_drain") -> Optional[List[Dict[str, Any]]]:
+    """scan_importer_exposure_rows as a list: the header row followed by every row as a dict."""
+    scanned = scan_importer_exposure_rows(importer_id, tariff_delta, mode=mode, top_n=top_n, sort=sort)
+    if scanned is None:
+        return None
+    header, rows = scanned
+    return [header] + list(rows)
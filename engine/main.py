@@ -1,12 +1,40 @@
-from fastapi import FastAPI, HTTPException
+import math
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response, Header, Request, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from logic import calculate_simulation, get_economies, get_industries, get_available_industries, CONFIG, get_db_connection
+from logic import calculate_simulation, calculate_batch, iter_sensitivity_chunks, build_tariff_grid, get_propagation_engine, get_economies, get_industries, get_available_industries, get_reference_data, get_result_cache, get_data_version, get_db_pool, get_snapshot, MONTE_CARLO_CONFIG, CONFIG, db_connection, notify_data_changed
 from ingestion.worldbank import WorldBankIngestor
+from ingestion.http_cache import get_http_client
 import uvicorn
-from typing import Dict, List
-from models import PolicyShock, SimulationResult, EconomyProfile, IndustryProfile
+from typing import Dict, List, Optional
+from result_cache import make_cache_key, result_tags
+from singleflight import SingleFlight
+from jobs import JobManager, JobConflict, JobProgress
+from delta import apply_delta, ECONOMY_GDP
+from workers import run_cpu_bound, get_executor, pool_size, shutdown_executor, simulate_to_bytes, simulate_uncertainty, simulate_batch_chunk, scan_exposure_rows, partition_groups
+from models import PolicyShock, SimulationResult, UncertaintyAnalysis, EconomyProfile, IndustryProfile, BatchSimulationRequest, BatchSimulationResponse, BatchItemResult
+import metrics
+import profiling
+import serialization
 
-app = FastAPI(title="TIPM Engine")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the snapshot, metadata and propagation factorization before serving, and start
+    # the simulation workers so the first request does not pay for either.
+    get_reference_data()
+    get_propagation_engine()
+    get_data_version()
+    get_executor()
+    yield
+    shutdown_executor()
+
+app = FastAPI(title="TIPM Engine", lifespan=lifespan)
 
 # --- CORS CONFIGURATION ---
 app.add_middleware(
@@ -15,79 +43,409 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache", "X-Profile-Id"],
+)
+
+# --- VALIDATION ERRORS ---
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    """FastAPI's 422, except that rejected NaN/Infinity inputs are echoed as strings (JSON has no literal for them)."""
+    finite = {float: lambda value: value if math.isfinite(value) else str(value)}
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors(), custom_encoder=finite)})
+
+# --- METRICS (GET /metrics) ---
+app.add_middleware(metrics.MetricsMiddleware)
+
+# --- ON-DEMAND PROFILING (X-TIPM-Profile header or ?profile=, off unless configured) ---
+PROFILING_CONFIG = CONFIG.get("profiling", {})
+app.add_middleware(profiling.ProfilingMiddleware, config=PROFILING_CONFIG)
+PROFILE_STORE = profiling.ProfileStore(PROFILING_CONFIG.get("directory", "data/profiles"), keep=PROFILING_CONFIG.get("keep", 50))
+
+SIMULATION_FLIGHTS = SingleFlight()
+REFRESH_JOBS = JobManager(history=CONFIG.get("jobs", {}).get("history", 20))
+
+def _cache_hit_ratios() -> Dict[tuple, Optional[float]]:
+    """Share of lookups served without recomputing (result cache), refetching (HTTP) or re-running (coalescing)."""
+    def ratio(hits: float, total: float) -> Optional[float]:
+        return round(hits / total, 4) if total else None
+
+    results = get_result_cache().stats()
+    http = get_http_client(CONFIG).stats()
+    flights = SIMULATION_FLIGHTS.stats()
+    return {
+        ("result_cache",): ratio(results["hits"] + results["disk_hits"], results["hits"] + results["disk_hits"] + results["misses"]),
+        ("ingestion_http",): ratio(http["cache_hits"] + http["not_modified"], http["cache_hits"] + http["network"]),
+        ("simulate_coalescing",): ratio(flights["coalesced"], flights["calls"]),
+    }
+
+metrics.Gauge("tipm_cache_hit_ratio", "Hit ratio per cache since start.", _cache_hit_ratios, ["cache"])
+metrics.Gauge("tipm_result_cache_entries", "Entries in the in-memory result cache.", lambda: get_result_cache().stats()["entries"])
+metrics.Gauge("tipm_result_cache_bytes", "Bytes held by the in-memory result cache.", lambda: get_result_cache().stats()["bytes"])
+metrics.Gauge(
+    "tipm_db_pool_connections", "Pooled SQLite connections by state.",
+    lambda: {("open",): get_db_pool().stats()["created"], ("idle",): get_db_pool().stats()["idle"]}, ["state"]
 )
+metrics.Gauge("tipm_db_pool_waits_total", "Checkouts that had to wait for a connection.", lambda: get_db_pool().stats()["waits"], kind="counter")
+metrics.Gauge("tipm_snapshot_version", "Version of the snapshot serving reads.", lambda: get_snapshot().version)
+metrics.Gauge("tipm_snapshot_bytes", "Size of the snapshot arrays.", lambda: get_snapshot().nbytes)
 
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "tipm-engine"}
 
 @app.get("/economies", response_model=List[EconomyProfile])
-def economies():
-    return get_economies()
+async def economies():
+    return Response(content=get_reference_data().economies_json, media_type="application/json")
 
 @app.get("/industries", response_model=List[IndustryProfile])
-def industries():
-    return get_industries()
+async def industries():
+    return Response(content=get_reference_data().industries_json, media_type="application/json")
 
 @app.get("/api/industries/available", response_model=List[IndustryProfile])
-def read_available_industries(source_id: str, target_id: str):
+async def read_available_industries(source_id: str, target_id: str):
     return get_available_industries(source_id, target_id)
 
 import traceback
 
-@app.post("/simulate")
-def simulate(shock: PolicyShock) -> SimulationResult:
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+OPTIONAL_SECTIONS = ("sensitivity", "visuals")
+
+def _parse_sections(include: Optional[str]) -> List[str]:
+    """`include=` of /simulate: "all" (default), "core"/"none", or a comma list of OPTIONAL_SECTIONS."""
+    if include is None or include.strip().lower() == "all":
+        return list(OPTIONAL_SECTIONS)
+    sections = {part.strip().lower() for part in include.split(",") if part.strip()}
+    if sections <= {"core", "none"}:
+        return []
+    unknown = sections - set(OPTIONAL_SECTIONS) - {"core", "none"}
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown section(s) in include: {', '.join(sorted(unknown))}. Use all, core or {', '.join(OPTIONAL_SECTIONS)}."
+        )
+    return [name for name in OPTIONAL_SECTIONS if name in sections]
+
+@app.post("/simulate", response_model=SimulationResult)
+async def simulate(
+    shock: PolicyShock,
+    if_none_match: Optional[str] = Header(default=None),
+    accept: Optional[str] = Header(default=None),
+    include: Optional[str] = Query(default=None, description="Optional sections to compute: all (default), core, or e.g. sensitivity,visuals")
+):
     """
     Executes a trade policy simulation based on the provided shock.
+    Results are cached per (shock, sections, format, data version); the ETag lets clients revalidate with a 304.
+    The simulation itself runs in the worker process pool.
+    `include=` limits the optional sections; omitted ones are not computed and come back as null.
+    The Accept header selects JSON (default), columnar JSON or MessagePack (see serialization.py).
+    A profiled request always recomputes, so its profile shows the simulation, not a cache hit.
     """
+    sections = _parse_sections(include)
+    fmt = serialization.negotiate(accept)
+    if fmt is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Acceptable formats: {', '.join(serialization.FORMATS[name] for name in serialization.available_formats())}"
+        )
+    data_version = get_data_version()
+    # Full JSON responses keep the original key, so existing cache entries and ETags stay valid
+    options = {"sections": "all" if len(sections) == len(OPTIONAL_SECTIONS) else sections}
+    if fmt != "json":
+        options["format"] = fmt
+    key = make_cache_key(shock.model_dump(), options, data_version)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Vary": "Accept"}
+    profiled = profiling.current_session() is not None
+    if _etag_matches(if_none_match, etag) and not profiled:
+        metrics.CACHE_LOOKUPS.inc(cache="simulate", outcome="not_modified")
+        return Response(status_code=304, headers=headers)
+
+    cache = get_result_cache()
+    body = None if profiled else cache.get(key)
+    cache_status = "HIT"
+    if body is None:
+        async def compute() -> bytes:
+            result_body = await run_cpu_bound(
+                simulate_to_bytes, shock.model_dump(), data_version, "sensitivity" in sections, "visuals" in sections, fmt
+            )
+            cache.put(key, result_body, meta={
+                "shock": shock.model_dump(), "options": options, "tags": result_tags(shock.model_dump())
+            })
+            return result_body
+
+        try:
+            # Identical concurrent shocks share one computation
+            body, shared = (await compute(), False) if profiled else await SIMULATION_FLIGHTS.do_async(key, compute)
+        except Exception as e:
+            error_msg = f"{str(e)}\n{traceback.format_exc()}"
+            print(error_msg)
+            raise HTTPException(status_code=500, detail=error_msg)
+        cache_status = "COALESCED" if shared else "MISS"
+    metrics.CACHE_LOOKUPS.inc(cache="simulate", outcome=cache_status.lower())
+    return Response(content=body, media_type=serialization.FORMATS[fmt], headers={**headers, "X-Cache": cache_status})
+
+@app.post("/simulate/uncertainty", response_model=UncertaintyAnalysis)
+async def simulate_uncertainty_bands(
+    shock: PolicyShock,
+    draws: Optional[int] = Query(default=None, ge=1, description="Coefficient draws (default monte_carlo.draws)"),
+    seed: Optional[int] = Query(default=None, ge=0, description="RNG seed (default monte_carlo.seed)")
+):
+    """
+    Monte Carlo over the model coefficients: percentile bands for every impact, the global
+    drain and the crashing point. Draws are seeded, so results are reproducible and cached
+    like /simulate.
+    """
+    max_draws = MONTE_CARLO_CONFIG.get("max_draws", 20000)
+    if draws is not None and draws > max_draws:
+        raise HTTPException(status_code=422, detail=f"draws exceeds {max_draws}.")
+    data_version = get_data_version()
+    options = {
+        "mode": "uncertainty", "draws": draws, "seed": seed,
+        "monte_carlo": {k: MONTE_CARLO_CONFIG.get(k) for k in ("draws", "seed", "percentiles", "distributions")}
+    }
+    key = make_cache_key(shock.model_dump(), options, data_version)
+    cache = get_result_cache()
+    body = cache.get(key)
+    cache_status = "HIT"
+    if body is None:
+        body = await run_cpu_bound(simulate_uncertainty, shock.model_dump(), draws, seed, data_version)
+        cache.put(key, body, meta={"shock": shock.model_dump(), "options": options, "tags": result_tags(shock.model_dump())})
+        cache_status = "MISS"
+    metrics.CACHE_LOOKUPS.inc(cache="uncertainty", outcome=cache_status.lower())
+    return Response(content=body, media_type="application/json", headers={"ETag": f'"{key}"', "X-Cache": cache_status})
+
+@app.post("/simulate/batch")
+async def simulate_batch(request: BatchSimulationRequest) -> BatchSimulationResponse:
+    """
+    Executes many shocks in one request. Items fail independently and results keep input order.
+    Shocks are split into chunks by (target_id, industry_id) and the chunks run in parallel workers.
+    """
+    max_shocks = CONFIG.get("batch", {}).get("max_shocks", 500)
+    if len(request.shocks) > max_shocks:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {max_shocks} shocks.")
+
+    shocks = [item.model_dump(include=set(PolicyShock.model_fields)) for item in request.shocks]
+    include_sensitivity = [request.include_sensitivity if i.include_sensitivity is None else i.include_sensitivity for i in request.shocks]
+    include_visuals = [request.include_visuals if i.include_visuals is None else i.include_visuals for i in request.shocks]
+
+    group_keys = [(s["target_id"], s["industry_id"]) for s in shocks]
+    chunks = partition_groups(group_keys, pool_size())
+    data_version = get_data_version()
+    chunk_results = await asyncio.gather(*[
+        run_cpu_bound(
+            simulate_batch_chunk,
+            [shocks[i] for i in chunk], [include_sensitivity[i] for i in chunk],
+            [include_visuals[i] for i in chunk], data_version
+        )
+        for chunk in chunks
+    ])
+
+    items: List[Optional[BatchItemResult]] = [None] * len(shocks)
+    for chunk, outcomes in zip(chunks, chunk_results):
+        for idx, (ok, outcome) in zip(chunk, outcomes):
+            if ok:
+                items[idx] = BatchItemResult(index=idx, ok=True, result=outcome)
+            else:
+                print(f"BATCH_ITEM_ERROR [{idx}]: {outcome}")
+                items[idx] = BatchItemResult(index=idx, ok=False, error=outcome)
+    return BatchSimulationResponse(results=items, group_count=len(set(group_keys)))
+
+@app.post("/simulate/sensitivity/stream")
+async def stream_sensitivity(
+    shock: PolicyShock, request: Request,
+    start: Optional[float] = None, stop: Optional[float] = None, step: Optional[float] = None,
+    format: Optional[str] = Query(default=None, pattern="^(ndjson|sse)$")
+):
+    """
+    Streams the sensitivity sweep point by point as NDJSON (default) or Server-Sent Events
+    (`format=sse` or `Accept: text/event-stream`). A `crashing_point` event follows the point
+    where the importer's net impact first turns negative. Disconnecting stops the sweep.
+    """
+    max_points = CONFIG.get("sensitivity", {}).get("max_stream_points", 100000)
     try:
-        results = calculate_simulation(shock)
-        return results
-    except Exception as e:
-        error_msg = f"{str(e)}\n{traceback.format_exc()}"
-        print(error_msg)
-        raise HTTPException(status_code=500, detail=error_msg)
-
-@app.post("/api/data/refresh")
+        # Bounds and point count are checked before the grid is allocated
+        grid = build_tariff_grid(start, stop, step, max_points=max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    use_sse = format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", ""))
+    chunk_size = CONFIG.get("sensitivity", {}).get("stream_chunk_size", 256)
+
+    def encode(event: str, data: dict) -> str:
+        if use_sse:
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps({"event": event, **data}) + "\n"
+
+    async def events():
+        chunks = iter_sensitivity_chunks(shock, grid, chunk_size)
+        # next() runs in a worker thread; closing must wait for an in-flight next() to return
+        chunks_lock = threading.Lock()
+
+        def next_chunk():
+            with chunks_lock:
+                return next(chunks, None)
+
+        def close_chunks():
+            with chunks_lock:
+                chunks.close()
+
+        crashing_point = None
+        try:
+            yield encode("start", {"shock": shock.model_dump(), "points": int(grid.size)})
+            while True:
+                # Each chunk is evaluated off the event loop; between chunks we check for a disconnect
+                chunk = await asyncio.to_thread(next_chunk)
+                if chunk is None:
+                    break
+                points, crash_tariff = chunk
+                for point in points:
+                    yield encode("point", point.model_dump())
+                    if point.is_crashing_point:
+                        crashing_point = crash_tariff
+                        yield encode("crashing_point", {"tariff_pct": crash_tariff})
+                if await request.is_disconnected():
+                    return
+            yield encode("end", {
+                "crashing_point_tariff": crashing_point if crashing_point is not None else (float(grid.max()) if grid.size else 100.0)
+            })
+        finally:
+            # Not awaited: on a disconnect this runs while the request is being cancelled
+            asyncio.get_running_loop().run_in_executor(None, close_chunks)
+
+    return StreamingResponse(events(), media_type="text/event-stream" if use_sse else "application/x-ndjson")
+
+@app.get("/api/exposure/{importer_id}")
+async def scan_exposure_matrix(
+    importer_id: str, tariff_delta: float = Query(default=10.0, allow_inf_nan=False),
+    top_n: Optional[int] = Query(default=None, ge=1),
+    sort: str = Query(default="global_drain", pattern="^(global_drain|importer_net)$"),
+    format: str = Query(default="ranking", pattern="^(ranking|matrix)$")
+):
+    """
+    Scores one tariff delta against every exporter x industry pair the importer trades, streamed
+    as NDJSON: a header line, then ranked pairs (`format=ranking`) or one row per exporter with
+    per-industry values aligned to the header's `industry_ids` (`format=matrix`).
+    The worker returns the rows as arrays; they become JSON lines one chunk at a time.
+    """
+    scanned = await run_cpu_bound(
+        scan_exposure_rows, importer_id, tariff_delta, format, top_n, sort, get_data_version()
+    )
+    if scanned is None:
+        raise HTTPException(status_code=404, detail=f"Unknown economy: {importer_id}")
+    header, rows = scanned
+
+    def lines():
+        yield json.dumps(header) + "\n"
+        for chunk in rows.chunks():
+            yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text format: engine stages, SQL, caches and HTTP latency (this process and its workers)."""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _check_profile_token(header_token: Optional[str], query_token: Optional[str]):
+    """The profile endpoints need the same `profiling.token` as triggering a profile."""
+    if not PROFILING_CONFIG.get("enabled", False):
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiling.token_matches(PROFILING_CONFIG.get("token"), header_token or query_token):
+        raise HTTPException(status_code=403, detail="Missing or invalid profile token")
+
+@app.get("/api/profiles")
+def list_profiles(
+    x_tipm_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = Query(default=None)
+):
+    """Saved request profiles, newest first."""
+    _check_profile_token(x_tipm_profile_token, profile_token)
+    return [{**meta, "url": f"/api/profiles/{meta['id']}"} for meta in PROFILE_STORE.list()]
+
+@app.get("/api/profiles/{profile_id}")
+def fetch_profile(
+    profile_id: str,
+    x_tipm_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = Query(default=None)
+):
+    """
+    The dump of one profile: a pstats file (`python -m pstats`, snakeviz) or collapsed stacks
+    (flamegraph.pl, speedscope).
+    """
+    _check_profile_token(x_tipm_profile_token, profile_token)
+    meta = PROFILE_STORE.get(profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {profile_id}")
+    media_type = "text/plain; charset=utf-8" if meta["format"] == "collapsed" else "application/octet-stream"
+    return FileResponse(meta["file_path"], media_type=media_type, filename=meta["file"])
+
+@app.get("/api/stats")
+def engine_stats():
+    """Request coalescing, result cache and ingestion HTTP cache counters."""
+    return {
+        "simulate_coalescing": SIMULATION_FLIGHTS.stats(),
+        "result_cache": get_result_cache().stats(),
+        "ingestion_http": get_http_client(CONFIG).stats()
+    }
+
+def _refresh_gdp(progress: JobProgress):
+    """Background job: refresh every economy's GDP from the World Bank and swap in a new snapshot."""
+    # 1. Initialize Ingestor with centralized config
+    ingestor = WorldBankIngestor(CONFIG)
+
+    # 2. Fetch list of countries currently in DB to refresh
+    with db_connection() as conn:
+        country_codes = [row['id'] for row in conn.execute("SELECT id FROM economies")]
+    progress.set_total(len(country_codes))
+
+    def on_batch(codes: List[str], results: Dict[str, float]):
+        missing = {code: "No GDP data returned" for code in codes if code not in results}
+        progress.advance(results=results, errors=missing, count=len(codes))
+
+    # 3. Trigger Ingestion: concurrent, rate-limited multi-country batches
+    updated_data = asyncio.run(ingestor.refresh_all_economies_async(country_codes, on_batch=on_batch))
+
+    # 4. Write only the GDP figures that changed, in a single transaction
+    with db_connection() as conn:
+        changes = apply_delta(
+            conn, ECONOMY_GDP, (((code,), (gdp,)) for code, gdp in updated_data.items()), source="worldbank_wdi"
+        )
+
+    # 5. Swap in a fresh snapshot and invalidate only results that depend on the changed economies
+    notify_data_changed([changes])
+    return (
+        f"Successfully refreshed GDP for {len(updated_data)} economies "
+        f"({changes.rows_changed} changed, refresh {changes.refresh_id})."
+    )
+
+@app.post("/api/data/refresh", status_code=202)
 async def refresh_data():
     """
-    Triggers the automated data ingestion from external sources.
-    This demonstrates the capability to ingest live data without manual intervention.
+    Triggers the automated data ingestion from external sources as a background job and
+    returns its id immediately. Poll GET /api/jobs/{job_id} for progress and per-country results.
+    Only one refresh runs at a time; a second request gets 409 with the running job's id.
     """
     try:
-        # 1. Initialize Ingestor with centralized config
-        ingestor = WorldBankIngestor(CONFIG)
-        
-        # 2. Fetch list of countries currently in DB to refresh
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM economies")
-        country_codes = [row['id'] for row in cur.fetchall()]
-        cur.close()
-        conn.close()
-        
-        # 3. Trigger Ingestion (In a real system, this would be a background task)
-        # For this demonstration, we'll simulate a targeted refresh of key economies
-        updated_data = ingestor.refresh_all_economies(country_codes[:5]) # Limit to 5 for rapid demo
-        
-        # 4. Update the DB with new GDP figures
-        conn = get_db_connection()
-        cur = conn.cursor()
-        for code, gdp in updated_data.items():
-            cur.execute("UPDATE economies SET gdp_usd_bn = ?, last_updated = CURRENT_TIMESTAMP WHERE id = ?", (gdp, code))
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        return {
-            "status": "ingestion_complete",
-            "message": f"Successfully refreshed GDP for {len(updated_data)} economies.",
-            "details": updated_data
-        }
-    except Exception as e:
-        logger_err = f"IN_GESTION_ERROR: {str(e)}\n{traceback.format_exc()}"
-        print(logger_err)
-        raise HTTPException(status_code=500, detail=str(e))
+        job = REFRESH_JOBS.submit("data_refresh", _refresh_gdp)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job.id})
+    return {**REFRESH_JOBS.describe(job), "status_url": f"/api/jobs/{job.id}"}
+
+@app.get("/api/jobs")
+async def list_jobs():
+    return REFRESH_JOBS.list()
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = REFRESH_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
 
 if __name__ == "__main__":
     print("Starting TIPM Engine...")
@@ -0,0 +1,267 @@
+import time
+import bisect
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# --- IN-PROCESS METRICS (Prometheus text format) ---
+# Labelled counters, gauges and histograms with just enough of the Prometheus data model for
+# GET /metrics; recording is a dict update under a lock, so it stays on in production.
+# Simulation workers record into their own registry: workers.run_cpu_bound drains it after
+# every job and the parent merges the samples, so /metrics also covers the process pool.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = True
+
+def configure(config: Dict[str, Any]):
+    """Applies the `metrics` config section; with `enabled: false` recording becomes a no-op."""
+    global _enabled
+    _enabled = bool(config.get("enabled", True))
+
+def enabled() -> bool:
+    return _enabled
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+    def drain(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple[str, ...], float]):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["Registry"] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)  # Index of the first bucket with le >= value
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][slot] += 1
+            state[1] += value
+
+    def time(self, **labels) -> "_Timer":
+        """`with histogram.time(stage="..."):` observes the block's wall time in seconds."""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    self._values[key] = [list(counts), total]
+                else:
+                    state[0] = [a + b for a, b in zip(state[0], counts)]
+                    state[1] += total
+
+class Gauge(_Metric):
+    """Point-in-time values read from `fn` at scrape time: {label values tuple: value} or a number."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Any], labelnames: Sequence[str] = (),
+                 kind: str = "gauge", registry: Optional["Registry"] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.fn = fn
+        self.kind = kind  # "counter" for monotonic totals kept elsewhere (e.g. cache stats)
+
+    def render(self) -> List[str]:
+        try:
+            values = self.fn()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} {_format_value(v)}"
+            for key, v in sorted(values.items()) if v is not None
+        ]
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            samples = metric.render()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def drain(self) -> Dict[str, Any]:
+        """Takes (and resets) everything recorded so far, for shipping to another process."""
+        return {
+            name: values for name, metric in self._metrics.items()
+            if isinstance(metric, (Counter, Histogram)) and (values := metric.drain())
+        }
+
+    def merge(self, samples: Dict[str, Any]):
+        for name, values in (samples or {}).items():
+            metric = self._metrics.get(name)
+            if isinstance(metric, (Counter, Histogram)):
+                metric.merge(values)
+
+REGISTRY = Registry()
+
+# --- ENGINE METRICS ---
+STAGE_SECONDS = Histogram("tipm_stage_seconds", "Wall time of engine stages.", ["stage"])
+SQL_QUERIES = Counter("tipm_sql_queries_total", "SQL statements executed, by verb.", ["op"])
+SQL_SECONDS = Histogram("tipm_sql_query_seconds", "Time to execute (first step of) SQL statements.", ["op"])
+DB_POOL_WAIT_SECONDS = Histogram("tipm_db_pool_wait_seconds", "Time to check out a pooled connection.")
+HTTP_REQUESTS = Counter("tipm_http_requests_total", "HTTP requests served.", ["method", "route", "status"])
+HTTP_SECONDS = Histogram("tipm_http_request_duration_seconds", "HTTP request latency, body included.", ["method", "route"])
+CACHE_LOOKUPS = Counter("tipm_cache_lookups_total", "Cache lookups by outcome.", ["cache", "outcome"])
+INGEST_ROWS = Counter("tipm_ingestion_rows_total", "Rows handled by the ingestors.", ["source", "outcome"])
+INGEST_REQUESTS = Counter("tipm_ingestion_requests_total", "Upstream API calls made by the ingestors.", ["source", "outcome"])
+
+def stage(name: str) -> _Timer:
+    """`with metrics.stage("snapshot.build"):` records the block under tipm_stage_seconds."""
+    return _Timer(STAGE_SECONDS, {"stage": name})
+
+class StageClock:
+    """Times consecutive stages of one call; each lap() records the time since the previous lap."""
+    __slots__ = ("prefix", "last")
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - self.last, stage=f"{self.prefix}.{name}")
+        self.last = now
+
+def render() -> str:
+    return REGISTRY.render()
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request into tipm_http_requests_total and
+    tipm_http_request_duration_seconds. Routes are labelled by their path template
+    (`/api/exposure/{importer_id}`), and streamed responses are timed to their last chunk.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=path)
+            HTTP_REQUESTS.inc(method=scope["method"], route=path, status=status[0])
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
 from enum import Enum
 
@@ -11,7 +11,7 @@ class PolicyShock(BaseModel):
     source_id: str  # Importing Country ID (e.g., USA)
     target_id: str  # Exporting Goods Country ID (e.g., CHN)
     industry_id: str # Targeted Industry ID (e.g., D26)
-    tariff_delta: float # Percentage (e.g., 25 for 25%)
+    tariff_delta: float = Field(allow_inf_nan=False) # Percentage (e.g., 25 for 25%)
 
 class IndustryProfile(BaseModel):
     id: str
@@ -82,5 +82,45 @@ class SimulationResult(BaseModel):
     visuals: Optional[AdvancedVisuals] = None
     baseline_tariff_pct: float = 0.0 # Anchor for the specific shock pair
 
+class BatchShock(PolicyShock):
+    include_sensitivity: Optional[bool] = None # Per-item override of the batch default
+    include_visuals: Optional[bool] = None
+
+class BatchSimulationRequest(BaseModel):
+    shocks: List[BatchShock]
+    include_sensitivity: bool = True
+    include_visuals: bool = True
+
+class BatchItemResult(BaseModel):
+    index: int # Position in the request's shocks list
+    ok: bool
+    result: Optional[SimulationResult] = None
+    error: Optional[str] = None
+
+class BatchSimulationResponse(BaseModel):
+    results: List[BatchItemResult] # Same order as the request
+    group_count: int # Distinct (target_id, industry_id) pairs evaluated
+
+class UncertaintyBand(BaseModel):
+    mean: float
+    percentiles: Dict[str, float] # "p5", "p50", ... over the Monte Carlo draws
+
+class ImpactBand(BaseModel):
+    country_id: str
+    country_name: str
+    role: EconomicRole
+    direct_impact_usd_mn: UncertaintyBand
+    total_gdp_impact_pct: UncertaintyBand
+
+class UncertaintyAnalysis(BaseModel):
+    shock: PolicyShock
+    draws: int
+    seed: int
+    coefficients: Dict[str, UncertaintyBand] # Sampled model coefficients
+    impacts: List[ImpactBand] # Same order as SimulationResult.impacts
+    global_gdp_loss_usd_mn: UncertaintyBand
+    crashing_point_tariff: UncertaintyBand
+    past_crashing_point_share: float # Share of draws whose crashing point is below the shock's tariff
+
 # Rebuild models for recursive SunburstNode
 SunburstNode.model_rebuild()
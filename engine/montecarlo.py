@@ -0,0 +1,118 @@
+import numpy as np
+from typing import Any, Dict, Optional, Sequence
+
+from sweep import importer_balance
+
+# --- MONTE CARLO OVER MODEL COEFFICIENTS ---
+# The decay, wealth transfer, blowback and drag coefficients are point estimates. Here they
+# are drawn from configured distributions centred on those estimates (after the per-category
+# overrides), and steps 2-5 of logic.calculate_simulation are evaluated for every draw at
+# once: draws are an array axis, never a Python loop. The crashing point needs the whole
+# tariff grid per draw, so it is evaluated as a (draws x grid) matrix in bounded blocks.
+
+COEFFICIENTS = ("decay_factor", "wealth_transfer", "blowback_base", "drag_coeff")
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+def sample_coefficients(centers: Dict[str, float], distributions: Dict[str, Dict[str, Any]], draws: int,
+                        rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """
+    `draws` samples per coefficient, spread relative to its centre:
+      normal      rel_sd      centre * (1 + rel_sd * N(0, 1))
+      uniform     rel_spread  centre * U(1 - rel_spread, 1 + rel_spread)
+      triangular  rel_spread  same bounds, mode at the centre
+      lognormal   sigma       centre * exp(sigma * N(0, 1)) (median at the centre, stays positive)
+      fixed                   the centre (also for coefficients without a distribution)
+    Optional `min` / `max` clip the samples. Coefficients are drawn in COEFFICIENTS order,
+    so a seed reproduces the same draws.
+    """
+    samples = {}
+    for name in COEFFICIENTS:
+        center = float(centers[name])
+        spec = distributions.get(name) or {"dist": "fixed"}
+        kind = spec.get("dist", "fixed")
+        if kind == "normal":
+            values = center * (1.0 + spec.get("rel_sd", 0.0) * rng.standard_normal(draws))
+        elif kind == "uniform":
+            spread = spec.get("rel_spread", 0.0)
+            values = center * rng.uniform(1.0 - spread, 1.0 + spread, draws)
+        elif kind == "triangular":
+            spread = spec.get("rel_spread", 0.0)
+            values = center * (rng.triangular(1.0 - spread, 1.0, 1.0 + spread, draws) if spread > 0 else np.ones(draws))
+        elif kind == "lognormal":
+            values = center * np.exp(spec.get("sigma", 0.0) * rng.standard_normal(draws))
+        elif kind == "fixed":
+            values = np.full(draws, center)
+        else:
+            raise ValueError(f"Unknown distribution for {name}: {kind}")
+        if "min" in spec or "max" in spec:
+            values = np.clip(values, spec.get("min", -np.inf), spec.get("max", np.inf))
+        samples[name] = values
+    return samples
+
+def evaluate_draws(baseline: Any, tariff_delta: float, coefficients: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Steps 2-5 for one shock under every coefficient draw. Returns the exporter loss (scalar),
+    `upstream_loss_mn` (suppliers x draws), `net_importer_mn` and `global_loss_mn` (draws).
+    """
+    draws = coefficients["decay_factor"].size
+    tariff_factor = (baseline.baseline_tariff_pct + tariff_delta) / 100.0
+    direct_loss = baseline.sector_export_vol_mn * tariff_factor
+
+    supplier_exposure = np.array([s["exposure_usd_mn"] for s in baseline.suppliers], dtype=float)
+    if baseline.sector_export_vol_mn:
+        va_ratio = supplier_exposure / baseline.sector_export_vol_mn
+    else:
+        va_ratio = np.zeros_like(supplier_exposure)
+    upstream_loss = (direct_loss * va_ratio[:, np.newaxis]) * coefficients["decay_factor"][np.newaxis, :]
+
+    has_importer = baseline.source_name is not None
+    net_importer = importer_balance(
+        direct_loss, tariff_factor, tariff_delta, coefficients["wealth_transfer"], coefficients["blowback_base"],
+        coefficients["drag_coeff"], baseline.target_gdp_usd_bn
+    )["net_importer_mn"] if has_importer else np.zeros(draws)
+
+    # Global drain: every negative direct impact, in report order
+    global_loss = np.full(draws, direct_loss if direct_loss > 0 else 0.0)
+    global_loss += np.where(upstream_loss > 0, upstream_loss, 0.0).sum(axis=0)
+    global_loss += np.where(net_importer < 0, -net_importer, 0.0)
+    return {
+        "direct_loss_mn": direct_loss, "upstream_loss_mn": upstream_loss,
+        "net_importer_mn": net_importer, "global_loss_mn": global_loss
+    }
+
+def crashing_points(baseline: Any, tariff_grid: np.ndarray, coefficients: Dict[str, np.ndarray],
+                    block: int = 4096) -> np.ndarray:
+    """Per draw: the first grid tariff (> 0) where the importer's net impact turns negative, else the grid max."""
+    grid = np.asarray(tariff_grid, dtype=float)
+    draws = coefficients["wealth_transfer"].size
+    fallback = float(grid.max()) if grid.size else 100.0
+    if baseline is None or baseline.source_name is None or not grid.size:
+        return np.full(draws, fallback)
+
+    tariff_factor = (baseline.baseline_tariff_pct + grid) / 100.0
+    direct_loss = baseline.sector_export_vol_mn * tariff_factor
+    candidate = grid > 0
+    points = np.empty(draws)
+    for start in range(0, draws, block):
+        rows = slice(start, start + block)
+        net = importer_balance(
+            direct_loss[np.newaxis, :], tariff_factor[np.newaxis, :], grid[np.newaxis, :],
+            coefficients["wealth_transfer"][rows, np.newaxis], coefficients["blowback_base"][rows, np.newaxis],
+            coefficients["drag_coeff"][rows, np.newaxis], baseline.target_gdp_usd_bn
+        )["net_importer_mn"]
+        crashed = (net < 0) & candidate[np.newaxis, :]
+        first = crashed.argmax(axis=1)
+        points[rows] = np.where(crashed.any(axis=1), grid[first], fallback)
+    return points
+
+def band(values: Any, percentiles: Sequence[float]) -> Dict[str, Any]:
+    """Mean and percentiles over the last axis (draws)."""
+    values = np.asarray(values, dtype=float)
+    qs = np.percentile(values, percentiles, axis=-1)
+    return {"mean": values.mean(axis=-1), "percentiles": {f"p{q:g}": v for q, v in zip(percentiles, qs)}}
+
+def draw_count(requested: Optional[int], config: Dict[str, Any]) -> int:
+    draws = int(requested if requested is not None else config.get("draws", 2000))
+    if not 1 <= draws <= int(config.get("max_draws", 20000)):
+        raise ValueError(f"draws must be between 1 and {config.get('max_draws', 20000)}.")
+    return draws
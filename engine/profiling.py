@@ -0,0 +1,265 @@
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import cProfile
+import pstats
+import logging
+import threading
+import contextvars
+from collections import Counter
+from urllib.parse import parse_qs, parse_qsl, urlencode
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("RequestProfiler")
+
+# --- ON-DEMAND REQUEST PROFILING ---
+# With `profiling.enabled`, a request carrying the trigger header (X-TIPM-Profile) or query
+# parameter (?profile=) runs under a profiler and leaves a dump in `profiling.directory`:
+#   pstats    - cProfile of the handler, loadable with pstats / snakeviz
+#   collapsed - sampled stacks, one "frame;frame;frame count" line each, for flamegraph.pl
+#               or speedscope
+# CPU-bound work of a profiled request runs inline (workers.run_cpu_bound) instead of in the
+# process pool, and /simulate skips its result cache, so the dump shows the real computation.
+
+FORMATS = {"pstats": ".prof", "collapsed": ".collapsed"}
+TRIGGER_ALIASES = {"1": None, "true": None, "yes": None, "pstats": "pstats", "cprofile": "pstats",
+                   "collapsed": "collapsed", "sampling": "collapsed", "flamegraph": "collapsed"}
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+def token_matches(expected: Optional[str], supplied: Optional[str]) -> bool:
+    """Constant-time check of a supplied `profiling.token`; anything goes when none is configured."""
+    if not expected:
+        return True
+    return hmac.compare_digest((supplied or "").encode(), str(expected).encode())
+
+_session: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar("profile_session", default=None)
+_loop_profiler_lock = threading.Lock()  # One cProfile hook per thread: concurrent sessions skip the loop thread
+
+def current_session() -> Optional["ProfileSession"]:
+    """The profiling session of the request being handled, if it asked for one."""
+    return _session.get()
+
+class ProfileSession:
+    """Profiler state for one request; `call` runs CPU-bound work under the same session."""
+
+    def __init__(self, fmt: str, sample_interval: float):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.format = fmt
+        self.sample_interval = sample_interval
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._threads: Dict[int, int] = {}  # thread ident -> active registrations
+        self._samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._loop_profile: Optional[cProfile.Profile] = None
+
+    # --- LIFECYCLE ---
+    def start(self):
+        """Starts profiling the calling (event loop) thread."""
+        if self.format == "collapsed":
+            self._register(threading.get_ident())
+            self._sampler = threading.Thread(target=self._sample, name=f"profile-{self.id}", daemon=True)
+            self._sampler.start()
+        elif _loop_profiler_lock.acquire(blocking=False):
+            self._loop_profile = cProfile.Profile()
+            self._loop_profile.enable()
+
+    def stop(self):
+        if self._loop_profile is not None:
+            self._loop_profile.disable()
+            _loop_profiler_lock.release()
+            self._profiles.append(self._loop_profile)
+            self._loop_profile = None
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+
+    def call(self, fn: Callable, *args) -> Any:
+        """Runs `fn(*args)` in the calling thread under this session's profiler."""
+        if self.format == "collapsed":
+            ident = threading.get_ident()
+            self._register(ident)
+            try:
+                return fn(*args)
+            finally:
+                self._unregister(ident)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    # --- SAMPLING ---
+    def _register(self, ident: int):
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def _unregister(self, ident: int):
+        with self._lock:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+            with self._lock:
+                idents = list(self._threads)
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self._samples[";".join(reversed(stack))] += 1
+
+    # --- OUTPUT ---
+    def write(self, directory: str) -> Optional[str]:
+        """Writes the dump; returns its path, or None when nothing was captured."""
+        path = os.path.join(directory, self.id + FORMATS[self.format])
+        if self.format == "collapsed":
+            if not self._samples:
+                return None
+            with open(path, "w") as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            return path
+        if not self._profiles:
+            return None
+        stats = pstats.Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        return path
+
+class ProfileStore:
+    """Profile dumps plus a JSON sidecar each, newest `keep` retained."""
+
+    def __init__(self, directory: str, keep: int = 50):
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, session: ProfileSession, meta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        os.makedirs(self.directory, exist_ok=True)
+        path = session.write(self.directory)
+        if path is None:
+            return None
+        meta = {"id": session.id, "format": session.format, "file": os.path.basename(path),
+                "bytes": os.path.getsize(path), "created_at": time.time(), **meta}
+        with open(os.path.join(self.directory, f"{session.id}.json"), "w") as f:
+            json.dump(meta, f)
+        self._prune()
+        return meta
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") and PROFILE_ID.match(name[:-5]):
+                try:
+                    with open(os.path.join(self.directory, name), "r") as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda meta: meta["created_at"], reverse=True)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json"), "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta["file_path"] = os.path.join(self.directory, meta["file"])
+        return meta if os.path.exists(meta["file_path"]) else None
+
+    def _prune(self):
+        for meta in self.list()[self.keep:]:
+            for name in (f"{meta['id']}.json", meta.get("file")):
+                if name:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware starting a ProfileSession for requests that ask for one. The trigger value
+    picks the format (`pstats`/`collapsed`, `1` = configured default); with `token` configured
+    the request must also send X-TIPM-Profile-Token (or ?profile_token=). The response
+    carries X-Profile-Id from its first byte, but the dump is written only after the response
+    has finished: /api/profiles/{id} answers 404 until then, and for good if nothing was
+    recorded or the write failed. The sidecar keeps the query string minus the trigger and token.
+    """
+    def __init__(self, app, config: Dict[str, Any]):
+        self.app = app
+        self.enabled = bool(config.get("enabled", False))
+        self.header = config.get("header", "X-TIPM-Profile").lower().encode()
+        self.query_param = config.get("query_param", "profile")
+        self.token = config.get("token")
+        self.default_format = config.get("format", "pstats")
+        self.sample_interval = config.get("sample_interval_ms", 1.0) / 1000.0
+        self.store = ProfileStore(config.get("directory", "data/profiles"), keep=config.get("keep", 50))
+
+    def _requested_format(self, scope) -> Optional[str]:
+        headers = dict(scope.get("headers") or [])
+        query = parse_qs(scope.get("query_string", b"").decode(), keep_blank_values=True)
+        value = headers.get(self.header, b"").decode().strip().lower() or (query.get(self.query_param) or [""])[0].lower()
+        if not value or value not in TRIGGER_ALIASES:
+            return None
+        if self.token:
+            supplied = headers.get(b"x-tipm-profile-token", b"").decode() or (query.get("profile_token") or [""])[0]
+            if not token_matches(self.token, supplied):
+                return None
+        return TRIGGER_ALIASES[value] or self.default_format
+
+    def _recorded_query(self, scope) -> str:
+        """The query string for the sidecar, without the trigger and the profile token."""
+        query = parse_qsl(scope.get("query_string", b"").decode(), keep_blank_values=True)
+        return urlencode([(key, value) for key, value in query if key not in (self.query_param, "profile_token")])
+
+    async def __call__(self, scope, receive, send):
+        fmt = self._requested_format(scope) if self.enabled and scope["type"] == "http" else None
+        if fmt is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(fmt, self.sample_interval)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", session.id.encode())]}
+            await send(message)
+
+        token = _session.set(session)
+        session.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.stop()
+            _session.reset(token)
+            meta = {
+                "method": scope["method"], "path": scope["path"],
+                "query": self._recorded_query(scope), "status": status[0],
+                "duration_ms": round((time.perf_counter() - session.started) * 1e3, 3)
+            }
+            try:
+                if self.store.save(session, meta) is not None:
+                    logger.info(f"Saved {fmt} profile {session.id} for {scope['method']} {scope['path']}")
+            except OSError as e:
+                logger.error(f"PROFILE_WRITE_ERROR: {e}")
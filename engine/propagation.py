@@ -0,0 +1,127 @@
+import threading
+import logging
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from typing import Dict, Optional
+from snapshot import TradeSnapshot
+
+logger = logging.getLogger("PropagationEngine")
+
+# --- MULTI-TIER UPSTREAM PROPAGATION (Leontief) ---
+# Nodes are (economy, industry) pairs, flattened as economy * n_industries + industry.
+# A[u, s] is the share of node s's exported value added sourced from supplier u in the same
+# industry, so a loss at s pulls back decay * A[u, s] from u at the next tier. The total
+# upstream exposure of a shock is the series sum_k (decay * A)^k applied to the direct
+# supplier vector, i.e. (I - decay * A)^-1 v, which is factorized once per data version.
+# Exposures are solved for a whole industry at once (one right-hand side per target) and cached.
+# trade_matrix records value added per (exporter, importer, industry) with no input-industry
+# dimension, so a node can only be linked to suppliers in its own industry: A is block-diagonal
+# per industry and losses never cross from one industry into another. It is an inter-country
+# Leontief system within each industry, not a full inter-industry input-output table.
+
+class PropagationEngine:
+    """Sparse coefficient matrix for one snapshot, with a cached factorization of (I - dA)."""
+
+    def __init__(self, snap: TradeSnapshot, decay_factor: float, method: str = "factorized",
+                 max_depth: int = 8, tolerance: float = 1e-9):
+        if method not in ("factorized", "series"):
+            raise ValueError(f"Unknown propagation method: {method}")
+        self.version = snap.version
+        self.decay_factor = decay_factor
+        self.method = method
+        self.max_depth = max_depth
+        self.tolerance = tolerance
+        self.n_economies, _, self.n_industries = snap.shape
+        self._snap = snap
+        self._lock = threading.Lock()
+        self._exposures: Dict[int, np.ndarray] = {}  # industry -> (supplier x target) exposures
+        self._totals: Optional[np.ndarray] = None
+        self.coefficients = self._build_coefficients(snap)
+        self._lu = None
+        if method == "factorized":
+            size = self.coefficients.shape[0]
+            system = (sp.identity(size, format="csc") - decay_factor * self.coefficients).tocsc()
+            self._lu = splu(system)
+        logger.info(
+            f"Propagation v{self.version}: {self.coefficients.shape[0]} nodes, "
+            f"{self.coefficients.nnz} links, method={method}"
+        )
+
+    def _build_coefficients(self, snap: TradeSnapshot) -> sp.csc_matrix:
+        """
+        A[(u, i), (s, i)] for supplier u and customer s in the same industry i. Without an
+        input-industry dimension in trade_matrix there are no (u, j) -> (s, i) links for j != i,
+        so the matrix is block-diagonal per industry.
+        """
+        va = np.where(snap.present, snap.value_added, 0.0)
+        idx = np.arange(self.n_economies)
+        va[idx, idx, :] = 0.0  # Domestic value added is not an upstream link
+
+        exports = va.sum(axis=1)  # (E, I): value added each node ships downstream
+        inputs = va.sum(axis=0)   # (E, I): value added each node sources upstream
+        # Normalize by the larger of the two so every column sums to <= 1 and the
+        # series converges for any decay factor below 1.
+        denominator = np.maximum(exports, inputs)
+
+        supplier, customer, industry = np.nonzero(va)
+        values = va[supplier, customer, industry] / denominator[customer, industry]
+        size = self.n_economies * self.n_industries
+        return sp.csc_matrix(
+            (values, (supplier * self.n_industries + industry, customer * self.n_industries + industry)),
+            shape=(size, size)
+        )
+
+    def _direct_vectors(self, industry_idx: int) -> np.ndarray:
+        """(nodes x E) right-hand sides: column t holds the direct supplier VA of target t in the industry."""
+        va = np.where(self._snap.present[:, :, industry_idx], self._snap.value_added[:, :, industry_idx], 0.0)
+        np.fill_diagonal(va, 0.0)
+        vectors = np.zeros((self.coefficients.shape[0], self.n_economies))
+        vectors[np.arange(self.n_economies) * self.n_industries + industry_idx, :] = va
+        return vectors
+
+    def _solve(self, vectors: np.ndarray) -> np.ndarray:
+        if self._lu is not None:
+            return self._lu.solve(vectors)
+        total = vectors.copy()
+        term = vectors
+        for _ in range(self.max_depth):
+            term = self.decay_factor * (self.coefficients @ term)
+            total += term
+            if np.abs(term).sum() <= self.tolerance * max(np.abs(total).sum(), 1.0):
+                break
+        return total
+
+    def industry_exposures(self, industry_idx: int) -> np.ndarray:
+        """
+        (supplier x target) matrix of value added (USD mn) exposed to a loss of each target's exports
+        in `industry_idx`: direct supplier VA plus the decayed contribution of deeper tiers. Tier-1
+        entries reduce to trade_matrix VA when there are no deeper links, recovering the single-hop
+        formula. The diagonal is zero: a shocked exporter is never its own supplier.
+        """
+        exposures = self._exposures.get(industry_idx)
+        if exposures is None:
+            nodes = self._solve(self._direct_vectors(industry_idx))
+            exposures = nodes[np.arange(self.n_economies) * self.n_industries + industry_idx, :]
+            np.fill_diagonal(exposures, 0.0)
+            exposures[np.abs(exposures) < 1e-12] = 0.0
+            exposures.setflags(write=False)
+            with self._lock:
+                self._exposures[industry_idx] = exposures
+        return exposures
+
+    def upstream_exposure(self, target_idx: int, industry_idx: int) -> np.ndarray:
+        """Per-economy exposure to a loss of `target_idx`'s exports in `industry_idx`."""
+        return self.industry_exposures(industry_idx)[:, target_idx]
+
+    def total_exposures(self) -> np.ndarray:
+        """(target x industry) total upstream exposure over suppliers with an economy profile."""
+        totals = self._totals
+        if totals is None:
+            has_profile = self._snap.has_profile
+            totals = np.stack(
+                [self.industry_exposures(i)[has_profile, :].sum(axis=0) for i in range(self.n_industries)], axis=1
+            ) if self.n_industries else np.zeros((self.n_economies, 0))
+            totals.setflags(write=False)
+            self._totals = totals
+        return totals
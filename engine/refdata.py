@@ -0,0 +1,43 @@
+from pydantic import TypeAdapter
+from typing import Dict, List
+from models import EconomyProfile, IndustryProfile
+from snapshot import TradeSnapshot
+
+# --- REFERENCE DATA CACHE ---
+# Economy and industry metadata with O(1) id lookups and the list endpoints' JSON bodies
+# serialized ahead of time. Built from a snapshot and tagged with its version.
+
+_economy_list = TypeAdapter(List[EconomyProfile])
+_industry_list = TypeAdapter(List[IndustryProfile])
+
+class ReferenceData:
+    """Read-only metadata bundle; replaced as a whole when the data version changes."""
+
+    def __init__(self, version: int, economies: List[EconomyProfile], industries: List[IndustryProfile]):
+        self.version = version
+        self.economies = economies    # Ordered by name, as served by /economies
+        self.industries = industries  # Ordered by name, as served by /industries
+        self.economies_by_id: Dict[str, EconomyProfile] = {e.id: e for e in economies}
+        self.industries_by_id: Dict[str, IndustryProfile] = {i.id: i for i in industries}
+        self.economies_json: bytes = _economy_list.dump_json(economies)
+        self.industries_json: bytes = _industry_list.dump_json(industries)
+
+    @classmethod
+    def from_snapshot(cls, snap: TradeSnapshot) -> "ReferenceData":
+        economies = [
+            EconomyProfile(id=code, name=snap.economy_names[idx], gdp_usd_bn=float(snap.gdp_usd_bn[idx]))
+            for idx, code in enumerate(snap.economy_ids) if snap.has_profile[idx]
+        ]
+        industries = [
+            IndustryProfile(id=code, name=snap.industry_names[idx], category=snap.industry_categories[idx])
+            for idx, code in enumerate(snap.industry_ids)
+        ]
+        return cls(
+            version=snap.version,
+            economies=sorted(economies, key=lambda e: e.name),
+            industries=sorted(industries, key=lambda i: i.name)
+        )
+
+    def industry_name(self, industry_id: str) -> str:
+        profile = self.industries_by_id.get(industry_id)
+        return profile.name if profile else industry_id
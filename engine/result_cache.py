@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("ResultCache")
+
+# --- SIMULATION RESULT CACHE ---
+# Serialized /simulate responses keyed by the normalized shock, the requested sections and
+# the data version. Tier 1 is an in-memory LRU bounded by entries, bytes and TTL; tier 2 is an
+# optional directory of zlib-compressed bodies so warm results survive restarts.
+
+def make_cache_key(shock: Dict[str, Any], options: Dict[str, Any], data_version: str) -> str:
+    """Stable key for a shock. Equal floats (10 vs 10.0) and field order map to the same key."""
+    normalized = {
+        "source_id": str(shock["source_id"]).strip(),
+        "target_id": str(shock["target_id"]).strip(),
+        "industry_id": str(shock["industry_id"]).strip(),
+        "tariff_delta": round(float(shock["tariff_delta"]), 9),
+    }
+    payload = json.dumps({"shock": normalized, "options": options, "data": data_version}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:40]
+
+def result_tags(shock: Dict[str, Any]) -> List[str]:
+    """Data a result depends on, for selective invalidation: both economies and the industry."""
+    return [
+        f"economy:{str(shock['source_id']).strip()}", f"economy:{str(shock['target_id']).strip()}",
+        f"industry:{str(shock['industry_id']).strip()}"
+    ]
+
+class ResultCache:
+    """Two-tier byte cache. All methods are thread-safe."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600,
+                 disk_path: Optional[str] = None, disk_ttl_seconds: Optional[float] = None, compress_level: int = 6):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.disk_ttl_seconds = disk_ttl_seconds if disk_ttl_seconds is not None else ttl_seconds
+        self.compress_level = compress_level
+        # key -> (stored_at, body, meta); meta = {"shock", "options", "tags"} enables carry_over()
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ResultCache":
+        disk = config.get("disk", {})
+        return cls(
+            max_entries=config.get("max_entries", 1024),
+            max_bytes=int(config.get("max_mb", 64) * 1024 * 1024),
+            ttl_seconds=config.get("ttl_seconds", 3600),
+            disk_path=disk.get("path") if disk.get("enabled", False) else None,
+            disk_ttl_seconds=disk.get("ttl_seconds"),
+            compress_level=disk.get("compress_level", 6)
+        )
+
+    # --- MEMORY TIER ---
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, body, _) = self._entries.popitem(last=False)
+            self._bytes -= len(body)
+
+    def _remember(self, key: str, body: bytes, stored_at: float, meta: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (stored_at, body, meta)
+            self._bytes += len(body)
+            self._evict()
+
+    # --- DISK TIER ---
+    def _disk_file(self, key: str) -> str:
+        return os.path.join(self.disk_path, f"{key}.json.z")
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        path = self._disk_file(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if time.time() - stored_at > self.disk_ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return stored_at, zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def _disk_put(self, key: str, body: bytes):
+        path = self._disk_file(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(zlib.compress(body, self.compress_level))
+            os.replace(tmp_path, path)  # Readers never see a partial file
+        except OSError as e:
+            logger.warning(f"RESULT_CACHE_DISK_ERROR: {e}")
+
+    # --- PUBLIC API ---
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, body, _ = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body
+                del self._entries[key]
+                self._bytes -= len(body)
+        if self.disk_path:
+            entry = self._disk_get(key)
+            if entry is not None:
+                self._remember(key, entry[1], entry[0])
+                self.disk_hits += 1
+                return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, body: bytes, meta: Optional[Dict[str, Any]] = None):
+        """Stores `body`. With `meta` ({"shock", "options", "tags"}) the entry can survive a delta refresh."""
+        self._remember(key, body, time.time(), meta)
+        if self.disk_path:
+            self._disk_put(key, body)
+
+    def clear(self):
+        """Drops the memory tier. Disk entries are keyed by data version and simply age out."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def carry_over(self, data_version: str, stale_tags: Iterable[str]) -> Dict[str, int]:
+        """
+        After a delta refresh, re-keys memory entries to `data_version` unless they carry one of
+        `stale_tags` (or no metadata); those are dropped. Disk entries simply age out.
+        """
+        stale: Set[str] = set(stale_tags)
+        kept = dropped = 0
+        with self._lock:
+            entries, self._entries, self._bytes = self._entries, OrderedDict(), 0
+            for stored_at, body, meta in entries.values():
+                if meta is None or stale.intersection(meta.get("tags", ())):
+                    dropped += 1
+                    continue
+                key = make_cache_key(meta["shock"], meta["options"], data_version)
+                self._entries[key] = (stored_at, body, meta)
+                self._bytes += len(body)
+                kept += 1
+        return {"kept": kept, "dropped": dropped}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries), "bytes": self._bytes,
+                "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses
+            }
@@ -0,0 +1,114 @@
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import orjson
+
+try:  # Optional: MessagePack responses are offered only when the package is installed
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from models import SimulationResult
+
+# --- SIMULATION RESPONSE ENCODING ---
+# /simulate responses are written from logic.simulation_data plus the raw sensitivity arrays:
+# impacts and visuals arrive as plain dicts and the sweep never becomes SensitivityPoint
+# models, so only the shock and the sensitivity header are dumped before orjson encodes it. Clients pick the representation with the Accept header:
+#   application/json                        rows, the SimulationResult schema (default)
+#   application/vnd.tipm.columnar+json      impacts and sensitivity points as struct-of-arrays
+#   application/msgpack                     rows, MessagePack (needs `pip install msgpack`)
+#   application/vnd.tipm.columnar+msgpack   columnar, MessagePack
+
+FORMATS = {
+    "json": "application/json",
+    "columnar": "application/vnd.tipm.columnar+json",
+    "msgpack": "application/msgpack",
+    "columnar_msgpack": "application/vnd.tipm.columnar+msgpack",
+}
+ALIASES = {"application/x-msgpack": "msgpack", "application/vnd.msgpack": "msgpack"}
+IMPACT_FIELDS = (
+    "country_id", "country_name", "role", "direct_impact_usd_mn", "total_gdp_impact_pct", "domestic_gain_usd_mn",
+    "deadweight_loss_usd_mn", "impact_narrative", "impact_reasons", "trend", "sectoral_impacts"
+)
+
+def available_formats() -> List[str]:
+    return [name for name in FORMATS if msgpack is not None or not name.endswith("msgpack")]
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """
+    Picks the format for an Accept header: the highest-q supported type, earlier entries
+    winning ties. JSON for a missing header or wildcards; None when nothing acceptable is offered.
+    """
+    if not accept or not accept.strip():
+        return "json"
+    offered = {media_type: name for name, media_type in FORMATS.items() if name in available_formats()}
+    offered.update({media_type: name for media_type, name in ALIASES.items() if name in available_formats()})
+    best, best_q = None, 0.0
+    for entry in accept.split(","):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        media_type = media_type.lower()
+        name = "json" if media_type in ("*/*", "application/*") else offered.get(media_type)
+        if name is not None and q > best_q:
+            best, best_q = name, q
+    return best
+
+def simulation_document(result: Union[SimulationResult, Dict[str, Any]], sweep: Any = None,
+                        columnar: bool = False) -> Dict[str, Any]:
+    """
+    The response as plain data, from a SimulationResult or from logic.simulation_data. `sweep`
+    (logic.SensitivitySweep) supplies the sensitivity points when the result was built with an
+    empty `data_points`.
+    """
+    if isinstance(result, SimulationResult):
+        doc = result.model_dump(mode="json")
+    else:
+        doc = dict(result, shock=result["shock"].model_dump(mode="json"))
+        if doc["sensitivity"] is not None:
+            doc["sensitivity"] = doc["sensitivity"].model_dump(mode="json")
+    sensitivity = doc.get("sensitivity")
+    if sensitivity is not None and sweep is not None:
+        if columnar:
+            sensitivity["data_points"] = {
+                "tariff_pct": sweep.tariff_pct, "global_loss_mn": sweep.global_loss_mn,
+                "is_crashing_point": sweep.is_crashing_point
+            }
+        else:
+            crash_idx = sweep.crash_idx
+            sensitivity["data_points"] = [
+                {"tariff_pct": t, "global_loss_mn": loss, "is_crashing_point": idx == crash_idx}
+                for idx, (t, loss) in enumerate(zip(sweep.tariff_pct.tolist(), sweep.global_loss_mn.tolist()))
+            ]
+    elif sensitivity is not None and columnar:
+        points = sensitivity["data_points"]
+        sensitivity["data_points"] = {key: [p[key] for p in points] for key in ("tariff_pct", "global_loss_mn", "is_crashing_point")}
+    if columnar:
+        impacts = doc["impacts"]
+        doc["impacts"] = {key: [impact[key] for impact in impacts] for key in IMPACT_FIELDS}
+    return doc
+
+def _plain(value: Any) -> Any:
+    """NumPy arrays to lists, for encoders without native array support."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+def encode(doc: Dict[str, Any], fmt: str) -> bytes:
+    if fmt in ("json", "columnar"):
+        return orjson.dumps(doc, option=orjson.OPT_SERIALIZE_NUMPY)
+    if msgpack is None:
+        raise RuntimeError("MessagePack output requires the msgpack package")
+    return msgpack.packb(_plain(doc), use_bin_type=True)
+
+def encode_simulation(result: Union[SimulationResult, Dict[str, Any]], sweep: Any = None, fmt: str = "json") -> bytes:
+    return encode(simulation_document(result, sweep, columnar=fmt.startswith("columnar")), fmt)
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+# --- SINGLE-FLIGHT REQUEST COALESCING ---
+# Concurrent callers asking for the same key share one in-flight computation: the first
+# caller (the leader) starts it as a task and everyone else awaits the same task.
+
+class SingleFlight:
+    """Thread-safe call coalescer with counters for observability."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs `fn()` once per concurrent `key` for callers sharing one event loop. Returns
+        (result, shared) where shared=True for followers. The computation runs as its own task,
+        so a caller that is cancelled (client disconnect) never cancels it for the others.
+        """
+        with self._lock:
+            self.calls += 1
+            task = self._inflight.get(key)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(fn())
+                self._inflight[key] = task
+                task.add_done_callback(lambda done, k=key: self._forget_async(k, done))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task), not leader
+
+    def _forget_async(self, key: str, task: "asyncio.Future"):
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every waiter went away
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls, "executions": self.executions,
+                "coalesced": self.coalesced, "in_flight": len(self._inflight)
+            }
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import time
+import json
+import shutil
+import hashlib
+import logging
+import numpy as np
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("TradeSnapshot")
+
+# --- IN-MEMORY TRADE MATRIX SNAPSHOT ---
+# trade_matrix, economies and industries are loaded once into integer-coded arrays so the
+# simulation hot path never touches SQLite. Cells are indexed [exporter, importer, industry]
+# (source_econ_id, target_econ_id, industry_id in trade_matrix terms).
+#
+# A snapshot can be exported to a directory of .npy columns plus a manifest holding the code
+# dictionaries (economy and industry ids are stored once; cells are addressed by their index).
+# Opening an export memory-maps the arrays read-only, so every process serving the same export
+# shares one copy of the pages through the OS page cache.
+#
+# Each export is a complete generation subdirectory; the CURRENT pointer file names the live
+# one and is swapped with os.replace, so readers always see one whole generation. The previous
+# generation is kept for readers that resolved the pointer just before the swap.
+
+SNAPSHOT_ARRAYS = ("gdp_usd_bn", "value_added", "baseline_tariff", "present")
+MANIFEST = "manifest.json"
+POINTER = "CURRENT"
+GENERATION_PREFIX = "gen-"
+
+class TradeSnapshot:
+    """Immutable, integer-coded copy of the reference tables. Swap instances, never mutate."""
+
+    def __init__(self, economy_ids: List[str], economy_names: List[Optional[str]], gdp_usd_bn: np.ndarray,
+                 industry_ids: List[str], industry_names: List[str], industry_categories: List[Optional[str]],
+                 value_added: np.ndarray, baseline_tariff: np.ndarray, present: np.ndarray, version: int = 0):
+        self.economy_ids = economy_ids
+        self.economy_names = economy_names
+        self.gdp_usd_bn = gdp_usd_bn
+        self.industry_ids = industry_ids
+        self.industry_names = industry_names
+        self.industry_categories = industry_categories
+        self.value_added = value_added          # float64 (E, E, I)
+        self.baseline_tariff = baseline_tariff  # float64 (E, E, I)
+        self.present = present                  # bool (E, E, I): row exists in trade_matrix
+        self.version = version
+        self.economy_index: Dict[str, int] = {code: idx for idx, code in enumerate(economy_ids)}
+        self.industry_index: Dict[str, int] = {code: idx for idx, code in enumerate(industry_ids)}
+        # Economies referenced by trade_matrix but absent from `economies` carry no profile
+        self.has_profile = np.array([name is not None for name in economy_names], dtype=bool)
+        self._fingerprint: Optional[str] = None
+        self.generation: Optional[str] = None  # Export generation this snapshot was opened from
+
+    @property
+    def shape(self):
+        return self.value_added.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.value_added.nbytes + self.baseline_tariff.nbytes + self.present.nbytes
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of the snapshot; identical data yields the same stamp across restarts."""
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=12)
+            digest.update(json.dumps([
+                self.economy_ids, self.economy_names, self.industry_ids,
+                self.industry_names, self.industry_categories
+            ]).encode())
+            for array in (self.gdp_usd_bn, self.value_added, self.baseline_tariff, self.present):
+                digest.update(np.ascontiguousarray(array).data)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, version: int = 0) -> "TradeSnapshot":
+        """Loads the three reference tables with one scan each."""
+        started = time.perf_counter()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT id, name, gdp_usd_bn FROM economies ORDER BY id ASC")
+            economies = cur.fetchall()
+            cur.execute("SELECT id, name, category FROM industries ORDER BY id ASC")
+            industries = cur.fetchall()
+            cur.execute("""
+                SELECT source_econ_id, target_econ_id, industry_id, value_added_usd_mn, baseline_tariff_pct
+                FROM trade_matrix
+            """)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+
+        economy_ids = [row[0] for row in economies]
+        economy_names: List[Optional[str]] = [row[1] for row in economies]
+        gdp = [float(row[2]) for row in economies]
+        economy_index = {code: idx for idx, code in enumerate(economy_ids)}
+
+        industry_ids = [row[0] for row in industries]
+        industry_index = {code: idx for idx, code in enumerate(industry_ids)}
+
+        # Trade rows may reference codes without a profile row; index them so lookups
+        # keep the JOIN semantics of the original queries.
+        for row in rows:
+            for code in (row[0], row[1]):
+                if code not in economy_index:
+                    economy_index[code] = len(economy_ids)
+                    economy_ids.append(code)
+                    economy_names.append(None)
+                    gdp.append(np.nan)
+
+        n_econ, n_ind = len(economy_ids), len(industry_ids)
+        value_added = np.zeros((n_econ, n_econ, n_ind), dtype=np.float64)
+        baseline_tariff = np.zeros_like(value_added)
+        present = np.zeros(value_added.shape, dtype=bool)
+
+        rows = [row for row in rows if row[2] in industry_index]
+        if rows:
+            src = np.fromiter((economy_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+            dst = np.fromiter((economy_index[row[1]] for row in rows), dtype=np.intp, count=len(rows))
+            ind = np.fromiter((industry_index[row[2]] for row in rows), dtype=np.intp, count=len(rows))
+            value_added[src, dst, ind] = np.fromiter((float(row[3]) for row in rows), dtype=np.float64, count=len(rows))
+            baseline_tariff[src, dst, ind] = np.fromiter((float(row[4] or 0.0) for row in rows), dtype=np.float64, count=len(rows))
+            present[src, dst, ind] = True
+
+        snapshot = cls(
+            economy_ids=economy_ids, economy_names=economy_names, gdp_usd_bn=np.array(gdp, dtype=np.float64),
+            industry_ids=industry_ids,
+            industry_names=[row[1] for row in industries],
+            industry_categories=[row[2] for row in industries],
+            value_added=value_added, baseline_tariff=baseline_tariff, present=present, version=version
+        )
+        logger.info(
+            f"Snapshot v{version} loaded: {n_econ} economies x {n_ind} industries, "
+            f"{len(rows)} trade rows, {snapshot.nbytes / 1e6:.1f} MB in {time.perf_counter() - started:.3f}s"
+        )
+        return snapshot
+
+    # --- COLUMNAR EXPORT ---
+    def save(self, path: str, source_signature: Optional[str] = None) -> str:
+        """
+        Writes the snapshot as a new generation under directory `path` and publishes it by
+        replacing the pointer file. Processes still mapping older files keep reading them until
+        they reopen. Returns the generation name.
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = self.current_generation(path)
+        generation = f"{GENERATION_PREFIX}{time.time_ns()}-{os.getpid()}"
+        staging = os.path.join(path, f".staging-{generation}")
+        os.makedirs(staging)
+        for name in SNAPSHOT_ARRAYS:
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        manifest = {
+            "format": 1, "fingerprint": self.fingerprint, "source_signature": source_signature,
+            "created_at": time.time(), "shape": list(self.shape),
+            "economy_ids": self.economy_ids, "economy_names": self.economy_names,
+            "industry_ids": self.industry_ids, "industry_names": self.industry_names,
+            "industry_categories": self.industry_categories
+        }
+        with open(os.path.join(staging, MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        os.rename(staging, os.path.join(path, generation))
+
+        pointer = os.path.join(path, f".{POINTER}-{generation}")
+        with open(pointer, "w") as f:
+            f.write(generation)
+        os.replace(pointer, os.path.join(path, POINTER))
+
+        for entry in os.listdir(path):
+            if entry.startswith(GENERATION_PREFIX) and entry not in (generation, previous):
+                shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+            elif entry == MANIFEST or entry.endswith(".npy"):  # Flat export from before generations
+                os.remove(os.path.join(path, entry))
+        logger.info(f"Snapshot v{self.version} exported to {path}/{generation} ({self.nbytes / 1e6:.1f} MB)")
+        return generation
+
+    @staticmethod
+    def current_generation(path: str) -> Optional[str]:
+        """Name of the published generation under export directory `path`, or None."""
+        try:
+            with open(os.path.join(path, POINTER), "r") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    @classmethod
+    def read_manifest(cls, path: str, generation: Optional[str] = None) -> Optional[Dict]:
+        generation = generation or cls.current_generation(path)
+        if generation is None:
+            return None
+        try:
+            with open(os.path.join(path, generation, MANIFEST), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def open(cls, path: str, version: int = 0, mmap: bool = True) -> "TradeSnapshot":
+        """
+        Opens the published export; with `mmap` the arrays are zero-copy read-only views of the
+        files. The pointer is resolved once, so manifest and arrays come from one generation.
+        """
+        started = time.perf_counter()
+        generation = cls.current_generation(path)
+        manifest = cls.read_manifest(path, generation) if generation is not None else None
+        if manifest is None:
+            raise FileNotFoundError(f"No snapshot export at {path}")
+        arrays = {
+            name: np.load(os.path.join(path, generation, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in SNAPSHOT_ARRAYS
+        }
+        snapshot = cls(
+            economy_ids=manifest["economy_ids"], economy_names=manifest["economy_names"],
+            industry_ids=manifest["industry_ids"], industry_names=manifest["industry_names"],
+            industry_categories=manifest["industry_categories"], version=version, **arrays
+        )
+        snapshot._fingerprint = manifest["fingerprint"]
+        snapshot.generation = generation
+        logger.info(
+            f"Snapshot v{version} opened from {path} ({'mmap' if mmap else 'copy'}, "
+            f"{snapshot.nbytes / 1e6:.1f} MB) in {time.perf_counter() - started:.4f}s"
+        )
+        return snapshot
+
+    # --- LOOKUPS ---
+    def economy(self, code: str) -> Optional[int]:
+        """Index of an economy with a profile row, or None."""
+        idx = self.economy_index.get(code)
+        return idx if idx is not None and self.has_profile[idx] else None
+
+    def industry(self, code: str) -> Optional[int]:
+        return self.industry_index.get(code)
+
+    def suppliers(self, target_idx: int, industry_idx: int) -> np.ndarray:
+        """Indices of economies (with profiles) feeding `target_idx` in `industry_idx`."""
+        mask = self.present[:, target_idx, industry_idx] & self.has_profile
+        return np.flatnonzero(mask)
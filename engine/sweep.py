@@ -0,0 +1,90 @@
+import numpy as np
+from typing import Any, Dict, Optional
+
+# --- VECTORIZED SENSITIVITY SWEEP ---
+# Evaluates the exporter (step 2), upstream (step 3) and importer (step 4) formulas of
+# logic.calculate_simulation for a whole tariff grid at once. The arithmetic mirrors the
+# scalar path term by term so both produce the same figures.
+
+def importer_balance(direct_loss, tariff_factor, tariff_delta, wealth_transfer, blowback_base, drag_coeff,
+                     target_gdp_usd_bn) -> Dict[str, np.ndarray]:
+    """Step 4 (market mechanism) on broadcastable arrays; same terms as calculate_simulation."""
+    # A: Wealth Transfer, shrinking with the efficiency gap
+    efficiency_gap_factor = np.maximum(0, 1 - (tariff_delta * drag_coeff))
+    domestic_gain = (direct_loss * wealth_transfer) * efficiency_gap_factor
+    # B: Deadweight Loss (Harberger Triangle)
+    deadweight_loss = direct_loss * (tariff_factor / 2)
+    # C: Inflationary Blowback
+    cost_spike = direct_loss * (blowback_base + (tariff_factor * 0.1))
+    # D: Retaliation, scaled by the target economy's size (capped at 5T GDP)
+    retaliation_multiplier = np.minimum(1.0, np.asarray(target_gdp_usd_bn, dtype=float) / 5000.0)
+    retaliation_damage = direct_loss * 0.20 * retaliation_multiplier
+    return {
+        "domestic_gain_mn": domestic_gain,
+        "deadweight_loss_mn": deadweight_loss,
+        "cost_spike_mn": cost_spike,
+        "retaliation_damage_mn": retaliation_damage,
+        "net_importer_mn": domestic_gain - (deadweight_loss + cost_spike + retaliation_damage)
+    }
+
+def evaluate_tariff_grid(baseline: Any, tariff_grid: np.ndarray, params: Dict[str, float],
+                         decay_factor: float) -> Dict[str, np.ndarray]:
+    """
+    Evaluates a shock baseline (logic.ShockBaseline) over every tariff delta in `tariff_grid`.
+    Returns arrays aligned with the grid; `upstream_loss_mn` is (suppliers x grid).
+    """
+    grid = np.asarray(tariff_grid, dtype=float)
+    zeros = np.zeros_like(grid)
+
+    if baseline is None:
+        # Data Null: every grid point yields an empty simulation
+        return {
+            "direct_loss_mn": zeros, "upstream_loss_mn": np.zeros((0, grid.size)),
+            "net_importer_mn": zeros, "has_importer": np.zeros(grid.size, dtype=bool),
+            "global_loss_mn": zeros
+        }
+
+    # Governance check: a zero tariff delta is policy neutral
+    active = grid != 0
+
+    # --- 2. EXPORTER ---
+    tariff_factor = (baseline.baseline_tariff_pct + grid) / 100.0
+    direct_loss = baseline.sector_export_vol_mn * tariff_factor
+
+    # --- 3. UPSTREAM ---
+    supplier_exposure = np.array([s["exposure_usd_mn"] for s in baseline.suppliers], dtype=float)
+    if baseline.sector_export_vol_mn:
+        va_ratio = supplier_exposure / baseline.sector_export_vol_mn
+    else:
+        va_ratio = np.zeros_like(supplier_exposure)
+    upstream_loss = (direct_loss[np.newaxis, :] * va_ratio[:, np.newaxis]) * decay_factor
+
+    # --- 4. IMPORTER ---
+    has_importer = active & (baseline.source_name is not None)
+    net_importer = importer_balance(
+        direct_loss, tariff_factor, grid, params["wealth_transfer"], params["blowback_base"],
+        params["drag_coeff"], baseline.target_gdp_usd_bn
+    )["net_importer_mn"]
+
+    # --- 5. GLOBAL DRAIN: sum of all negative direct impacts, in report order ---
+    global_loss = np.zeros_like(grid)
+    global_loss += np.where(-direct_loss < 0, direct_loss, 0.0)
+    for row in upstream_loss:
+        global_loss += np.where(-row < 0, row, 0.0)
+    global_loss += np.where(has_importer & (net_importer < 0), -net_importer, 0.0)
+    global_loss = np.where(active, global_loss, 0.0)
+
+    return {
+        "direct_loss_mn": np.where(active, direct_loss, 0.0),
+        "upstream_loss_mn": np.where(active[np.newaxis, :], upstream_loss, 0.0),
+        "net_importer_mn": np.where(has_importer, net_importer, 0.0),
+        "has_importer": has_importer,
+        "global_loss_mn": global_loss
+    }
+
+def find_crash_index(tariff_grid: np.ndarray, sweep: Dict[str, np.ndarray]) -> Optional[int]:
+    """First grid index (t > 0) where the importer's net impact turns negative, if any."""
+    grid = np.asarray(tariff_grid, dtype=float)
+    crashed = sweep["has_importer"] & (sweep["net_importer_mn"] < 0) & (grid > 0)
+    hits = np.flatnonzero(crashed)
+    return int(hits[0]) if hits.size else None
@@ -0,0 +1,84 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import logic
+import workers
+from models import PolicyShock
+from logic import calculate_batch, calculate_simulation
+from workers import partition_groups
+
+SHOCKS = [
+    PolicyShock(source_id='USA', target_id='CHN', industry_id='D26', tariff_delta=10.0),
+    PolicyShock(source_id='USA', target_id='IDN', industry_id='D01T03', tariff_delta=13.0),
+    PolicyShock(source_id='USA', target_id='CHN', industry_id='D26', tariff_delta=60.0),
+    PolicyShock(source_id='USA', target_id='XXX', industry_id='D26', tariff_delta=5.0),
+]
+
+def test_batch_matches_individual_runs():
+    print("--- 📦 Batch Simulation Consistency ---")
+    results, group_count = calculate_batch(SHOCKS, [True] * len(SHOCKS), [True] * len(SHOCKS))
+    assert group_count == 3
+    for shock, result in zip(SHOCKS, results):
+        assert result.model_dump() == calculate_simulation(shock).model_dump()
+
+def test_batch_flags_and_error_isolation(monkeypatch):
+    original = logic.calculate_simulation
+
+    def flaky(shock, **kwargs):
+        if shock.tariff_delta == 13.0:
+            raise ValueError("boom")
+        return original(shock, **kwargs)
+
+    monkeypatch.setattr(logic, "calculate_simulation", flaky)
+    results, _ = calculate_batch(SHOCKS, [False, True, True, True], [False, True, True, True])
+    assert results[0].sensitivity is None and results[0].visuals is None
+    assert isinstance(results[1], ValueError)
+    assert results[2].sensitivity is not None and results[2].sensitivity.shock_context == SHOCKS[2]
+
+def test_partition_keeps_groups_together():
+    keys = [(s.target_id, s.industry_id) for s in SHOCKS]
+    chunks = partition_groups(keys, 2)
+    assert sorted(i for chunk in chunks for i in chunk) == list(range(len(SHOCKS)))
+    assert any({0, 2} <= set(chunk) for chunk in chunks)
+
+def test_batch_endpoint_bound_and_payload(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(workers, "get_executor", lambda: None)  # Same process, so the patches below apply
+    monkeypatch.setitem(logic.CONFIG, "batch", {"max_shocks": 3})
+    client = TestClient(main.app)
+    too_many = client.post("/simulate/batch", json={"shocks": [SHOCKS[0].model_dump()] * 4})
+    assert too_many.status_code == 413 and "3 shocks" in too_many.json()["detail"]
+
+    expected = [json.loads(calculate_simulation(shock, include_visuals=False).model_dump_json()) for shock in SHOCKS[:3]]
+    original = logic.calculate_simulation
+
+    def flaky(shock, **kwargs):
+        if shock.tariff_delta == 13.0:
+            raise ValueError("boom")
+        return original(shock, **kwargs)
+
+    monkeypatch.setattr(logic, "calculate_simulation", flaky)
+    response = client.post("/simulate/batch", json={
+        "shocks": [{**SHOCKS[0].model_dump(), "include_sensitivity": False}, SHOCKS[1].model_dump(), SHOCKS[2].model_dump()],
+        "include_visuals": False
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["group_count"] == 2
+    assert [item["index"] for item in body["results"]] == [0, 1, 2]
+
+    first, failed, last = body["results"]
+    assert first["ok"] and first["error"] is None
+    assert first["result"]["sensitivity"] is None and first["result"]["visuals"] is None  # Per-shock override
+    assert first["result"]["impacts"] == expected[0]["impacts"]
+    assert failed == {"index": 1, "ok": False, "result": None, "error": "boom"}
+    assert last["ok"] and last["result"] == expected[2]
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
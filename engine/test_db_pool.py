@@ -0,0 +1,126 @@
+import sys
+import os
+import time
+import tempfile
+import sqlite3
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from db_pool import SQLitePool, PoolTimeout
+
+def test_readers_run_while_writer_holds_transaction():
+    print("--- 🔌 Pooled SQLite Concurrency ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = SQLitePool(os.path.join(tmp, "pool.db"), size=4)
+        with pool.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            with conn:
+                conn.execute("CREATE TABLE economies (id TEXT PRIMARY KEY, gdp_usd_bn REAL)")
+                conn.execute("INSERT INTO economies VALUES ('USA', 29000.0)")
+
+        errors = []
+        with pool.connection() as writer:
+            writer.execute("BEGIN IMMEDIATE")
+            writer.execute("UPDATE economies SET gdp_usd_bn = 1.0 WHERE id = 'USA'")
+
+            def read():
+                try:
+                    with pool.connection() as conn:
+                        # Readers see the last committed value, never "database is locked"
+                        assert conn.execute("SELECT gdp_usd_bn FROM economies").fetchone()[0] == 29000.0
+                except Exception as e:
+                    errors.append(e)
+
+            readers = [threading.Thread(target=read) for _ in range(3)]
+            for r in readers:
+                r.start()
+            for r in readers:
+                r.join()
+            writer.commit()
+
+        assert not errors, errors
+        stats = pool.stats()
+        assert stats["created"] <= 4 and stats["idle"] == stats["created"]
+        pool.close_all()
+
+def test_ordinary_errors_roll_back_and_reuse_the_connection():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = SQLitePool(os.path.join(tmp, "pool.db"), size=1)
+        with pool.connection() as conn:
+            conn.execute("CREATE TABLE economies (id TEXT PRIMARY KEY)")
+            conn.execute("INSERT INTO economies VALUES ('USA')")
+            conn.commit()
+        first = conn
+
+        with pytest.raises(sqlite3.IntegrityError):
+            with pool.connection() as conn:
+                conn.execute("INSERT INTO economies VALUES ('CHN')")
+                conn.execute("INSERT INTO economies VALUES ('USA')")
+        with pool.connection() as conn:
+            assert conn is first and not conn.in_transaction
+            assert conn.execute("SELECT COUNT(*) FROM economies").fetchone()[0] == 1  # CHN rolled back
+        assert pool.stats()["created"] == 1 and pool.stats()["discarded"] == 0
+        pool.close_all()
+
+def test_broken_connection_frees_its_slot_for_waiters():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = SQLitePool(os.path.join(tmp, "pool.db"), size=1, timeout=5.0)
+        checked_out, got = threading.Event(), []
+
+        def wait_for_connection():
+            checked_out.wait()
+            started = time.perf_counter()
+            with pool.connection() as conn:
+                got.append((conn, time.perf_counter() - started))
+
+        waiter = threading.Thread(target=wait_for_connection)
+        waiter.start()
+        with pytest.raises(sqlite3.DatabaseError):
+            with pool.connection() as broken:
+                checked_out.set()
+                time.sleep(0.1)  # The waiter is now blocked on the only slot
+                error = sqlite3.DatabaseError("database disk image is malformed")
+                error.sqlite_errorcode = sqlite3.SQLITE_CORRUPT
+                raise error
+        waiter.join()
+
+        conn, waited = got[0]
+        assert conn is not broken and waited < 1.0
+        assert pool.stats()["discarded"] == 1 and pool.stats()["waits"] == 1
+        pool.close_all()
+
+def test_acquisition_timeout_is_reported():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = SQLitePool(os.path.join(tmp, "pool.db"), size=1, timeout=0.05)
+        with pool.connection():
+            with pytest.raises(PoolTimeout, match="within 0.05s"):
+                with pool.connection():
+                    pass
+        pool.close_all()
+
+def test_checkouts_are_counted_under_concurrency():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often, so an unlocked += would lose increments
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            pool = SQLitePool(os.path.join(tmp, "pool.db"), size=4)
+
+            def check_out():
+                for _ in range(500):
+                    with pool.connection():
+                        pass
+
+            threads = [threading.Thread(target=check_out) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert pool.stats()["checkouts"] == 8 * 500
+            pool.close_all()
+    finally:
+        sys.setswitchinterval(interval)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
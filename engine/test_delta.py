@@ -0,0 +1,71 @@
+import sys
+import os
+import sqlite3
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from delta import apply_delta, ECONOMY_GDP, TRADE_VALUE_ADDED
+from result_cache import ResultCache, make_cache_key, result_tags
+from snapshot import TradeSnapshot
+from logic import stale_result_tags
+
+def _database() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE economies (id TEXT PRIMARY KEY, name TEXT, gdp_usd_bn REAL, last_updated DATETIME);
+        CREATE TABLE industries (id TEXT PRIMARY KEY, name TEXT, category TEXT);
+        CREATE TABLE trade_matrix (id INTEGER PRIMARY KEY AUTOINCREMENT, source_econ_id TEXT NOT NULL,
+            target_econ_id TEXT NOT NULL, industry_id TEXT NOT NULL, value_added_usd_mn REAL NOT NULL,
+            baseline_tariff_pct REAL NOT NULL DEFAULT 0.0, UNIQUE(source_econ_id, target_econ_id, industry_id));
+        INSERT INTO economies (id, name, gdp_usd_bn) VALUES ('USA', 'United States', 29000), ('CHN', 'China', 18800),
+                                                          ('SGP', 'Singapore', 547);
+        INSERT INTO industries VALUES ('D26', 'Electronics', 'Manufacturing'), ('D29', 'Motor vehicles', 'Manufacturing');
+        INSERT INTO trade_matrix (source_econ_id, target_econ_id, industry_id, value_added_usd_mn) VALUES
+            ('CHN', 'USA', 'D26', 80000), ('SGP', 'CHN', 'D26', 5000);
+    """)
+    return conn
+
+def test_delta_writes_only_changed_rows():
+    print("--- 🔁 Delta Refresh ---")
+    conn = _database()
+    gdp = [(("USA",), (29000.0,)), (("CHN",), (19000,)), (("SGP",), (547,))]
+    changes = apply_delta(conn, ECONOMY_GDP, gdp, source="test")
+    # Existing rows are hashed on first use, so only CHN counts as changed
+    assert (changes.rows_in, changes.rows_changed) == (3, 1)
+    assert changes.keys == {("CHN", None)}
+    assert conn.execute("SELECT gdp_usd_bn FROM economies WHERE id = 'CHN'").fetchone()[0] == 19000
+    assert conn.execute("SELECT last_updated FROM economies WHERE id = 'USA'").fetchone()[0] is None
+
+    assert not apply_delta(conn, ECONOMY_GDP, gdp, source="test").changed
+
+    trade = [(("CHN", "USA", "D26"), (80000,)), (("JPN", "USA", "D29"), (35000,))]
+    changes = apply_delta(conn, TRADE_VALUE_ADDED, trade, source="test", refresh_id="r1")
+    assert changes.rows_changed == 1 and changes.keys == {("JPN", "D29"), ("USA", "D29")}
+    recorded = conn.execute("SELECT economy_id, industry_id FROM data_changes WHERE refresh_id = 'r1'").fetchall()
+    assert sorted(recorded) == [("JPN", "D29"), ("USA", "D29")]
+
+def test_selective_cache_invalidation():
+    conn = _database()
+    snap = TradeSnapshot.from_connection(conn, version=1)
+    # SGP's GDP reaches every industry SGP supplies in (D26); a JPN-USA D29 row only D29
+    assert stale_result_tags(snap, {("SGP", None)}) == {"economy:SGP", "industry:D26"}
+    assert stale_result_tags(snap, {("JPN", "D29")}) == {"industry:D29"}
+
+    cache = ResultCache(max_entries=10)
+    shocks = [
+        {"source_id": "USA", "target_id": "CHN", "industry_id": "D26", "tariff_delta": 10.0},
+        {"source_id": "USA", "target_id": "JPN", "industry_id": "D29", "tariff_delta": 10.0},
+    ]
+    for shock in shocks:
+        meta = {"shock": shock, "options": {"sections": "all"}, "tags": result_tags(shock)}
+        cache.put(make_cache_key(shock, meta["options"], "v1"), b"body", meta=meta)
+    cache.put("untracked", b"body")
+
+    assert cache.carry_over("v2", {"industry:D26"}) == {"kept": 1, "dropped": 2}
+    assert cache.get(make_cache_key(shocks[1], {"sections": "all"}, "v2")) == b"body"
+    assert cache.get(make_cache_key(shocks[0], {"sections": "all"}, "v2")) is None
+    assert cache.stats()["bytes"] == 4
+
+if __name__ == "__main__":
+    test_delta_writes_only_changed_rows()
+    test_selective_cache_invalidation()
@@ -0,0 +1,63 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import workers
+from logic import calculate_simulation, scan_importer_exposure, scan_importer_exposure_rows
+from models import PolicyShock
+
+def test_exposure_scan_matches_simulation():
+    print("--- 🗺️ Bilateral Exposure Scan ---")
+    rows = scan_importer_exposure("USA", 25.0, mode="ranking")
+    header, pairs = rows[0], rows[1:]
+    assert header["pairs"] == len(pairs) > 0
+    assert [p["global_drain_mn"] for p in pairs] == sorted((p["global_drain_mn"] for p in pairs), reverse=True)
+
+    for pair in pairs:
+        shock = PolicyShock(source_id="USA", target_id=pair["exporter_id"], industry_id=pair["industry_id"], tariff_delta=25.0)
+        result = calculate_simulation(shock, include_sensitivity=False, include_visuals=False)
+        importer = [i for i in result.impacts if i.country_id == "USA"]
+        assert pair["global_drain_mn"] == pytest.approx(-result.global_gdp_loss_usd_mn, rel=1e-9)
+        assert pair["net_importer_mn"] == pytest.approx(importer[0].direct_impact_usd_mn, rel=1e-9)
+        print(f"{pair['exporter_id']}/{pair['industry_id']}: drain ${pair['global_drain_mn']:,.0f}M")
+
+    # Matrix mode: one row per exporter, a zero delta is policy neutral
+    matrix = scan_importer_exposure("USA", 0.0, mode="matrix")
+    assert all(v in (0.0, None) for row in matrix[1:] for v in row["global_drain_mn"])
+    assert scan_importer_exposure("ZZZ", 10.0) is None
+
+def test_rows_expand_chunk_by_chunk():
+    for mode in ("ranking", "matrix"):
+        header, rows = scan_importer_exposure_rows("USA", 25.0, mode=mode)
+        chunks = list(rows.chunks(2))
+        assert all(len(chunk) <= 2 for chunk in chunks) and len(chunks) == (len(rows) + 1) // 2
+        assert [header] + [row for chunk in chunks for row in chunk] == scan_importer_exposure("USA", 25.0, mode=mode)
+
+def test_exposure_endpoint_streams_ndjson(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(workers, "get_executor", lambda: None)
+    client = TestClient(main.app)
+    response = client.get("/api/exposure/USA?tariff_delta=25&top_n=3&sort=importer_net")
+    assert response.status_code == 200 and response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == scan_importer_exposure("USA", 25.0, mode="ranking", top_n=3, sort="importer_net")
+    assert lines[0]["importer_id"] == "USA" and len(lines) <= 4
+
+    matrix = [json.loads(line) for line in client.get("/api/exposure/USA?format=matrix").text.splitlines()]
+    header, rows = matrix[0], matrix[1:]
+    assert rows and all(len(row["global_drain_mn"]) == len(header["industry_ids"]) for row in rows)
+
+    missing = client.get("/api/exposure/ZZZ")
+    assert missing.status_code == 404 and missing.json()["detail"] == "Unknown economy: ZZZ"
+    assert client.get("/api/exposure/USA?format=csv").status_code == 422
+    for delta in ("nan", "inf", "-inf"):
+        assert client.get(f"/api/exposure/USA?tariff_delta={delta}").status_code == 422
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
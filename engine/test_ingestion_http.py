@@ -0,0 +1,83 @@
+import sys
+import os
+import json
+import asyncio
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from ingestion.http_cache import IngestionHTTP, OfflineCacheMiss
+
+class StubUpstream(BaseHTTPRequestHandler):
+    """Serves a versioned JSON document with an ETag and honours If-None-Match."""
+    version = 1
+    statuses = []
+
+    def do_GET(self):
+        cls = type(self)
+        etag = f'"v{cls.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            cls.statuses.append(304)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = json.dumps({"path": self.path, "version": cls.version}).encode()
+        cls.statuses.append(200)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_conditional_requests_and_offline_replay():
+    print("--- 💾 Shared Ingestion HTTP Cache ---")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubUpstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/country/USA"
+    with tempfile.TemporaryDirectory() as cache_dir:
+        try:
+            http = IngestionHTTP(cache_dir=cache_dir)
+            first = http.get(url, params={"date": "2023"})
+            assert first.json()["version"] == 1 and not first.from_cache
+
+            # Unchanged upstream: a 304 replays the stored body
+            again = http.get(url, params={"date": "2023"})
+            assert again.revalidated and again.json() == first.json()
+
+            # Different params are a different resource
+            assert not http.get(url, params={"date": "2022"}).from_cache
+
+            StubUpstream.version = 2
+            assert http.get(url, params={"date": "2023"}).json()["version"] == 2
+
+            async def fetch_async():
+                async with http.async_session() as session:
+                    return await session.get(url, params={"date": "2023"})
+            assert asyncio.run(fetch_async()).revalidated
+
+            download = http.download(url, params={"date": "2023"}, dest_path=os.path.join(cache_dir, "export.csv"))
+            with open(download.body_path) as f:
+                assert json.load(f)["version"] == 2
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert StubUpstream.statuses == [200, 304, 200, 200, 304, 304]
+        assert http.stats()["not_modified"] == 3
+
+        # Upstream gone: offline mode replays the cache and never touches the network
+        offline = IngestionHTTP(cache_dir=cache_dir, mode="offline")
+        assert offline.get(url, params={"date": "2023"}).json()["version"] == 2
+        with pytest.raises(OfflineCacheMiss):
+            offline.get(url, params={"date": "2019"})
+        assert offline.stats()["network"] == 0
+
+if __name__ == "__main__":
+    test_conditional_requests_and_offline_replay()
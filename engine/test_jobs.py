@@ -0,0 +1,98 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from jobs import JobManager, JobConflict
+
+def _wait(manager, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+def test_single_running_job_with_progress():
+    print("--- 🧵 Background Refresh Jobs ---")
+    manager = JobManager(history=2)
+    release = threading.Event()
+
+    def refresh(progress):
+        progress.set_total(3)
+        progress.advance(results={"USA": 27000.0}, count=2)
+        release.wait(5)
+        progress.advance(errors={"XXX": "No GDP data returned"})
+        return "done"
+
+    job = manager.submit("data_refresh", refresh)
+    with pytest.raises(JobConflict) as conflict:
+        manager.submit("data_refresh", refresh)
+    assert conflict.value.job is job
+
+    release.set()
+    status = _wait(manager, job.id)
+    assert status["status"] == "succeeded" and status["message"] == "done"
+    assert status["progress"] == {"completed": 3, "total": 3, "pct": 100.0}
+    assert status["results"] == {"USA": 27000.0} and status["errors"] == {"XXX": "No GDP data returned"}
+
+    # Once finished, a new refresh may start; coroutine jobs and failures are reported
+    async def failing(progress):
+        raise RuntimeError("upstream down")
+    failed = _wait(manager, manager.submit("data_refresh", failing).id)
+    assert failed["status"] == "failed" and failed["error"] == "upstream down"
+
+    _wait(manager, manager.submit("data_refresh", lambda progress: None).id)
+    assert manager.get(job.id) is None  # Evicted beyond `history`
+    assert len(manager.list()) == 2
+
+class StubWorldBank:
+    """Answers one economy's GDP once `release` is set, so the refresh job can be caught running."""
+    release = threading.Event()
+
+    def __init__(self, config):
+        pass
+
+    async def refresh_all_economies_async(self, codes, on_batch=None):
+        await asyncio.to_thread(self.release.wait, 5)
+        results = {"USA": 31000.0}
+        on_batch(codes, results)
+        return results
+
+def test_refresh_endpoint_and_job_status(isolated_engine, monkeypatch):
+    import main
+    import logic
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "WorldBankIngestor", StubWorldBank)
+    StubWorldBank.release.clear()
+    client = TestClient(main.app)
+    before = logic.get_data_version()
+
+    started = client.post("/api/data/refresh")
+    assert started.status_code == 202
+    job = started.json()
+    assert job["kind"] == "data_refresh" and job["status_url"] == f"/api/jobs/{job['job_id']}"
+    conflict = client.post("/api/data/refresh")
+    assert conflict.status_code == 409 and conflict.json()["detail"]["job_id"] == job["job_id"]
+
+    StubWorldBank.release.set()
+    deadline = time.time() + 5
+    while (status := client.get(job["status_url"]).json())["status"] not in ("succeeded", "failed"):
+        assert time.time() < deadline, "refresh job did not finish"
+        time.sleep(0.01)
+    assert status["status"] == "succeeded" and "1 changed" in status["message"]
+    assert status["results"] == {"USA": 31000.0} and "USA" not in status["errors"]
+    assert status["progress"]["pct"] == 100.0
+
+    assert job["job_id"] in [j["job_id"] for j in client.get("/api/jobs").json()]
+    assert client.get("/api/jobs/unknown").status_code == 404
+    assert logic.get_data_version() != before  # The new GDP is served without a restart
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,82 @@
+import sys
+import os
+import sqlite3
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from db_pool import InstrumentedConnection
+from workers import _run_with_metrics
+
+def test_prometheus_text_format():
+    print("--- 📈 Metrics Exposition ---")
+    registry = metrics.Registry()
+    requests = metrics.Counter("demo_requests_total", "Requests.", ["route"], registry=registry)
+    latency = metrics.Histogram("demo_seconds", "Latency.", ["route"], buckets=(0.1, 1.0), registry=registry)
+    metrics.Gauge("demo_ratio", "Ratio.", lambda: {("a",): 0.25, ("b",): None}, ["cache"], registry=registry)
+
+    requests.inc(route='/x/"{id}"')
+    requests.inc(2, route='/x/"{id}"')
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, route="/x")
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{route="/x/\\"{id}\\""} 3' in text
+    # Buckets are cumulative and end with +Inf == count
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/x",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/x"} 3' in text
+    assert 'demo_ratio{cache="a"} 0.25' in text and 'cache="b"' not in text
+
+def test_worker_samples_merge_into_parent():
+    before = metrics.STAGE_SECONDS.count(stage="test.worker")
+
+    def job(x):
+        metrics.STAGE_SECONDS.observe(0.01, stage="test.worker")
+        return x * 2
+
+    # Worker side drains what the job recorded; the parent merges it back
+    result, samples = _run_with_metrics(job, 21)
+    assert result == 42
+    assert metrics.STAGE_SECONDS.count(stage="test.worker") == before
+    metrics.REGISTRY.merge(samples)
+    assert metrics.STAGE_SECONDS.count(stage="test.worker") == before + 1
+
+def test_sql_statements_are_counted():
+    conn = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    selects = metrics.SQL_QUERIES.value(op="SELECT")
+    inserts = metrics.SQL_QUERIES.value(op="INSERT")
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+    conn.execute("SELECT COUNT(*) FROM t").fetchone()
+    cur = conn.cursor()
+    cur.execute("  select x FROM t")
+    assert metrics.SQL_QUERIES.value(op="SELECT") == selects + 2
+    assert metrics.SQL_QUERIES.value(op="INSERT") == inserts + 1
+
+def test_http_middleware_labels_route_templates():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: str):
+        return {"id": item_id}
+
+    with TestClient(app) as client:
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+    assert metrics.HTTP_REQUESTS.value(method="GET", route="/items/{item_id}", status="200") == 2
+    assert metrics.HTTP_REQUESTS.value(method="GET", route="unmatched", status="404") >= 1
+    assert metrics.HTTP_SECONDS.count(method="GET", route="/items/{item_id}") == 2
+
+if __name__ == "__main__":
+    test_prometheus_text_format()
+    test_worker_samples_merge_into_parent()
+    test_sql_statements_are_counted()
+    test_http_middleware_labels_route_templates()
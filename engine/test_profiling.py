@@ -0,0 +1,133 @@
+import sys
+import os
+import time
+import pstats
+import tempfile
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import profiling
+from workers import run_cpu_bound
+
+def busy(n):
+    total = 0
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        total += sum(i * i for i in range(n))
+    return total
+
+def make_app(directory, **overrides):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware, config={"enabled": True, "directory": directory, **overrides})
+
+    @app.get("/work")
+    async def work():
+        # CPU-bound work of a profiled request runs inline, under the request's session
+        return {"total": await run_cpu_bound(busy, 200), "profiled": profiling.current_session() is not None}
+
+    return app
+
+def test_only_triggered_requests_are_profiled():
+    print("--- 🔬 Request Profiling ---")
+    from fastapi.testclient import TestClient
+
+    with tempfile.TemporaryDirectory() as directory:
+        with TestClient(make_app(directory, token="s3cret")) as client:
+            plain = client.get("/work")
+            assert plain.json()["profiled"] is False and "x-profile-id" not in plain.headers
+            # Token configured but missing or wrong: served normally, no profile
+            assert "x-profile-id" not in client.get("/work", headers={"X-TIPM-Profile": "1"}).headers
+            assert "x-profile-id" not in client.get("/work?profile=1&profile_token=nope").headers
+            assert "x-profile-id" not in client.get("/work?profile=bogus&profile_token=s3cret").headers
+            assert os.listdir(directory) == []
+
+            profiled = client.get("/work?profile=1", headers={"X-TIPM-Profile-Token": "s3cret"})
+            assert profiled.json()["profiled"] is True
+            by_query = client.get("/work?n=3&profile=1&profile_token=s3cret")
+        profile_id = profiled.headers["x-profile-id"]
+        meta = profiling.ProfileStore(directory).get(profile_id)
+        assert meta["file_path"].endswith(".prof") and meta["status"] == 200 and meta["path"] == "/work"
+        assert meta["format"] == "pstats" and meta["method"] == "GET" and meta["query"] == ""
+        # Neither the trigger nor the token is kept in the sidecar that /api/profiles returns
+        assert profiling.ProfileStore(directory).get(by_query.headers["x-profile-id"])["query"] == "n=3"
+
+    # Disabled: the trigger is ignored
+    with tempfile.TemporaryDirectory() as directory:
+        with TestClient(make_app(directory, enabled=False)) as client:
+            assert "x-profile-id" not in client.get("/work", headers={"X-TIPM-Profile": "pstats"}).headers
+
+def test_pstats_and_collapsed_dumps():
+    from fastapi.testclient import TestClient
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = profiling.ProfileStore(directory)
+        with TestClient(make_app(directory)) as client:
+            pstats_id = client.get("/work", headers={"X-TIPM-Profile": "pstats"}).headers["x-profile-id"]
+            collapsed_id = client.get("/work?profile=collapsed").headers["x-profile-id"]
+
+        # cProfile dump covers the inline job thread, not just the event loop
+        stats = pstats.Stats(store.get(pstats_id)["file_path"])
+        assert any(func[2] == "busy" for func in stats.stats)
+
+        with open(store.get(collapsed_id)["file_path"], "r") as f:
+            lines = f.read().splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("busy (test_profiling.py:" in line for line in lines)
+
+        assert [meta["id"] for meta in store.list()] == [collapsed_id, pstats_id]
+
+def test_store_retention_and_id_validation():
+    with tempfile.TemporaryDirectory() as directory:
+        store = profiling.ProfileStore(directory, keep=2)
+        ids = []
+        for _ in range(3):
+            session = profiling.ProfileSession("pstats", 0.001)
+            session.call(busy, 10)
+            ids.append(store.save(session, {"method": "GET", "path": "/x"})["id"])
+        kept = [meta["id"] for meta in store.list()]
+        assert kept == ids[:0:-1]  # The oldest one was pruned
+        assert len(os.listdir(directory)) == 4  # Dump plus sidecar per kept profile
+
+        assert store.get("../../etc/passwd") is None
+        assert store.get("20240101T000000-deadbeef") is None
+
+def test_profile_endpoints_disabled_by_default():
+    import main
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    assert client.get("/api/profiles").status_code == 404
+    assert client.get("/api/profiles/20240101T000000-deadbeef").status_code == 404
+
+def test_profile_endpoints_require_the_token(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = profiling.ProfileStore(directory)
+        session = profiling.ProfileSession("pstats", 0.001)
+        session.call(busy, 10)
+        profile_id = store.save(session, {"method": "GET", "path": "/x"})["id"]
+        monkeypatch.setattr(main, "PROFILE_STORE", store)
+        monkeypatch.setitem(main.PROFILING_CONFIG, "enabled", True)
+        monkeypatch.setitem(main.PROFILING_CONFIG, "token", "s3cret")
+
+        client = TestClient(main.app)
+        assert client.get("/api/profiles").status_code == 403
+        assert client.get("/api/profiles?profile_token=nope").status_code == 403
+        assert client.get(f"/api/profiles/{profile_id}", headers={"X-TIPM-Profile-Token": "s3cre"}).status_code == 403
+
+        listed = client.get("/api/profiles", headers={"X-TIPM-Profile-Token": "s3cret"})
+        assert [meta["id"] for meta in listed.json()] == [profile_id]
+        dump = client.get(f"/api/profiles/{profile_id}?profile_token=s3cret")
+        with open(store.get(profile_id)["file_path"], "rb") as f:
+            assert dump.status_code == 200 and dump.content == f.read()
+        assert client.get("/api/profiles/20240101T000000-deadbeef?profile_token=s3cret").status_code == 404
+
+    assert profiling.token_matches(None, None) and not profiling.token_matches("s3cret", None)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,50 @@
+import sys
+import os
+import sqlite3
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from snapshot import TradeSnapshot
+from propagation import PropagationEngine
+
+DECAY = 0.4
+
+def _chain_snapshot() -> TradeSnapshot:
+    # KOR -> JPN -> DEU -> USA in D29, plus a KOR <-> JPN loop
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE economies (id TEXT PRIMARY KEY, name TEXT, gdp_usd_bn REAL);
+        CREATE TABLE industries (id TEXT PRIMARY KEY, name TEXT, category TEXT);
+        CREATE TABLE trade_matrix (source_econ_id TEXT, target_econ_id TEXT, industry_id TEXT,
+                                   value_added_usd_mn REAL, baseline_tariff_pct REAL DEFAULT 0.0);
+        INSERT INTO economies VALUES ('USA', 'United States', 29000), ('DEU', 'Germany', 4500),
+                                     ('JPN', 'Japan', 4200), ('KOR', 'South Korea', 1700);
+        INSERT INTO industries VALUES ('D29', 'Motor vehicles', 'Manufacturing');
+        INSERT INTO trade_matrix (source_econ_id, target_econ_id, industry_id, value_added_usd_mn) VALUES
+            ('DEU', 'USA', 'D29', 28000), ('JPN', 'DEU', 'D29', 4000),
+            ('KOR', 'JPN', 'D29', 1000), ('JPN', 'KOR', 'D29', 500), ('KOR', 'KOR', 'D29', 900);
+    """)
+    snap = TradeSnapshot.from_connection(conn, version=1)
+    conn.close()
+    return snap
+
+def test_multi_tier_exposure():
+    print("--- 🌊 Multi-tier Leontief Propagation ---")
+    snap = _chain_snapshot()
+    deu, jpn, kor, d29 = snap.economy_index['DEU'], snap.economy_index['JPN'], snap.economy_index['KOR'], snap.industry_index['D29']
+
+    exact = PropagationEngine(snap, DECAY, method="factorized").upstream_exposure(deu, d29)
+    series = PropagationEngine(snap, DECAY, method="series", max_depth=200, tolerance=1e-15).upstream_exposure(deu, d29)
+    one_hop = PropagationEngine(snap, DECAY, method="series", max_depth=0).upstream_exposure(deu, d29)
+
+    # Tier 1 only: the direct trade_matrix link
+    assert one_hop[jpn] == 4000 and one_hop[kor] == 0
+    # Tier 2: KOR supplies 1000 of JPN's 4500 exported VA
+    assert np.allclose(exact, series)
+    assert exact[kor] > DECAY * 4000 * (1000 / 4500) - 1e-9
+    assert exact[jpn] > 4000  # The KOR -> JPN loop feeds back
+    assert exact[deu] == 0    # The shocked exporter is never its own supplier
+
+if __name__ == "__main__":
+    test_multi_tier_exposure()
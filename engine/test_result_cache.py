@@ -0,0 +1,39 @@
+import sys
+import os
+import time
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from result_cache import ResultCache, make_cache_key
+
+SHOCK = {"source_id": "USA", "target_id": "CHN", "industry_id": "D26", "tariff_delta": 10}
+
+def test_key_normalization():
+    print("--- 🗄️ Simulation Result Cache ---")
+    key = make_cache_key(SHOCK, {}, "v1")
+    assert key == make_cache_key({**SHOCK, "tariff_delta": 10.0}, {}, "v1")
+    assert key != make_cache_key(SHOCK, {}, "v2")
+    assert key != make_cache_key({**SHOCK, "tariff_delta": 25.0}, {}, "v1")
+
+def test_lru_eviction_and_ttl():
+    cache = ResultCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"  # "a" becomes most recent
+    cache.put("c", b"3")
+    assert cache.get("b") is None and cache.get("c") == b"3"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+def test_disk_tier_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        ResultCache(disk_path=tmp).put("k", b'{"ok": true}')
+        reopened = ResultCache(disk_path=tmp)
+        assert reopened.get("k") == b'{"ok": true}'
+        assert reopened.stats()["disk_hits"] == 1
+
+if __name__ == "__main__":
+    test_key_normalization()
+    test_lru_eviction_and_ttl()
+    test_disk_tier_survives_restart()
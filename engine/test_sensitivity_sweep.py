@@ -0,0 +1,140 @@
+import sys
+import os
+import json
+import asyncio
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import PolicyShock, EconomicRole
+from logic import calculate_simulation, discover_crashing_point, build_tariff_grid, iter_sensitivity_chunks
+
+def _scalar_point(shock, t):
+    res = calculate_simulation(shock.model_copy(update={"tariff_delta": float(t)}), include_sensitivity=False)
+    importer = next((i for i in res.impacts if i.role == EconomicRole.IMPORTING), None)
+    return abs(res.global_gdp_loss_usd_mn), importer
+
+def test_sweep_matches_scalar_simulation():
+    print("--- 📈 Vectorized Sweep vs Scalar Simulation ---")
+    shock = PolicyShock(source_id='USA', target_id='CHN', industry_id='D26', tariff_delta=25.0)
+    grid = build_tariff_grid(0.0, 20.0, 0.25)
+    analysis = discover_crashing_point(shock, tariff_grid=grid)
+
+    assert len(analysis.data_points) == len(grid)
+    for point in analysis.data_points:
+        loss, _ = _scalar_point(shock, point.tariff_pct)
+        assert abs(point.global_loss_mn - loss) < 1e-6, f"Mismatch @ {point.tariff_pct}%"
+
+def test_crashing_point_matches_scalar_scan():
+    shock = PolicyShock(source_id='USA', target_id='IDN', industry_id='D01T03', tariff_delta=13.0)
+    analysis = discover_crashing_point(shock)
+    print(f"Crashing Point Detected: {analysis.crashing_point_tariff}%")
+
+    expected = next(
+        (float(t) for t in range(1, 101)
+         if (lambda imp: imp is not None and imp.direct_impact_usd_mn < 0)(_scalar_point(shock, t)[1])),
+        100.0
+    )
+    assert analysis.crashing_point_tariff == expected
+    assert sum(p.is_crashing_point for p in analysis.data_points) <= 1
+
+def test_missing_corridor_is_flat():
+    shock = PolicyShock(source_id='USA', target_id='XXX', industry_id='D26', tariff_delta=10.0)
+    analysis = discover_crashing_point(shock)
+    assert analysis.crashing_point_tariff == 100.0
+    assert all(p.global_loss_mn == 0 for p in analysis.data_points)
+
+def test_streamed_chunks_match_full_sweep():
+    shock = PolicyShock(source_id='USA', target_id='CHN', industry_id='D26', tariff_delta=25.0)
+    analysis = discover_crashing_point(shock)
+    chunks = list(iter_sensitivity_chunks(shock, chunk_size=7))
+    streamed = [p for points, _ in chunks for p in points]
+    crashes = [tariff for _, tariff in chunks if tariff is not None]
+
+    assert streamed == analysis.data_points
+    assert crashes == [analysis.crashing_point_tariff]
+
+STREAM_SHOCK = {"source_id": "USA", "target_id": "CHN", "industry_id": "D26", "tariff_delta": 25.0}
+
+def test_stream_rejects_unbounded_grids():
+    import main
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    for query in ("stop=1e12&step=0.5", "stop=inf", "start=nan", "step=0", "step=-1", "stop=1e308&step=1e-308"):
+        response = client.post(f"/simulate/sensitivity/stream?{query}", json=STREAM_SHOCK)
+        assert response.status_code == 422, query
+
+def test_stream_ndjson_and_sse_framing():
+    import main
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    response = client.post("/simulate/sensitivity/stream?start=0&stop=40&step=1", json=STREAM_SHOCK)
+    assert response.status_code == 200 and response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["event"] == "start" and events[0]["points"] == 41
+    assert [e["event"] for e in events].count("point") == 41
+    assert events[-1]["event"] == "end"
+    crash = [e for e in events if e["event"] == "crashing_point"]
+    assert len(crash) == 1 and crash[0]["tariff_pct"] == events[-1]["crashing_point_tariff"]
+
+    response = client.post(
+        "/simulate/sensitivity/stream?start=0&stop=40&step=1", json=STREAM_SHOCK, headers={"Accept": "text/event-stream"}
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = response.text.split("\n\n")
+    assert blocks[-1] == ""
+    names = []
+    for block in blocks[:-1]:
+        event_line, data_line = block.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        json.loads(data_line[len("data: "):])
+        names.append(event_line[len("event: "):])
+    assert names[0] == "start" and names[-1] == "end" and names.count("point") == 41
+
+def test_stream_disconnect_during_chunk(monkeypatch):
+    import main
+    from starlette.requests import Request
+
+    started, release, closed = threading.Event(), threading.Event(), threading.Event()
+
+    def slow_chunks(shock, grid, chunk_size):
+        try:
+            started.set()
+            release.wait(5)  # A chunk still being evaluated when the client goes away
+            yield [], None
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(main, "iter_sensitivity_chunks", slow_chunks)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def scenario():
+        request = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""}, receive)
+        response = await main.stream_sensitivity(PolicyShock(**STREAM_SHOCK), request)
+        stream = response.body_iterator
+        await stream.__anext__()  # "start"
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.to_thread(started.wait, 5)
+        pending.cancel()  # What the server does on disconnect
+        try:
+            await pending
+        except asyncio.CancelledError:
+            pass
+        await stream.aclose()
+        assert not closed.is_set()  # Closing waits for the in-flight chunk ...
+        release.set()
+        assert await asyncio.to_thread(closed.wait, 5)  # ... then closes the sweep
+
+    asyncio.run(scenario())
+
+if __name__ == "__main__":
+    test_sweep_matches_scalar_simulation()
+    test_crashing_point_matches_scalar_scan()
+    test_missing_corridor_is_flat()
+    test_streamed_chunks_match_full_sweep()
+    test_stream_rejects_unbounded_grids()
+    test_stream_ndjson_and_sse_framing()
@@ -0,0 +1,90 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import logic
+import workers
+import serialization
+from models import PolicyShock
+
+SHOCKS = [
+    {"source_id": "USA", "target_id": "CHN", "industry_id": "D26", "tariff_delta": 25.0},
+    {"source_id": "USA", "target_id": "CHN", "industry_id": "D26", "tariff_delta": 0.0},  # Policy neutral
+    {"source_id": "USA", "target_id": "XXX", "industry_id": "D26", "tariff_delta": 5.0},  # Data null
+]
+
+def test_fast_path_matches_model_serialization():
+    print("--- 🧾 Simulation Response Encoding ---")
+    version = logic.get_data_version()
+    for shock in SHOCKS:
+        for include_sensitivity, include_visuals in ((True, True), (True, False), (False, False)):
+            expected = logic.calculate_simulation(
+                PolicyShock(**shock), include_sensitivity=include_sensitivity, include_visuals=include_visuals
+            ).model_dump_json().encode()
+            assert workers.simulate_to_bytes(shock, version, include_sensitivity, include_visuals) == expected
+
+def test_fast_path_builds_no_result_models(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("the /simulate encoder validated a SimulationResult")
+
+    monkeypatch.setattr(logic.SimulationResult, "model_validate", refuse)
+    version = logic.get_data_version()
+    assert json.loads(workers.simulate_to_bytes(SHOCKS[0], version))["impacts"]
+    with pytest.raises(AssertionError):
+        logic.calculate_simulation(PolicyShock(**SHOCKS[0]))
+
+def test_columnar_layout():
+    version = logic.get_data_version()
+    rows = json.loads(workers.simulate_to_bytes(SHOCKS[0], version))
+    columns = json.loads(workers.simulate_to_bytes(SHOCKS[0], version, True, True, "columnar"))
+
+    assert columns["impacts"]["country_id"] == [impact["country_id"] for impact in rows["impacts"]]
+    assert set(columns["impacts"]) == set(rows["impacts"][0])
+    points = columns["sensitivity"]["data_points"]
+    assert points["tariff_pct"] == [p["tariff_pct"] for p in rows["sensitivity"]["data_points"]]
+    assert points["global_loss_mn"] == [p["global_loss_mn"] for p in rows["sensitivity"]["data_points"]]
+    assert sum(points["is_crashing_point"]) == 1
+    assert columns["visuals"] == rows["visuals"]
+
+    # Results that already carry their points (batch) convert the same way
+    result = logic.calculate_simulation(PolicyShock(**SHOCKS[0]))
+    assert json.loads(serialization.encode_simulation(result, fmt="columnar")) == columns
+
+def test_accept_negotiation():
+    assert serialization.negotiate(None) == "json"
+    assert serialization.negotiate("*/*") == "json"
+    assert serialization.negotiate("text/html,application/xhtml+xml,*/*;q=0.8") == "json"
+    assert serialization.negotiate("application/vnd.tipm.columnar+json") == "columnar"
+    assert serialization.negotiate("application/json;q=0.5, application/vnd.tipm.columnar+json") == "columnar"
+    assert serialization.negotiate("text/csv") is None
+    expected = "msgpack" if serialization.msgpack is not None else None
+    assert serialization.negotiate("application/x-msgpack") == expected
+
+@pytest.mark.skipif(serialization.msgpack is None, reason="msgpack not installed")
+def test_msgpack_round_trip():
+    version = logic.get_data_version()
+    rows = json.loads(workers.simulate_to_bytes(SHOCKS[0], version))
+    assert serialization.msgpack.unpackb(workers.simulate_to_bytes(SHOCKS[0], version, True, True, "msgpack")) == rows
+    columns = json.loads(workers.simulate_to_bytes(SHOCKS[0], version, True, True, "columnar"))
+    assert serialization.msgpack.unpackb(workers.simulate_to_bytes(SHOCKS[0], version, True, True, "columnar_msgpack")) == columns
+
+def test_endpoint_content_negotiation(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(workers, "get_executor", lambda: None)
+    client = TestClient(main.app)
+    shock = {**SHOCKS[0], "tariff_delta": 21.5}
+    rows = client.post("/simulate", json=shock)
+    columns = client.post("/simulate", json=shock, headers={"Accept": "application/vnd.tipm.columnar+json"})
+    assert rows.headers["content-type"] == "application/json" and "Accept" in rows.headers["vary"]
+    assert columns.headers["content-type"] == "application/vnd.tipm.columnar+json"
+    assert columns.headers["etag"] != rows.headers["etag"] and columns.headers["x-cache"] == "MISS"
+    assert isinstance(columns.json()["impacts"], dict) and isinstance(rows.json()["impacts"], list)
+    assert client.post("/simulate", json=shock, headers={"Accept": "text/csv"}).status_code == 406
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import logic
+import workers
+from models import PolicyShock
+
+SHOCK = {"source_id": "USA", "target_id": "CHN", "industry_id": "D26", "tariff_delta": 17.5}
+
+def make_client(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(workers, "get_executor", lambda: None)  # Same process, so the patches below apply
+    return TestClient(main.app)
+
+def test_default_response_keeps_every_section(monkeypatch):
+    print("--- ✂️ Selective Response Sections ---")
+    client = make_client(monkeypatch)
+    response = client.post("/simulate", json=SHOCK)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["sensitivity"] is not None and body["visuals"] is not None
+    expected = json.loads(logic.calculate_simulation(PolicyShock(**SHOCK)).model_dump_json())
+    assert body == expected
+    assert client.post("/simulate?include=all", json=SHOCK).headers["etag"] == response.headers["etag"]
+
+def test_omitted_sections_are_not_computed(monkeypatch):
+    client = make_client(monkeypatch)
+
+    def not_requested(*args, **kwargs):
+        raise AssertionError("section was computed although not requested")
+
+    full = client.post("/simulate", json={**SHOCK, "tariff_delta": 18.5}).json()
+    monkeypatch.setattr(logic, "sweep_sensitivity", not_requested)
+    monkeypatch.setattr(logic, "build_advanced_visuals", not_requested)
+
+    core = client.post("/simulate?include=core", json={**SHOCK, "tariff_delta": 18.5})
+    assert core.status_code == 200 and core.headers["x-cache"] == "MISS"
+    body = core.json()
+    assert body["sensitivity"] is None and body["visuals"] is None
+    assert body["impacts"] == full["impacts"]
+    assert body["global_gdp_loss_usd_mn"] == full["global_gdp_loss_usd_mn"]
+
+    monkeypatch.undo()
+    client = make_client(monkeypatch)
+    monkeypatch.setattr(logic, "sweep_sensitivity", not_requested)
+    visuals_only = client.post("/simulate?include=visuals", json={**SHOCK, "tariff_delta": 18.5}).json()
+    assert visuals_only["sensitivity"] is None and visuals_only["visuals"] == full["visuals"]
+
+def test_sections_are_part_of_the_cache_key(monkeypatch):
+    client = make_client(monkeypatch)
+    shock = {**SHOCK, "tariff_delta": 19.5}
+    core = client.post("/simulate?include=core", json=shock)
+    full = client.post("/simulate", json=shock)
+    assert core.headers["etag"] != full.headers["etag"]
+    assert full.headers["x-cache"] == "MISS" and full.json()["sensitivity"] is not None
+    # Order and spelling of the list do not matter
+    again = client.post("/simulate?include=Visuals, sensitivity", json=shock)
+    assert again.headers["etag"] == full.headers["etag"] and again.headers["x-cache"] == "HIT"
+    assert client.post("/simulate?include=none", json=shock).headers["etag"] == core.headers["etag"]
+
+def test_unknown_section_is_rejected(monkeypatch):
+    client = make_client(monkeypatch)
+    response = client.post("/simulate?include=impacts,heatmap", json=SHOCK)
+    assert response.status_code == 422
+    assert "heatmap" in response.json()["detail"]
+
+def test_non_finite_tariff_delta_is_rejected(monkeypatch):
+    client = make_client(monkeypatch)
+    for delta in (float("nan"), float("inf")):
+        body = json.dumps({**SHOCK, "tariff_delta": delta})  # NaN / Infinity literals
+        response = client.post("/simulate", content=body, headers={"Content-Type": "application/json"})
+        assert response.status_code == 422
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
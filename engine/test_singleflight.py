@@ -0,0 +1,43 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from singleflight import SingleFlight
+
+def test_async_callers_share_one_task():
+    print("--- ✈️ Single-flight Coalescing ---")
+    flights = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return b"result"
+
+    async def main():
+        return await asyncio.gather(*[flights.do_async("k", work) for _ in range(4)])
+
+    results = asyncio.run(main())
+    assert len(runs) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert flights.stats()["coalesced"] == 3 and flights.stats()["in_flight"] == 0
+
+def test_async_errors_propagate_and_clear():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*[flights.do_async("k", fail) for _ in range(3)], return_exceptions=True)
+
+    for _ in range(2):
+        assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+    assert flights.stats() == {"calls": 6, "executions": 2, "coalesced": 4, "in_flight": 0}
+
+if __name__ == "__main__":
+    test_async_callers_share_one_task()
+    test_async_errors_propagate_and_clear()
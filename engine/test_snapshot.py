@@ -0,0 +1,97 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import sqlite3
+import pytest
+import logic
+from snapshot import TradeSnapshot
+from logic import get_db_connection, get_snapshot, refresh_snapshot, get_available_industries, get_economies, get_reference_data, notify_data_changed
+
+def test_snapshot_matches_trade_matrix():
+    print("--- 🧊 Trade Matrix Snapshot Consistency ---")
+    snap = get_snapshot()
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("SELECT source_econ_id, target_econ_id, industry_id, value_added_usd_mn FROM trade_matrix").fetchall()
+        db_available = {
+            row['id'] for row in conn.execute("""
+                SELECT DISTINCT i.id FROM industries i JOIN trade_matrix tm ON i.id = tm.industry_id
+                WHERE tm.source_econ_id = 'CHN' AND tm.target_econ_id = 'USA' AND tm.value_added_usd_mn > 0
+            """)
+        }
+        economy_count = conn.execute("SELECT COUNT(*) FROM economies").fetchone()[0]
+    finally:
+        conn.close()
+
+    assert int(snap.present.sum()) == len(rows)
+    for row in rows:
+        cell = (snap.economy_index[row[0]], snap.economy_index[row[1]], snap.industry_index[row[2]])
+        assert snap.value_added[cell] == float(row[3])
+
+    assert {i.id for i in get_available_industries('USA', 'CHN')} == db_available
+    assert len(get_economies()) == economy_count
+
+def test_refresh_swaps_snapshot():
+    before = get_snapshot()
+    after = refresh_snapshot()
+    assert after is get_snapshot() and after is not before
+    assert after.version == before.version + 1
+
+def test_reference_data_follows_data_version():
+    reference = get_reference_data()
+    assert get_reference_data() is reference
+    assert json.loads(reference.industries_json) == [i.model_dump() for i in reference.industries]
+    assert reference.industry_name('D26') == 'Computer, electronic and optical products'
+    assert reference.industry_name('UNKNOWN') == 'UNKNOWN'
+
+    notify_data_changed()
+    refreshed = get_reference_data()
+    assert refreshed is not reference and refreshed.version == get_snapshot().version
+
+def test_workers_catch_up_without_exporting(isolated_engine, monkeypatch):
+    import workers
+
+    db_path, _ = isolated_engine
+    before = logic.get_data_version()
+    # The writer changed the data but did not (or could not) export it
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE economies SET gdp_usd_bn = gdp_usd_bn * 2 WHERE id = 'USA'")
+    conn.close()
+    conn = get_db_connection()
+    try:
+        expected = f"{TradeSnapshot.from_connection(conn).fingerprint}-{before.rsplit('-', 1)[1]}"
+    finally:
+        conn.close()
+
+    def export(*args, **kwargs):
+        raise AssertionError("a worker wrote the shared snapshot")
+
+    monkeypatch.setattr(TradeSnapshot, "save", export)
+    workers._ensure_data_version(expected)
+    assert logic.get_data_version() == expected
+    with pytest.raises(RuntimeError):
+        workers._ensure_data_version(before)  # Data moved on since the job was submitted
+
+    # A worker starting cold on a stale export builds a private copy as well
+    monkeypatch.setattr(logic, "_snapshot", None)
+    logic.mark_snapshot_reader()
+    assert logic.get_data_version() == expected
+
+def test_carry_over_is_logged_not_printed(isolated_engine, caplog, capsys):
+    from delta import apply_delta, ECONOMY_GDP
+
+    db_path, _ = isolated_engine
+    logic.get_snapshot()
+    with sqlite3.connect(db_path) as conn:
+        changes = apply_delta(conn, ECONOMY_GDP, [(("CHN",), (1.0,))], source="test")
+    capsys.readouterr()
+    with caplog.at_level("INFO", logger="SimulationEngine"):
+        notify_data_changed([changes])
+    assert any("RESULT_CACHE_CARRY_OVER" in record.getMessage() for record in caplog.records)
+    assert "RESULT_CACHE_CARRY_OVER" not in capsys.readouterr().out
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,92 @@
+import sys
+import os
+import sqlite3
+import tempfile
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from snapshot import TradeSnapshot
+
+def _snapshot(gdp_usa: float = 29000) -> TradeSnapshot:
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(f"""
+        CREATE TABLE economies (id TEXT PRIMARY KEY, name TEXT, gdp_usd_bn REAL);
+        CREATE TABLE industries (id TEXT PRIMARY KEY, name TEXT, category TEXT);
+        CREATE TABLE trade_matrix (source_econ_id TEXT, target_econ_id TEXT, industry_id TEXT,
+            value_added_usd_mn REAL, baseline_tariff_pct REAL);
+        INSERT INTO economies VALUES ('USA', 'United States', {gdp_usa}), ('CHN', 'China', 18800);
+        INSERT INTO industries VALUES ('D26', 'Electronics', 'Manufacturing');
+        INSERT INTO trade_matrix VALUES ('CHN', 'USA', 'D26', 80000, 7.5);
+    """)
+    return TradeSnapshot.from_connection(conn, version=1)
+
+def test_export_round_trip_is_memory_mapped():
+    print("--- 🗺️ Memory-mapped Snapshot ---")
+    original = _snapshot()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        original.save(path, source_signature="sig-1")
+        assert TradeSnapshot.read_manifest(path)["source_signature"] == "sig-1"
+
+        mapped = TradeSnapshot.open(path, version=3)
+        assert mapped.version == 3
+        assert mapped.fingerprint == original.fingerprint
+        assert mapped.economy_ids == original.economy_ids and mapped.industry_ids == original.industry_ids
+        for name in ("gdp_usd_bn", "value_added", "baseline_tariff", "present"):
+            array = getattr(mapped, name)
+            assert isinstance(array, np.memmap) and not array.flags.writeable
+            assert np.array_equal(array, getattr(original, name))
+
+        usa, chn, d26 = mapped.economy("USA"), mapped.economy("CHN"), mapped.industry("D26")
+        assert mapped.value_added[chn, usa, d26] == 80000
+        assert not isinstance(TradeSnapshot.open(path, mmap=False).value_added, np.memmap)
+
+def test_reexport_replaces_previous_export():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        first = _snapshot().save(path)
+        held = TradeSnapshot.open(path)  # A reader still mapping the old files
+        assert held.generation == first
+        updated = _snapshot(gdp_usa=30000)
+        second = updated.save(path)
+
+        reopened = TradeSnapshot.open(path)
+        assert reopened.generation == second != first
+        assert reopened.fingerprint == updated.fingerprint != held.fingerprint
+        assert reopened.gdp_usd_bn[reopened.economy("USA")] == 30000
+        assert held.gdp_usd_bn[held.economy("USA")] == 29000
+        # The previous generation stays for readers that resolved the pointer before the swap
+        assert sorted(os.listdir(path)) == sorted(["CURRENT", first, second])
+
+        third = _snapshot(gdp_usa=31000).save(path)
+        assert sorted(os.listdir(path)) == sorted(["CURRENT", second, third])  # No staging or retired files left
+        assert held.gdp_usd_bn[held.economy("USA")] == 29000  # Unlinked pages stay mapped
+
+def test_open_reads_one_generation(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        _snapshot().save(path)
+        original_load = np.load
+
+        def load_during_publish(*args, **kwargs):
+            # Another process publishes while this reader is between manifest and arrays
+            monkeypatch.setattr(np, "load", original_load)
+            _snapshot(gdp_usa=30000).save(path)
+            return original_load(*args, **kwargs)
+
+        monkeypatch.setattr(np, "load", load_during_publish)
+        snap = TradeSnapshot.open(path, mmap=False)
+        assert snap.gdp_usd_bn[snap.economy("USA")] == 29000
+        assert snap.fingerprint == _snapshot().fingerprint
+
+        # A flat export from before generations counts as missing and is cleaned up on the next save
+        assert TradeSnapshot.current_generation(os.path.join(tmp, "missing")) is None
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            f.write("{}")
+        _snapshot().save(path)
+        assert "manifest.json" not in os.listdir(path)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,104 @@
+import sys
+import os
+import csv
+import gzip
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ingestion.oecd_tiva import OECDTiVAIngestor, isic_mapper
+
+CONFIG = {"data_sources": {"oecd_tiva": {"bulk_load": {
+    "measure": "EXGR_DVA", "year": 2020, "chunk_size": 2, "commit_every_chunks": 2, "skip_areas": ["WLD"]
+}}}}
+
+def _database() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE industries (id TEXT PRIMARY KEY, name TEXT, category TEXT);
+        CREATE TABLE trade_matrix (id INTEGER PRIMARY KEY AUTOINCREMENT, source_econ_id TEXT NOT NULL,
+            target_econ_id TEXT NOT NULL, industry_id TEXT NOT NULL, value_added_usd_mn REAL NOT NULL,
+            baseline_tariff_pct REAL NOT NULL DEFAULT 0.0, UNIQUE(source_econ_id, target_econ_id, industry_id));
+        INSERT INTO industries VALUES ('D26', 'Electronics', 'Manufacturing'), ('D01T03', 'Agriculture', 'Primary');
+        INSERT INTO trade_matrix (source_econ_id, target_econ_id, industry_id, value_added_usd_mn, baseline_tariff_pct)
+            VALUES ('CHN', 'USA', 'D26', 1.0, 7.5);
+    """)
+    return conn
+
+def test_isic_mapping():
+    mapper = isic_mapper(["D26", "D01T03", "D64T66"])
+    assert [mapper(c) for c in ("D26", "C26", "26", "02", "D01T03", "65", "D10T33", "_T")] == \
+        ["D26", "D26", "D26", "D01T03", "D01T03", "D64T66", None, None]
+
+def test_streaming_load_upserts_and_aggregates():
+    print("--- 🚚 OECD TiVA Streaming Loader ---")
+    rows = [
+        ["REF_AREA", "COUNTERPART_AREA", "ACTIVITY", "MEASURE", "TIME_PERIOD", "OBS_VALUE", "UNIT_MULT"],
+        ["CHN", "USA", "D26", "EXGR_DVA", "2020", "80000", "6"],
+        ["VNM", "USA", "D01", "EXGR_DVA", "2020", "300", "6"],
+        ["VNM", "USA", "D02", "EXGR_DVA", "2020", "200", "6"],       # Summed into D01T03
+        ["IDN", "USA", "D01T03", "EXGR_DVA", "2020", "1.5", "9"],    # USD billions
+        ["CHN", "USA", "D26", "EXGR_DVA", "2019", "1", "6"],          # Other year
+        ["CHN", "USA", "D26", "EXGR_GVA", "2020", "1", "6"],          # Other measure
+        ["CHN", "WLD", "D26", "EXGR_DVA", "2020", "1", "6"],          # Aggregate partner
+        ["CHN", "CHN", "D26", "EXGR_DVA", "2020", "1", "6"],          # Domestic
+        ["CHN", "USA", "D35", "EXGR_DVA", "2020", "9", "6"],          # No TIPM industry
+        ["KOR", "USA", "D26", "EXGR_DVA", "2020", "", "6"],           # Missing value
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tiva.csv.gz")
+        with gzip.open(path, "wt", newline="") as f:
+            csv.writer(f).writerows(rows)
+        conn = _database()
+        report = OECDTiVAIngestor(CONFIG).load_file(conn, path)
+
+    loaded = {tuple(r[:3]): r[3:] for r in conn.execute(
+        "SELECT source_econ_id, target_econ_id, industry_id, value_added_usd_mn, baseline_tariff_pct FROM trade_matrix")}
+    assert loaded == {
+        ("CHN", "USA", "D26"): (80000.0, 7.5),  # Tariff preserved on update
+        ("VNM", "USA", "D01T03"): (500.0, 0.0),
+        ("IDN", "USA", "D01T03"): (1500.0, 0.0),
+    }
+    assert report["rows_read"] == 10 and report["rows_mapped"] == 4 and report["rows_invalid"] == 1
+    assert report["rows_upserted"] == 3 and report["unmapped_industries"] == {"D35": 1}
+    assert not conn.execute("SELECT name FROM sqlite_temp_master WHERE name = 'tiva_staging'").fetchall()
+    print(report)
+
+    # Reloading the same file rewrites nothing
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tiva.csv")
+        with open(path, "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+        again = OECDTiVAIngestor(CONFIG).load_file(conn, path)
+    assert again["rows_upserted"] == 0 and again["rows_unchanged"] == 3
+
+def test_aggregate_and_detail_codes_load_once():
+    rows = [
+        ["REF_AREA", "COUNTERPART_AREA", "ACTIVITY", "MEASURE", "TIME_PERIOD", "OBS_VALUE", "UNIT_MULT"],
+        ["VNM", "USA", "D01T03", "EXGR_DVA", "2020", "900", "6"],    # Aggregate of the detail rows below
+        ["VNM", "USA", "D01T02", "EXGR_DVA", "2020", "800", "6"],
+        ["VNM", "USA", "D01", "EXGR_DVA", "2020", "500", "6"],
+        ["VNM", "USA", "D03", "EXGR_DVA", "2020", "100", "6"],
+        ["THA", "USA", "D01T02", "EXGR_DVA", "2020", "400", "6"],    # No D01T03 row: D01T02 + D03
+        ["THA", "USA", "D02", "EXGR_DVA", "2020", "150", "6"],
+        ["THA", "USA", "D03", "EXGR_DVA", "2020", "50", "6"],
+        ["IDN", "USA", "D01", "EXGR_DVA", "2020", "30", "6"],        # Detail only
+        ["IDN", "USA", "D02", "EXGR_DVA", "2020", "20", "6"],
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tiva.csv")
+        with open(path, "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+        conn = _database()
+        report = OECDTiVAIngestor(CONFIG).load_file(conn, path)
+
+    loaded = dict(((r[0], r[1]), r[2]) for r in conn.execute(
+        "SELECT source_econ_id, target_econ_id, value_added_usd_mn FROM trade_matrix WHERE industry_id = 'D01T03'"))
+    assert loaded == {("VNM", "USA"): 900.0, ("THA", "USA"): 450.0, ("IDN", "USA"): 50.0}
+    assert report["rows_mapped"] == 9 and report["rows_upserted"] == 3
+
+if __name__ == "__main__":
+    test_isic_mapping()
+    test_streaming_load_upserts_and_aggregates()
+    test_aggregate_and_detail_codes_load_once()
@@ -0,0 +1,87 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+import logic
+import montecarlo
+import workers
+from models import PolicyShock
+from sweep import evaluate_tariff_grid, find_crash_index
+
+SHOCKS = [
+    PolicyShock(source_id='USA', target_id='CHN', industry_id='D26', tariff_delta=25.0),
+    PolicyShock(source_id='USA', target_id='IDN', industry_id='D01T03', tariff_delta=13.0),  # Primary overrides
+    PolicyShock(source_id='USA', target_id='CHN', industry_id='D26', tariff_delta=0.0),
+    PolicyShock(source_id='USA', target_id='XXX', industry_id='D26', tariff_delta=5.0),
+]
+
+def test_point_estimates_reproduce_simulation(monkeypatch):
+    print("--- 🎲 Monte Carlo Uncertainty Bands ---")
+    monkeypatch.setitem(logic.MONTE_CARLO_CONFIG, "distributions", {})  # Every draw = the point estimate
+    for shock in SHOCKS:
+        expected = logic.calculate_simulation(shock)
+        analysis = logic.calculate_uncertainty(shock, draws=16)
+        assert [b.country_id for b in analysis.impacts] == [i.country_id for i in expected.impacts]
+        for impact, band in zip(expected.impacts, analysis.impacts):
+            for q in band.direct_impact_usd_mn.percentiles.values():
+                assert q == pytest.approx(impact.direct_impact_usd_mn, rel=1e-12)
+            assert band.total_gdp_impact_pct.mean == pytest.approx(impact.total_gdp_impact_pct, rel=1e-12)
+        assert analysis.global_gdp_loss_usd_mn.mean == pytest.approx(expected.global_gdp_loss_usd_mn, rel=1e-12)
+        crash = logic.discover_crashing_point(shock).crashing_point_tariff
+        assert set(analysis.crashing_point_tariff.percentiles.values()) == {crash}
+
+def test_vectorized_crashing_points_match_per_draw_sweep():
+    shock = SHOCKS[0]
+    baseline = logic.fetch_shock_baseline(shock)
+    params = logic.get_reactive_parameters(baseline.industry_category)
+    coefficients = montecarlo.sample_coefficients(
+        {"decay_factor": logic.CONTAGION_DECAY_FACTOR, **params},
+        {"wealth_transfer": {"dist": "uniform", "rel_spread": 0.6}, "drag_coeff": {"dist": "lognormal", "sigma": 0.8}},
+        64, np.random.default_rng(7)
+    )
+    grid = logic.build_tariff_grid()
+    vectorized = montecarlo.crashing_points(baseline, grid, coefficients, block=10)
+    for i in range(64):
+        draw = {name: float(values[i]) for name, values in coefficients.items()}
+        sweep = evaluate_tariff_grid(baseline, grid, draw, draw["decay_factor"])
+        idx = find_crash_index(grid, sweep)
+        assert vectorized[i] == (grid[idx] if idx is not None else grid.max())
+    assert len(set(vectorized.tolist())) > 1
+
+def test_seeded_and_ordered_bands():
+    shock = SHOCKS[0]
+    first = logic.calculate_uncertainty(shock, draws=500)
+    assert first.seed == logic.REPRODUCIBILITY_SEED
+    assert logic.calculate_uncertainty(shock, draws=500).model_dump() == first.model_dump()
+    assert logic.calculate_uncertainty(shock, draws=500, seed=7).model_dump() != first.model_dump()
+
+    for band in [first.global_gdp_loss_usd_mn, first.crashing_point_tariff] + [b.direct_impact_usd_mn for b in first.impacts]:
+        values = list(band.percentiles.values())
+        assert values == sorted(values)
+    importer = first.impacts[-1].direct_impact_usd_mn.percentiles
+    assert importer["p5"] < importer["p95"]  # Sampled coefficients actually spread the importer's balance
+    assert 0.0 <= first.past_crashing_point_share <= 1.0
+
+    with pytest.raises(ValueError):
+        logic.calculate_uncertainty(shock, draws=0)
+
+def test_endpoint_caches_and_limits_draws(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(workers, "get_executor", lambda: None)
+    client = TestClient(main.app)
+    shock = {**SHOCKS[0].model_dump(), "tariff_delta": 27.5}
+    response = client.post("/simulate/uncertainty?draws=300", json=shock)
+    assert response.status_code == 200 and response.json()["draws"] == 300
+    again = client.post("/simulate/uncertainty?draws=300", json=shock)
+    assert again.headers["x-cache"] == "HIT" and again.content == response.content
+    assert client.post("/simulate/uncertainty?draws=300&seed=1", json=shock).headers["x-cache"] == "MISS"
+    assert client.post("/simulate/uncertainty?draws=10000000", json=shock).status_code == 422
+    assert client.post("/simulate/uncertainty?draws=300&seed=-1", json=shock).status_code == 422
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
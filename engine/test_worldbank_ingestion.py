@@ -0,0 +1,89 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ingestion.worldbank import WorldBankIngestor, TokenBucket
+
+GDP = {f"C{i:02d}": (i + 1) * 1e11 for i in range(23)}
+
+class StubWorldBank(BaseHTTPRequestHandler):
+    """Answers /country/A;B/indicator/... like the World Bank API; throttles the first call."""
+    calls = []
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.calls.append(self.path)
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            first = len(cls.calls) == 1
+        try:
+            time.sleep(0.02)
+            codes = urlparse(self.path).path.split("/")[2].split(";")
+            if first:
+                self._send(429, {"message": "slow down"}, {"Retry-After": "0"})
+            elif any(code not in GDP for code in codes):
+                self._send(200, [{"message": [{"id": "120", "key": "Invalid value"}]}])
+            else:
+                records = [{"countryiso3code": code, "value": GDP[code]} for code in codes]
+                self._send(200, [{"page": 1, "pages": 1, "total": len(records)}, records])
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def test_concurrent_bulk_ingestion():
+    print("--- 🌐 Concurrent World Bank Ingestion ---")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWorldBank)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        ingestor = WorldBankIngestor({"data_sources": {"worldbank_wdi": {
+            "base_url": f"http://127.0.0.1:{server.server_port}",
+            "rate_limit": {"delay_seconds": 0.01, "max_retries": 3},
+            "concurrency": {"requests_per_second": 200, "burst": 10, "max_in_flight": 2, "batch_size": 5}
+        }}})
+        codes = list(GDP) + ["BAD"]
+        results = asyncio.run(ingestor.refresh_all_economies_async(codes))
+    finally:
+        server.shutdown()
+
+    assert results == {code: gdp / 1e9 for code, gdp in GDP.items()}
+    assert StubWorldBank.max_in_flight <= 2
+    # 5 batches + one 429 retry + splitting the batch holding BAD
+    assert 6 < len(StubWorldBank.calls) < len(codes)
+    print(f"{len(results)} economies in {len(StubWorldBank.calls)} requests")
+
+def test_token_bucket_paces_requests():
+    async def drain():
+        bucket = TokenBucket(rate=100, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+    assert asyncio.run(drain()) >= 0.045
+
+if __name__ == "__main__":
+    test_concurrent_bulk_ingestion()
+    test_token_bucket_paces_requests()
@@ -0,0 +1,93 @@
+import sys
+import os
+import csv
+import sqlite3
+import tempfile
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from ingestion.wto import WTOIngestor, hs_mapper
+
+CONFIG = {"data_sources": {"wto_data_centre": {"bulk_tariffs": {
+    "chunk_rows": 3,
+    "hs_to_tipm": {"01": "D01T03", "85": "D27", "8517": "D26", "8542": "D26", "8711": None},
+    "economy_codes": {"840": "USA", "156": "CHN"}
+}}}}
+
+def test_hs_mapping_longest_prefix():
+    mapper = hs_mapper(CONFIG["data_sources"]["wto_data_centre"]["bulk_tariffs"]["hs_to_tipm"])
+    assert [mapper(c) for c in ("010121", "851712", "8517.62", "850440", "871120", "990000")] == \
+        ["D01T03", "D26", "D26", "D27", None, None]
+
+def test_bulk_schedule_load():
+    print("--- 🧾 WTO Bulk Tariff Schedules ---")
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE trade_matrix (id INTEGER PRIMARY KEY AUTOINCREMENT, source_econ_id TEXT NOT NULL,
+            target_econ_id TEXT NOT NULL, industry_id TEXT NOT NULL, value_added_usd_mn REAL NOT NULL,
+            baseline_tariff_pct REAL NOT NULL DEFAULT 0.0, UNIQUE(source_econ_id, target_econ_id, industry_id));
+        INSERT INTO trade_matrix (source_econ_id, target_econ_id, industry_id, value_added_usd_mn) VALUES
+            ('CHN', 'USA', 'D26', 80000), ('MYS', 'USA', 'D26', 25000), ('CHN', 'USA', 'D01T03', 12000),
+            ('USA', 'CHN', 'D26', 9000), ('CHN', 'USA', 'D27', 7000);
+    """)
+    rows = [
+        ["reporter", "partner", "hs6", "tariff_pct", "import_value"],
+        ["840", "000", "851712", "10", "300"],   # USA MFN, D26: trade-weighted (10*300 + 0*100) / 400 = 7.5
+        ["840", "000", "854231", "0", "100"],
+        ["840", "000", "010121", "4", ""],       # No import value: simple average of 4 and 8
+        ["840", "000", "010229", "8", ""],
+        ["840", "156", "851712", "25", "50"],    # CHN preference (here: a surcharge) on one D26 line only
+        ["840", "156", "010130", "1", ""],       # CHN-only line, added to the MFN lines: (4 + 8 + 1) / 3
+        ["840", "000", "850440", "2", "100"],    # D27 mixes weighted and unweighted lines:
+        ["840", "000", "850110", "6", ""],       # the unweighted one counts with the mean weight (100)
+        ["840", "000", "871120", "30", "10"],    # Excluded heading
+        ["156", "000", "851712", "n/a", "10"],   # Unparseable rate
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "schedules.csv")
+        with open(path, "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+        ingestor = WTOIngestor(CONFIG)
+        report = ingestor.load_schedules(conn, [path])
+        again = WTOIngestor(CONFIG).load_schedules(conn, [path])
+
+    tariffs = dict(((s, t, i), v) for s, t, i, v in conn.execute(
+        "SELECT source_econ_id, target_econ_id, industry_id, baseline_tariff_pct FROM trade_matrix"))
+    # 851712 at the preferential 25 with its MFN weight, 854231 still at MFN 0: (25*300 + 0*100) / 400
+    assert tariffs[("CHN", "USA", "D26")] == pytest.approx(18.75)
+    assert tariffs[("MYS", "USA", "D26")] == pytest.approx(7.5)
+    assert tariffs[("CHN", "USA", "D01T03")] == pytest.approx(13 / 3, abs=1e-4)
+    assert tariffs[("CHN", "USA", "D27")] == pytest.approx(4.0)  # (2*100 + 6*100) / 200
+    assert tariffs[("USA", "CHN", "D26")] == 0.0  # No valid CHN schedule lines
+    assert report["lines_read"] == 10 and report["lines_mapped"] == 8 and report["lines_unmapped"] == 1
+    assert report["cells_covered"] == 4 and report["cells_changed"] == 4
+    assert again["cells_changed"] == 0
+    print(report)
+
+def test_cli_load_reaches_running_engine(isolated_engine, tmp_path):
+    import yaml
+    import logic
+
+    # This process plays the running engine; the CLI gets the same database and export
+    db_path, export_path = isolated_engine
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump({
+        **logic.CONFIG, "caching": {**logic.DB_CONFIG, "db_path": db_path},
+        "snapshot": {**logic.SNAPSHOT_CONFIG, "mmap": True, "export_path": export_path}
+    }))
+    before = logic.get_data_version()
+
+    schedule = tmp_path / "usa.csv"
+    schedule.write_text("reporter,partner,hs6,tariff_pct,import_value\n840,000,851712,12,100\n")
+    env = {**os.environ, "CONFIG_PATH": str(config_path), "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+    subprocess.run([sys.executable, "-m", "ingestion.wto", "--file", str(schedule)],
+                   cwd=tmp_path, env=env, check=True, capture_output=True)
+
+    snap = logic.sync_snapshot()
+    assert logic.get_data_version() != before
+    assert snap.baseline_tariff[snap.economy("CHN"), snap.economy("USA"), snap.industry("D26")] == 12.0
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,154 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import logic
+import metrics
+import profiling
+import serialization
+from models import PolicyShock
+from exposure import ExposureRows
+
+logger = logging.getLogger("SimulationWorkers")
+
+# --- PROCESS POOL FOR CPU-BOUND SIMULATION ---
+# Simulations and batch runs execute in worker processes so they use every core instead of
+# contending for the GIL. Each worker loads the snapshot, reference data and propagation
+# factorization once at start-up and keeps them warm; jobs carry the parent's data version
+# and a worker reloads only when that version moves (e.g. after /api/data/refresh).
+# Metrics recorded in a worker travel back with each job's result and are merged into the
+# parent's registry, so /metrics covers work done in the pool.
+
+POOL_CONFIG = logic.CONFIG.get("workers", {}).get("process_pool", {})
+
+_executor: Optional[Executor] = None
+
+def _configured_workers() -> int:
+    value = POOL_CONFIG.get("max_workers", "auto")
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(0, int(value))
+
+def _warm_worker():
+    """Worker initializer: load all read-side state before the first job arrives."""
+    logic.mark_snapshot_reader()
+    logic.get_reference_data()
+    logic.get_propagation_engine()
+
+def _ensure_data_version(data_version: str):
+    """
+    Moves this process to the data a job was submitted against. Workers only read: they never
+    export the shared snapshot or touch the result cache, which belong to the writing process.
+    """
+    if logic.get_data_version() == data_version:
+        return
+    logic.sync_snapshot()  # The parent usually re-exported the shared snapshot already
+    if logic.get_data_version() != data_version:
+        logic.refresh_snapshot(export=False)  # e.g. snapshot.mmap is off: rebuild a private copy
+    if logic.get_data_version() != data_version:
+        # The data moved again after the job was submitted; its result would be cached under the wrong version
+        raise RuntimeError(f"Data version {data_version} is no longer current; retry the request")
+    logic.get_propagation_engine()
+
+def get_executor() -> Optional[Executor]:
+    """The shared process pool, or None when running in-process (max_workers: 0)."""
+    global _executor
+    if _executor is None and _configured_workers() > 0:
+        context = multiprocessing.get_context(POOL_CONFIG.get("start_method", "spawn"))
+        _executor = ProcessPoolExecutor(
+            max_workers=_configured_workers(), mp_context=context, initializer=_warm_worker
+        )
+        logger.info(f"Started simulation process pool with {_configured_workers()} workers")
+    return _executor
+
+def pool_size() -> int:
+    """Number of parallel workers available to split CPU-bound work across."""
+    return _configured_workers() or 1
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _run_with_metrics(fn: Callable, *args) -> Tuple[Any, Dict[str, Any]]:
+    """Worker side of run_cpu_bound: the job's result plus the metrics recorded since the last job."""
+    result = fn(*args)
+    return result, metrics.REGISTRY.drain()
+
+async def run_cpu_bound(fn: Callable, *args) -> Any:
+    """Runs `fn(*args)` in the process pool, or in the default thread pool when disabled."""
+    loop = asyncio.get_running_loop()
+    session = profiling.current_session()
+    if session is not None:
+        # Profiled requests run in this process so the profiler sees the computation
+        return await loop.run_in_executor(None, session.call, fn, *args)
+    executor = get_executor()
+    if executor is None:
+        return await loop.run_in_executor(None, fn, *args)
+    try:
+        result, samples = await loop.run_in_executor(executor, _run_with_metrics, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); drop the pool so the next call starts a fresh one
+        logger.error("SIMULATION_POOL_BROKEN: restarting worker pool on next request")
+        shutdown_executor()
+        raise
+    metrics.REGISTRY.merge(samples)
+    return result
+
+# --- WORKER ENTRY POINTS (must be importable top-level functions) ---
+def simulate_to_bytes(shock_data: Dict[str, Any], data_version: str, include_sensitivity: bool = True,
+                      include_visuals: bool = True, fmt: str = "json") -> bytes:
+    """
+    One /simulate response body in `fmt` (see serialization.FORMATS). The result is built as
+    plain data (logic.simulation_data) and the sensitivity sweep stays as arrays, so neither
+    becomes models that are validated only to be dumped again.
+    """
+    _ensure_data_version(data_version)
+    shock = PolicyShock(**shock_data)
+    sweep = None
+    baseline = None
+    if include_sensitivity and shock.tariff_delta != 0:
+        with metrics.stage("simulate.baseline"):
+            baseline = logic.fetch_shock_baseline(shock)
+        if baseline:
+            sweep = logic.sweep_sensitivity(shock, baseline=baseline)
+    result = logic.simulation_data(
+        shock, include_sensitivity=include_sensitivity, include_visuals=include_visuals, baseline=baseline,
+        sensitivity=sweep.analysis(shock, with_points=False) if sweep is not None else None
+    )
+    with metrics.stage("simulate.serialize"):
+        return serialization.encode_simulation(result, sweep, fmt)
+
+def simulate_uncertainty(shock_data: Dict[str, Any], draws: Optional[int], seed: Optional[int], data_version: str) -> bytes:
+    _ensure_data_version(data_version)
+    analysis = logic.calculate_uncertainty(PolicyShock(**shock_data), draws=draws, seed=seed)
+    with metrics.stage("uncertainty.serialize"):
+        return analysis.model_dump_json().encode()
+
+def simulate_batch_chunk(shock_data: List[Dict[str, Any]], include_sensitivity: List[bool],
+                         include_visuals: List[bool], data_version: str) -> List[Tuple[bool, Any]]:
+    """Evaluates a chunk of a batch. Returns (ok, SimulationResult | error message) per shock."""
+    _ensure_data_version(data_version)
+    results, _ = logic.calculate_batch([PolicyShock(**s) for s in shock_data], include_sensitivity, include_visuals)
+    return [(False, str(r)) if isinstance(r, Exception) else (True, r) for r in results]
+
+def scan_exposure_rows(importer_id: str, tariff_delta: float, mode: str, top_n: Optional[int], sort: str,
+                       data_version: str) -> Optional[Tuple[Dict[str, Any], ExposureRows]]:
+    """The header and the rows as arrays: the parent expands them into NDJSON chunk by chunk while streaming."""
+    _ensure_data_version(data_version)
+    return logic.scan_importer_exposure_rows(importer_id, tariff_delta, mode=mode, top_n=top_n, sort=sort)
+
+def partition_groups(group_keys: List[Any], chunks: int) -> List[List[int]]:
+    """Splits item indices into <= `chunks` lists without separating items that share a group key."""
+    groups: Dict[Any, List[int]] = {}
+    for idx, key in enumerate(group_keys):
+        groups.setdefault(key, []).append(idx)
+    buckets: List[List[int]] = [[] for _ in range(max(1, chunks))]
+    for members in sorted(groups.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(members)
+    return [sorted(bucket) for bucket in buckets if bucket]
@@ -5,9 +5,11 @@ export async function POST(request: Request) {
   
   try {
     const body = await request.json();
-    console.log(`PROXY_REQUEST: POST ${ENGINE_URL}/simulate`, body);
+    // Pass ?include= (response sections) through; without it the engine returns every section
+    const { search } = new URL(request.url);
+    console.log(`PROXY_REQUEST: POST ${ENGINE_URL}/simulate${search}`, body);
     
-    const response = await fetch(`${ENGINE_URL}/simulate`, {
+    const response = await fetch(`${ENGINE_URL}/simulate${search}`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',